@@ -0,0 +1,112 @@
+# app/api/aio/auth.py
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from datetime import timedelta
+from fastapi.security import OAuth2PasswordRequestForm
+
+from app.core.security import aget_password_hash, averify_and_update_password, create_access_token
+from app.db.async_session import async_connection_pool, get_async_db_cursor
+from app.db.notify import apublish_change
+from app.api.auth import check_login_rate
+from app.api.deps import invalidate_cached_user
+from app.schemas import TokenResponse, UserCreate, UserResponse
+
+router = APIRouter()
+
+# --- 1. API Login (async) ---
+@router.post("/login", response_model=TokenResponse)
+async def login(
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends()
+):
+    """
+    API đăng nhập: Nhận username/password (Form Data) -> Trả về JWT Token
+    Như bản sync: kết nối chỉ được mượn để đọc user và (nếu cần) lưu hash mới,
+    không giữ trong lúc băm mật khẩu.
+    """
+    check_login_rate(request, form_data.username)
+
+    async with async_connection_pool.connection() as conn:
+        cursor = await conn.execute("SELECT * FROM edu.users WHERE username = %s", (form_data.username,))
+        user = await cursor.fetchone()
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tài khoản không tồn tại hoặc sai tên đăng nhập"
+        )
+
+    # bcrypt chạy trong hồ tiến trình riêng; chờ bằng await -> không chiếm thread / event loop
+    verified, new_hash = await averify_and_update_password(form_data.password, user['password_hash'])
+    if not verified:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Mật khẩu không chính xác"
+        )
+
+    # Hash dùng cost cũ (BCRYPT_ROUNDS đã đổi) -> lưu hash mới
+    if new_hash:
+        async with async_connection_pool.connection() as conn:
+            await conn.execute("UPDATE edu.users SET password_hash = %s WHERE user_id = %s", (new_hash, user['user_id']))
+
+    if user['status'] != 'Hoạt động':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Tài khoản này đã bị khóa hoặc chưa kích hoạt"
+        )
+
+    access_token = create_access_token(
+        subject=user['username'],
+        expires_delta=timedelta(minutes=60 * 24)
+    )
+
+    del user['password_hash']
+
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "user": user
+    }
+
+# --- 2. API Tạo người dùng mới (Register, async) ---
+@router.post("/users", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def create_user(user_in: UserCreate, cursor = Depends(get_async_db_cursor)):
+    """
+    Tạo người dùng mới (Giáo viên, Học sinh, Admin)
+    """
+    await cursor.execute("SELECT user_id FROM edu.users WHERE username = %s", (user_in.username,))
+    if await cursor.fetchone():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tên đăng nhập đã tồn tại. Vui lòng chọn tên khác."
+        )
+
+    hashed_password = await aget_password_hash(user_in.password)
+
+    insert_query = """
+        INSERT INTO edu.users 
+        (username, password_hash, full_name, email, phone, avatar_url, role, status)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING user_id, username, full_name, email, phone, avatar_url, role, status, created_at;
+    """
+
+    try:
+        await cursor.execute(insert_query, (
+            user_in.username,
+            hashed_password,
+            user_in.full_name,
+            user_in.email,
+            user_in.phone,
+            user_in.avatar_url,
+            user_in.role,
+            user_in.status
+        ))
+        new_user = await cursor.fetchone()
+        invalidate_cached_user(new_user['username'])
+        await apublish_change(cursor, "users", new_user['username'])
+        return new_user
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Lỗi hệ thống: {str(e)}"
+        )
@@ -0,0 +1,74 @@
+# app/api/aio/deps.py
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.security import OAuth2PasswordBearer
+
+from app.core.config import settings
+from app.db.async_session import async_connection_pool
+# Dùng chung cache token / user (và việc xóa cache qua LISTEN) với bản đồng bộ
+from app.api.deps import decode_token_subject, optional_oauth2, user_cache
+
+# Cùng tokenUrl với bản đồng bộ để Swagger UI hoạt động như cũ
+reusable_oauth2 = OAuth2PasswordBearer(
+    tokenUrl=f"{settings.API_V1_STR}/login"
+)
+
+async def aload_user(username: str) -> Optional[dict]:
+    """
+    Bản async của app.api.deps.load_user: cache trước, Database sau (kết nối chỉ
+    được mượn khi cache trượt, trả lại ngay sau 1 câu SELECT).
+    """
+    user = user_cache.get(username)
+    if user is None:
+        async with async_connection_pool.connection() as conn:
+            cursor = await conn.execute("SELECT * FROM edu.users WHERE username = %s", (username,))
+            user = await cursor.fetchone()
+        if user is None:
+            return None
+        user_cache.set(username, dict(user))
+    return dict(user)
+
+# Bản async của app.api.deps.get_current_user
+async def get_current_user(token: str = Depends(reusable_oauth2)) -> dict:
+    # A. Giải mã Token (có cache)
+    username = decode_token_subject(token)
+
+    # B. Tìm User (cache trước, Database sau)
+    try:
+        user = await aload_user(username)
+
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Người dùng không tồn tại",
+            )
+
+        if user['status'] != 'Hoạt động':
+             raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Tài khoản này đang bị khóa hoặc không hoạt động"
+            )
+
+        return user
+
+    except Exception as e:
+        if not isinstance(e, HTTPException):
+             raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Lỗi xác thực Database: {str(e)}"
+            )
+        raise e
+
+# Bản async của app.api.deps.get_stream_user (/schedules/stream)
+async def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2),
+    access_token: Optional[str] = Query(None, description="Token khi không gửi được header (EventSource)"),
+) -> dict:
+    if not (token or access_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_user(token or access_token)
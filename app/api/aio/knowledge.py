@@ -0,0 +1,365 @@
+# app/api/aio/knowledge.py
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import List, Dict
+
+from app.core.responses import render_json
+from app.db.async_session import async_connection_pool, get_async_db_cursor
+from app.db.notify import apublish_change
+from app.api.aio.deps import get_current_user
+from app.services.knowledge_tree import (
+    afetch_knowledge_tree, afetch_subtree, aget_node_subject_id, get_subject_scope,
+    knowledge_tree_cache, etag_matches
+)
+from app.schemas.knowledge import (
+    # Input Schemas
+    GradeCreate, GradeUpdate, GradeResponse,
+    SubjectCreate, SubjectUpdate, SubjectResponse,
+    BookCreate, BookUpdate, BookResponse,
+    ChapterCreate, ChapterUpdate, ChapterResponse,
+    LessonCreate, LessonUpdate, LessonResponse,
+    KnowledgeUnitCreate, KnowledgeUnitUpdate, KnowledgeUnitResponse,
+    # Output Tree Schema
+    GradeDTO, KnowledgeNodeType, KnowledgeSubtreeDTO
+)
+
+router = APIRouter()
+
+# ============================================================
+# HELPER: CHECK ADMIN
+# ============================================================
+def check_is_admin(user: dict):
+    if user.get('role') != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ Quản trị viên mới có quyền chỉnh sửa dữ liệu."
+        )
+
+# ============================================================
+# HELPER: XÓA CACHE CÂY KIẾN THỨC KHI CÓ THAY ĐỔI
+# ============================================================
+async def tree_changed(cursor, table: str):
+    # Như bản sync (bản async không dùng cache danh mục bài học). Lần xóa sau
+    # commit do chính luồng LISTEN của worker này nhận lại thông báo
+    # (session async không có on_commit)
+    knowledge_tree_cache.invalidate()
+    await apublish_change(cursor, table)
+
+# ============================================================
+# 1. API LẤY CÂY KIẾN THỨC (THE "DIVINE" QUERY)
+# ============================================================
+@router.get("/knowledge-tree", response_model=List[GradeDTO])
+async def get_knowledge_tree(
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Lấy toàn bộ cây kiến thức.
+    - Admin: Thấy hết.
+    - Giáo viên: Chỉ thấy môn mình dạy (theo subject_id).
+    Giống bản sync: dùng chung knowledge_tree_cache, builder theo
+    KNOWLEDGE_TREE_BUILDER, ETag / 304; chỉ mượn kết nối khi cache trượt.
+    """
+    scope = get_subject_scope(current_user)
+
+    cached = knowledge_tree_cache.get(scope)
+    if cached is None:
+        version = knowledge_tree_cache.version
+
+        try:
+            async with async_connection_pool.connection() as conn:
+                async with conn.cursor() as cursor:
+                    rows = await afetch_knowledge_tree(cursor, scope)
+        except Exception as e:
+            raise HTTPException(500, f"Lỗi lấy cây kiến thức: {str(e)}")
+
+        body = render_json(rows, List[GradeDTO])
+        cached = knowledge_tree_cache.put(scope, version, body)
+
+    etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# ============================================================
+# 1b. API LẤY TỪNG NHÁNH (LAZY, GIỚI HẠN ĐỘ SÂU)
+# ============================================================
+@router.get("/knowledge-tree/{node_type}/{node_id}", response_model=KnowledgeSubtreeDTO)
+async def get_knowledge_subtree(
+    node_type: KnowledgeNodeType,
+    node_id: int,
+    depth: int = Query(1, ge=0, le=5, description="Số tầng con cần tải (0 = chỉ node gốc)"),
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    """
+    Lấy 1 nhánh của cây kiến thức (VD: 1 chương kèm bài học) thay vì cả cây.
+    - child_counts: số con của các node ở tầng cuối, để UI hiện nút mở rộng.
+    - Giáo viên: chỉ xem được nhánh thuộc môn mình dạy.
+    """
+    scope = get_subject_scope(current_user)
+
+    try:
+        if scope is not None and node_type != 'grade':
+            node_subject_id = await aget_node_subject_id(cursor, node_type, node_id)
+            if node_subject_id is not None and node_subject_id != scope:
+                raise HTTPException(403, "Bạn chỉ được xem nội dung thuộc môn mình phụ trách.")
+
+        subtree = await afetch_subtree(cursor, node_type, node_id, depth, scope)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(500, f"Lỗi lấy nhánh cây kiến thức: {str(e)}")
+
+    if subtree is None:
+        raise HTTPException(404, "Không tìm thấy dữ liệu")
+    return subtree
+
+# ============================================================
+# 2. GROUP CRUD: GRADES (KHỐI LỚP)
+# ============================================================
+@router.post("/grades", response_model=GradeResponse, status_code=201)
+async def create_grade(data: GradeCreate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "grade_levels")
+    await cursor.execute(
+        "INSERT INTO edu.grade_levels (grade_level_name, value) VALUES (%s, %s) RETURNING *",
+        (data.grade_level_name, data.value)
+    )
+    return await cursor.fetchone()
+
+@router.put("/grades/{id}", response_model=GradeResponse)
+async def update_grade(id: int, data: GradeUpdate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "grade_levels")
+    await cursor.execute(
+        "UPDATE edu.grade_levels SET grade_level_name=COALESCE(%s, grade_level_name), value=COALESCE(%s, value) WHERE grade_level_id=%s RETURNING *",
+        (data.grade_level_name, data.value, id)
+    )
+    res = await cursor.fetchone()
+    if not res: raise HTTPException(404, "Không tìm thấy Khối")
+    return res
+
+@router.delete("/grades/{id}")
+async def delete_grade(id: int, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "grade_levels")
+    await cursor.execute("DELETE FROM edu.grade_levels WHERE grade_level_id=%s RETURNING grade_level_id", (id,))
+    if not await cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Khối")
+    return {"message": "Xóa thành công"}
+
+# ============================================================
+# 3. GROUP CRUD: SUBJECTS (MÔN HỌC)
+# ============================================================
+@router.post("/subjects", response_model=SubjectResponse, status_code=201)
+async def create_subject(data: SubjectCreate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "subjects")
+    await cursor.execute(
+        "INSERT INTO edu.subjects (subject_name, grade_level_id) VALUES (%s, %s) RETURNING *",
+        (data.subject_name, data.grade_level_id)
+    )
+    return await cursor.fetchone()
+
+@router.put("/subjects/{id}", response_model=SubjectResponse)
+async def update_subject(id: int, data: SubjectUpdate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "subjects")
+    await cursor.execute(
+        "UPDATE edu.subjects SET subject_name=COALESCE(%s, subject_name), grade_level_id=COALESCE(%s, grade_level_id) WHERE subject_id=%s RETURNING *",
+        (data.subject_name, data.grade_level_id, id)
+    )
+    res = await cursor.fetchone()
+    if not res: raise HTTPException(404, "Không tìm thấy Môn học")
+    return res
+
+@router.delete("/subjects/{id}")
+async def delete_subject(id: int, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "subjects")
+    await cursor.execute("DELETE FROM edu.subjects WHERE subject_id=%s RETURNING subject_id", (id,))
+    if not await cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Môn học")
+    return {"message": "Xóa thành công"}
+
+# ============================================================
+# 4. GROUP CRUD: BOOKS (SÁCH)
+# ============================================================
+@router.post("/books", response_model=BookResponse, status_code=201)
+async def create_book(data: BookCreate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "books")
+    await cursor.execute(
+        "INSERT INTO edu.books (book_name, subject_id) VALUES (%s, %s) RETURNING *",
+        (data.book_name, data.subject_id)
+    )
+    return await cursor.fetchone()
+
+@router.put("/books/{id}", response_model=BookResponse)
+async def update_book(id: int, data: BookUpdate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "books")
+    await cursor.execute(
+        "UPDATE edu.books SET book_name=COALESCE(%s, book_name), subject_id=COALESCE(%s, subject_id) WHERE book_id=%s RETURNING *",
+        (data.book_name, data.subject_id, id)
+    )
+    res = await cursor.fetchone()
+    if not res: raise HTTPException(404, "Không tìm thấy Sách")
+    return res
+
+@router.delete("/books/{id}")
+async def delete_book(id: int, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "books")
+    await cursor.execute("DELETE FROM edu.books WHERE book_id=%s RETURNING book_id", (id,))
+    if not await cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Sách")
+    return {"message": "Xóa thành công"}
+
+# ============================================================
+# 5. GROUP CRUD: CHAPTERS (CHƯƠNG)
+# ============================================================
+@router.post("/chapters", response_model=ChapterResponse, status_code=201)
+async def create_chapter(data: ChapterCreate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "chapters")
+    await cursor.execute(
+        "INSERT INTO edu.chapters (chapter_name, book_id, order_number) VALUES (%s, %s, %s) RETURNING *",
+        (data.chapter_name, data.book_id, data.order_number)
+    )
+    return await cursor.fetchone()
+
+@router.put("/chapters/{id}", response_model=ChapterResponse)
+async def update_chapter(id: int, data: ChapterUpdate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "chapters")
+    await cursor.execute(
+        "UPDATE edu.chapters SET chapter_name=COALESCE(%s, chapter_name), order_number=COALESCE(%s, order_number) WHERE chapter_id=%s RETURNING *",
+        (data.chapter_name, data.order_number, id)
+    )
+    res = await cursor.fetchone()
+    if not res: raise HTTPException(404, "Không tìm thấy Chương")
+    return res
+
+@router.delete("/chapters/{id}")
+async def delete_chapter(id: int, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "chapters")
+    await cursor.execute("DELETE FROM edu.chapters WHERE chapter_id=%s RETURNING chapter_id", (id,))
+    if not await cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Chương")
+    return {"message": "Xóa thành công"}
+
+# ============================================================
+# 6. GROUP CRUD: LESSONS (BÀI HỌC)
+# ============================================================
+@router.post("/lessons", response_model=LessonResponse, status_code=201)
+async def create_lesson(data: LessonCreate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "lessons")
+    await cursor.execute(
+        "INSERT INTO edu.lessons (lesson_name, chapter_id, description, order_number) VALUES (%s, %s, %s, %s) RETURNING *",
+        (data.lesson_name, data.chapter_id, data.description, data.order_number)
+    )
+    return await cursor.fetchone()
+
+@router.put("/lessons/{id}", response_model=LessonResponse)
+async def update_lesson(id: int, data: LessonUpdate, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "lessons")
+    await cursor.execute(
+        """UPDATE edu.lessons 
+           SET lesson_name=COALESCE(%s, lesson_name), 
+               description=COALESCE(%s, description),
+               order_number=COALESCE(%s, order_number)
+           WHERE lesson_id=%s RETURNING *""",
+        (data.lesson_name, data.description, data.order_number, id)
+    )
+    res = await cursor.fetchone()
+    if not res: raise HTTPException(404, "Không tìm thấy Bài học")
+    return res
+
+@router.delete("/lessons/{id}")
+async def delete_lesson(id: int, user=Depends(get_current_user), cursor=Depends(get_async_db_cursor)):
+    check_is_admin(user)
+    await tree_changed(cursor, "lessons")
+    await cursor.execute("DELETE FROM edu.lessons WHERE lesson_id=%s RETURNING lesson_id", (id,))
+    if not await cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Bài học")
+    return {"message": "Xóa thành công"}
+
+# ============================================================
+# 7. GROUP CRUD: KNOWLEDGE UNITS (ĐƠN VỊ KIẾN THỨC)
+# ============================================================
+
+@router.post("/knowledge-units", response_model=KnowledgeUnitResponse, status_code=201)
+async def create_unit(
+    data: KnowledgeUnitCreate, 
+    user: dict = Depends(get_current_user), # Đã import từ app.api.aio.deps
+    cursor = Depends(get_async_db_cursor)         # Đã import từ app.db.async_session
+):
+    """
+    Tạo mới một Knowledge Unit
+    """
+    check_is_admin(user) # Chỉ Admin mới được tạo
+    await tree_changed(cursor, "knowledge_units")
+    
+    query = """
+        INSERT INTO edu.knowledge_units (content, lesson_id, knowledge_type) 
+        VALUES (%s, %s, %s) 
+        RETURNING knowledge_unit_id, content, lesson_id, knowledge_type
+    """
+    try:
+        await cursor.execute(query, (data.content, data.lesson_id, data.knowledge_type))
+        return await cursor.fetchone()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Lỗi tạo Unit: {str(e)}")
+
+@router.put("/knowledge-units/{id}", response_model=KnowledgeUnitResponse)
+async def update_unit(
+    id: int, 
+    data: KnowledgeUnitUpdate, 
+    user: dict = Depends(get_current_user), 
+    cursor = Depends(get_async_db_cursor)
+):
+    """
+    Cập nhật Knowledge Unit
+    """
+    check_is_admin(user)
+    await tree_changed(cursor, "knowledge_units")
+    
+    query = """
+        UPDATE edu.knowledge_units 
+        SET content = COALESCE(%s, content), 
+            knowledge_type = COALESCE(%s, knowledge_type) 
+        WHERE knowledge_unit_id = %s 
+        RETURNING knowledge_unit_id, content, lesson_id, knowledge_type
+    """
+    try:
+        await cursor.execute(query, (data.content, data.knowledge_type, id))
+        updated_unit = await cursor.fetchone()
+        
+        if not updated_unit:
+            raise HTTPException(status_code=404, detail="Không tìm thấy Đơn vị kiến thức")
+            
+        return updated_unit
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Lỗi cập nhật Unit: {str(e)}")
+
+@router.delete("/knowledge-units/{id}")
+async def delete_unit(
+    id: int, 
+    user: dict = Depends(get_current_user), 
+    cursor = Depends(get_async_db_cursor)
+):
+    """
+    Xóa Knowledge Unit
+    """
+    check_is_admin(user)
+    await tree_changed(cursor, "knowledge_units")
+    
+    query = "DELETE FROM edu.knowledge_units WHERE knowledge_unit_id = %s RETURNING knowledge_unit_id"
+    
+    try:
+        await cursor.execute(query, (id,))
+        if not await cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Không tìm thấy Đơn vị kiến thức")
+        return {"message": "Xóa thành công", "id": id}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi xóa Unit: {str(e)}")
\ No newline at end of file
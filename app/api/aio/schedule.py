@@ -0,0 +1,273 @@
+# app/api/aio/schedule.py
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Header
+from fastapi.responses import StreamingResponse
+from datetime import date
+from typing import List, Literal, Optional
+from psycopg import errors
+
+from app.core.config import settings
+from app.db.async_session import get_async_db_cursor
+from app.db.notify import apublish_change
+from app.api.aio.deps import get_current_user, get_stream_user
+from app.schemas.schedule import (
+    ScheduleDTO, ScheduleCreate,
+    RecurringScheduleCreate, RecurringScheduleResult
+)
+from app.services.schedule_stream import (
+    ScheduleSubscription, apublish_schedule_event, schedule_stream_hub, updated_event_data,
+)
+from app.services.schedule_export import astream_export, export_filename
+from app.services.schedules import (
+    INSERT_SCHEDULE_SQL, UPDATE_SCHEDULE_SQL, get_weekday_str, overlap_message,
+    build_schedule_range_query, decode_schedule_cursor, schedule_page, schedule_teacher_filter,
+    MAX_RECURRING_OCCURRENCES, RECURRING_CONFLICT_SQL, RECURRING_INSERT_SQL,
+    count_weekly_occurrences, expand_weekly_slots, recurring_conflict_params, recurring_insert_params,
+    skipped_by_database, split_existing_conflicts, split_request_conflicts,
+)
+
+router = APIRouter()
+
+# ==========================================
+# 1. GET: Lấy danh sách lịch dạy
+# ==========================================
+@router.get("/schedules", response_model=List[ScheduleDTO])
+async def get_schedules(
+    response: Response,
+    start_date: date = Query(..., description="Ngày bắt đầu (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Ngày kết thúc (YYYY-MM-DD)"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.SCHEDULE_PAGE_MAX, description="Bỏ trống = cả khoảng ngày"),
+    cursor_token: Optional[str] = Query(None, alias="cursor", description="Header X-Next-Cursor của trang trước"),
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    """
+    Lịch dạy trong khoảng ngày, sắp theo (ngày, tiết, id).
+    - Không có limit / cursor: trả cả khoảng ngày như trước (client cũ không bị cắt).
+    - Có ?limit: tối đa `limit` dòng; còn dữ liệu -> header X-Next-Cursor, gọi lại với
+      ?cursor=<giá trị header> để lấy trang sau (thiếu limit -> SCHEDULE_PAGE_DEFAULT).
+    Cần toàn bộ khoảng dài (cả năm học): nên dùng /schedules/export.ics hoặc .csv.
+    """
+    try:
+        keyset = decode_schedule_cursor(cursor_token, start_date, end_date) if cursor_token else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if keyset is not None and limit is None:
+        limit = settings.SCHEDULE_PAGE_DEFAULT
+
+    sql, params = build_schedule_range_query(
+        start_date, end_date, schedule_teacher_filter(current_user), keyset, limit
+    )
+
+    try:
+        await cursor.execute(sql, tuple(params))
+        rows = await cursor.fetchall()
+        next_cursor = None
+        if limit is not None:
+            rows, next_cursor = schedule_page(rows, start_date, end_date, limit)
+    except Exception as e:
+        raise HTTPException(500, f"Lỗi tải lịch: {str(e)}")
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+# ==========================================
+# 1b. GET: Xuất lịch ra file (iCalendar / CSV), đọc và gửi theo luồng
+# ==========================================
+@router.get("/schedules/export.{extension}", response_class=StreamingResponse)
+async def export_schedules(
+    extension: Literal["ics", "csv"],
+    start_date: date = Query(..., description="Ngày bắt đầu (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Ngày kết thúc (YYYY-MM-DD)"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Xuất toàn bộ lịch trong khoảng ngày (không phân trang, bộ nhớ không đổi theo số dòng)."""
+    teacher_id = schedule_teacher_filter(current_user)
+    body = astream_export(start_date, end_date, teacher_id, extension)
+    media_type = "text/calendar" if extension == "ics" else "text/csv"  # Starlette tự thêm charset=utf-8
+    filename = export_filename(start_date, end_date, extension)
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# ==========================================
+# 1c. GET: Nhận thay đổi lịch theo thời gian thực (Server-Sent Events)
+# ==========================================
+@router.get("/schedules/stream", response_class=StreamingResponse)
+async def stream_schedules(
+    start_date: date = Query(..., description="Ngày bắt đầu (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Ngày kết thúc (YYYY-MM-DD)"),
+    teacher_id: Optional[int] = Query(None, description="Chỉ lịch của giáo viên này"),
+    class_id: Optional[int] = Query(None, description="Chỉ lịch của lớp này"),
+    last_event_id: Optional[str] = Header(None, description="Trình duyệt tự gửi khi nối lại"),
+    current_user: dict = Depends(get_stream_user),
+):
+    """Giống bản sync (app/api/schedule.py), dùng chung hub sự kiện của worker."""
+    if end_date < start_date:
+        raise HTTPException(400, "Ngày kết thúc phải sau ngày bắt đầu.")
+    own_teacher = schedule_teacher_filter(current_user)
+    subscription = ScheduleSubscription(
+        start_date, end_date, own_teacher if own_teacher is not None else teacher_id, class_id
+    )
+    if not schedule_stream_hub.has_capacity():
+        raise HTTPException(503, "Hệ thống đang quá tải, vui lòng thử lại sau.", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        schedule_stream_hub.stream(subscription, last_event_id), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ==========================================
+# 2. POST: Tạo lịch mới
+# ==========================================
+@router.post("/schedules", response_model=ScheduleDTO, status_code=201)
+async def create_schedule(
+    data: ScheduleCreate,
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    # 1. Tính thứ trong tuần (Dùng schedule_date)
+    week_day_str = get_weekday_str(data.schedule_date) 
+    teacher_id = current_user['user_id']
+
+    if data.start_period > data.end_period:
+        raise HTTPException(400, "Tiết bắt đầu phải nhỏ hơn hoặc bằng tiết kết thúc.")
+
+    # 2. Insert + fetch lại data đầy đủ trong 1 câu lệnh (DB chặn trùng lịch)
+    try:
+        await cursor.execute(INSERT_SCHEDULE_SQL, (
+            data.class_id, data.lesson_id, teacher_id, 
+            data.schedule_date, week_day_str, data.start_period, data.end_period
+        ))
+        row = await cursor.fetchone()
+        await apublish_change(cursor, "schedules", row['schedule_id'])
+        await apublish_schedule_event(cursor, "created", dict(row, teacher_id=teacher_id))
+        return row
+
+    except errors.ExclusionViolation as e:
+        message = overlap_message(e, week_day_str)
+        if message is None:
+            raise HTTPException(500, f"Lỗi tạo lịch: {str(e)}")
+        raise HTTPException(400, message)
+    except Exception as e:
+        raise HTTPException(500, f"Lỗi tạo lịch: {str(e)}")
+    
+# ==========================================
+# 2b. POST: Tạo lịch lặp lại hàng tuần (cả học kỳ)
+# ==========================================
+@router.post("/schedules/recurring", response_model=RecurringScheduleResult, status_code=201)
+async def create_recurring_schedule(
+    data: RecurringScheduleCreate,
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    """Giống bản sync (app/api/schedule.py): 1 query kiểm tra trùng + 1 câu lệnh insert."""
+    teacher_id = current_user['user_id']
+
+    if data.end_date < data.start_date:
+        raise HTTPException(400, "Ngày kết thúc phải sau ngày bắt đầu.")
+    for slot in data.slots:
+        if slot.start_period > slot.end_period:
+            raise HTTPException(400, "Tiết bắt đầu phải nhỏ hơn hoặc bằng tiết kết thúc.")
+
+    total = count_weekly_occurrences(data)
+    if total > MAX_RECURRING_OCCURRENCES:
+        raise HTTPException(400, f"Quá nhiều buổi học ({total}), tối đa {MAX_RECURRING_OCCURRENCES} buổi mỗi lần tạo.")
+
+    accepted, conflicts = split_request_conflicts(expand_weekly_slots(data))
+
+    to_insert = accepted
+    if accepted:
+        await cursor.execute(RECURRING_CONFLICT_SQL, recurring_conflict_params(teacher_id, data.class_id, accepted))
+        to_insert, existing = split_existing_conflicts(accepted, await cursor.fetchall())
+        conflicts.extend(existing)
+
+    created = []
+    if to_insert:
+        try:
+            await cursor.execute(RECURRING_INSERT_SQL, recurring_insert_params(teacher_id, data.class_id, to_insert))
+            created = await cursor.fetchall()
+            if created:
+                await apublish_change(cursor, "schedules")
+                await apublish_schedule_event(cursor, "invalidate", {
+                    "teacher_id": teacher_id, "class_id": data.class_id,
+                    "start_date": created[0]['schedule_date'], "end_date": created[-1]['schedule_date'],
+                })
+        except Exception as e:
+            raise HTTPException(500, f"Lỗi tạo lịch: {str(e)}")
+        conflicts.extend(skipped_by_database(to_insert, created))
+
+    conflicts.sort(key=lambda o: (o["schedule_date"], o["start_period"]))
+    return {"created": created, "conflicts": conflicts}
+
+# ==========================================
+# 3. PUT: Cập nhật lịch (MỚI - SỬA LỖI TRÙNG LỊCH)
+# ==========================================
+@router.put("/schedules/{schedule_id}", response_model=ScheduleDTO)
+async def update_schedule(
+    schedule_id: int,
+    data: ScheduleCreate,
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    # 1. Tính thứ trong tuần
+    week_day_str = get_weekday_str(data.schedule_date)
+
+    if data.start_period > data.end_period:
+        raise HTTPException(400, "Tiết bắt đầu phải nhỏ hơn hoặc bằng tiết kết thúc.")
+
+    # 2. Update + fetch lại data đầy đủ trong 1 câu lệnh (DB chặn trùng lịch)
+    try:
+        await cursor.execute(UPDATE_SCHEDULE_SQL, (
+            data.class_id, data.lesson_id, 
+            data.schedule_date, week_day_str, data.start_period, data.end_period,
+            schedule_id
+        ))
+        row = await cursor.fetchone()
+        
+        # Kiểm tra xem update có thành công không (có dòng nào bị tác động không)
+        if row is None:
+             raise HTTPException(404, "Không tìm thấy lịch dạy hoặc bạn không có quyền sửa.")
+        await apublish_change(cursor, "schedules", schedule_id)
+        await apublish_schedule_event(cursor, "updated", updated_event_data(row))
+        return row
+
+    except errors.ExclusionViolation as e:
+        message = overlap_message(e, week_day_str)
+        if message is None:
+            raise HTTPException(500, f"Lỗi cập nhật lịch: {str(e)}")
+        raise HTTPException(400, message)
+    except Exception as e:
+        # Nếu đã raise HTTP exception ở trên thì ném tiếp
+        if isinstance(e, HTTPException):
+            raise e
+        raise HTTPException(500, f"Lỗi cập nhật lịch: {str(e)}")
+
+# ==========================================
+# 3. DELETE: Xóa lịch (Giữ nguyên logic cũ vì xóa theo ID)
+# ==========================================
+@router.delete("/schedules/{id}")
+async def delete_schedule(
+    id: int,
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    check_owner_sql = "SELECT teacher_id FROM edu.schedules WHERE schedule_id = %s"
+    await cursor.execute(check_owner_sql, (id,))
+    row = await cursor.fetchone()
+    
+    if not row:
+        raise HTTPException(404, "Không tìm thấy lịch dạy")
+        
+    if current_user['role'] != 'admin' and row['teacher_id'] != current_user['user_id']:
+        raise HTTPException(403, "Bạn không có quyền xóa lịch dạy của người khác")
+
+    await cursor.execute(
+        "DELETE FROM edu.schedules WHERE schedule_id = %s RETURNING schedule_id, teacher_id, class_id, schedule_date",
+        (id,)
+    )
+    deleted = await cursor.fetchone()
+    await apublish_change(cursor, "schedules", id)
+    if deleted:
+        await apublish_schedule_event(cursor, "deleted", dict(deleted))
+    return {"message": "Xóa thành công", "id": id}
\ No newline at end of file
@@ -0,0 +1,288 @@
+# app/api/aio/school.py
+from itertools import islice
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File, Form
+from starlette.concurrency import run_in_threadpool
+from app.db.async_session import get_async_db_cursor
+from app.db.notify import apublish_change
+from app.schemas.school import (
+    ClassDTO, ClassCreate, ClassSummaryDTO, StudentDTO, StudentCreate, StudentImportResult, StudentPage
+)
+from app.api.aio.deps import get_current_user 
+from typing import List, Optional
+from app.services.rosters import (
+    CLASS_OWNER_SQL, CLASS_SUMMARY_SQL, ROSTER_DEFAULT_LIMIT, ROSTER_MAX_LIMIT, SCHOOL_DATA_SQL,
+    RosterSort, SortOrder, build_roster_query, roster_page
+)
+from app.schemas.school import ClassWithLessonsDTO
+from app.services.student_import import IMPORT_BATCH_SIZE, AsyncStudentImporter, ImportFormatError, iter_upload_rows
+
+router = APIRouter()
+
+# --- 1. GET: Lấy danh sách ---
+@router.get("/school-data", response_model=List[ClassDTO])
+async def get_school_data(
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    try:
+        await cursor.execute(SCHOOL_DATA_SQL, (current_user['user_id'],))
+        results = await cursor.fetchall()
+        return results
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- 1b. GET: Bản tóm tắt (không kèm học sinh, chỉ số đếm) ---
+@router.get("/school-data/summary", response_model=List[ClassSummaryDTO])
+async def get_school_data_summary(
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    try:
+        await cursor.execute(CLASS_SUMMARY_SQL, (current_user['user_id'],))
+        return await cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- 1c. GET: Học sinh của 1 lớp (phân trang keyset) ---
+@router.get("/classes/{class_id}/students", response_model=StudentPage)
+async def get_class_students(
+    class_id: int,
+    status_filter: Optional[str] = Query(None, alias="status", description="Lọc theo trạng thái, VD: Hoạt động"),
+    sort: RosterSort = Query("full_name"),
+    order: SortOrder = Query("asc"),
+    cursor_token: Optional[str] = Query(None, alias="cursor", description="next_cursor của trang trước"),
+    limit: int = Query(ROSTER_DEFAULT_LIMIT, ge=1, le=ROSTER_MAX_LIMIT),
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    await cursor.execute(CLASS_OWNER_SQL, (class_id,))
+    owner = await cursor.fetchone()
+    if owner is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy lớp học")
+    if current_user['role'] != 'admin' and owner['teacher_id'] != current_user['user_id']:
+        raise HTTPException(status_code=403, detail="Bạn không có quyền xem học sinh của lớp này")
+
+    try:
+        sql, params = build_roster_query(class_id, status_filter, sort, order, cursor_token, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await cursor.execute(sql, tuple(params))
+    return roster_page(await cursor.fetchall(), status_filter, sort, order, limit)
+
+# --- 2. POST: Tạo lớp học ---
+@router.post("/classes", response_model=ClassDTO, status_code=status.HTTP_201_CREATED)
+async def create_class(
+    class_in: ClassCreate, 
+    current_user: dict = Depends(get_current_user), 
+    cursor = Depends(get_async_db_cursor)
+):
+    # 1. Tìm hoặc tạo trường học
+    await cursor.execute("SELECT school_id FROM edu.schools WHERE name = %s", (class_in.school_name,))
+    school_row = await cursor.fetchone()
+    
+    if school_row:
+        school_id = school_row['school_id']
+    else:
+        await cursor.execute(
+            "INSERT INTO edu.schools (name) VALUES (%s) RETURNING school_id", 
+            (class_in.school_name,)
+        )
+        school_id = (await cursor.fetchone())['school_id']
+
+    # 2. Tạo Lớp (Thêm grade_level và teacher_id)
+    sql = """
+        INSERT INTO edu.classes 
+        (class_name, school_id, subject_name, grade_level, start_year, end_year, status, teacher_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING class_id, class_name, subject_name, grade_level, start_year, end_year, status as class_status, teacher_id
+    """
+    
+    await cursor.execute(sql, (
+        class_in.class_name, 
+        school_id, 
+        class_in.subject_name,
+        class_in.grade_level,
+        class_in.start_year, 
+        class_in.end_year, 
+        class_in.class_status,
+        current_user['user_id']
+    ))
+    
+    new_class = await cursor.fetchone()
+    await apublish_change(cursor, "classes", new_class['class_id'])
+    
+    return {
+        **new_class,
+        "school_name": class_in.school_name,
+        "students": []
+    }
+
+# --- 3. PUT: Cập nhật lớp học ---
+@router.put("/classes/{class_id}", response_model=ClassDTO)
+async def update_class(
+    class_id: int, 
+    class_in: ClassCreate, 
+    current_user: dict = Depends(get_current_user), 
+    cursor = Depends(get_async_db_cursor)
+):
+    # 1. Xử lý trường học
+    await cursor.execute("SELECT school_id FROM edu.schools WHERE name = %s", (class_in.school_name,))
+    school_row = await cursor.fetchone()
+    if school_row:
+        school_id = school_row['school_id']
+    else:
+        await cursor.execute("INSERT INTO edu.schools (name) VALUES (%s) RETURNING school_id", (class_in.school_name,))
+        school_id = (await cursor.fetchone())['school_id']
+
+    # 2. Update lớp (Thêm grade_level)
+    sql = """
+        UPDATE edu.classes 
+        SET class_name=%s, school_id=%s, subject_name=%s, grade_level=%s, start_year=%s, end_year=%s, status=%s
+        WHERE class_id = %s
+        RETURNING class_id, class_name, subject_name, grade_level, start_year, end_year, status as class_status, teacher_id
+    """
+    await cursor.execute(sql, (
+        class_in.class_name, school_id, class_in.subject_name, class_in.grade_level,
+        class_in.start_year, class_in.end_year, class_in.class_status,
+        class_id
+    ))
+    updated_class = await cursor.fetchone()
+    
+    if not updated_class:
+        raise HTTPException(status_code=404, detail="Không tìm thấy lớp học")
+    await apublish_change(cursor, "classes", class_id)
+
+    return {
+        **updated_class,
+        "school_name": class_in.school_name,
+        "students": [] 
+    }
+
+# --- 4. POST: Tạo học sinh ---
+@router.post("/students", response_model=StudentDTO, status_code=status.HTTP_201_CREATED)
+async def create_student(student_in: StudentCreate, cursor = Depends(get_async_db_cursor)):
+    sql = """
+        INSERT INTO edu.students (full_name, class_id, date_of_birth, email, phone_number, status)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        RETURNING student_id, full_name, date_of_birth, email, phone_number, status
+    """
+    try:
+        await cursor.execute(sql, (
+            student_in.full_name, student_in.class_id, student_in.date_of_birth,
+            student_in.email, student_in.phone_number, student_in.status
+        ))
+        return await cursor.fetchone()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# --- 4b. POST: Nhập học sinh hàng loạt từ file CSV / XLSX ---
+@router.post("/students/import", response_model=StudentImportResult, status_code=status.HTTP_201_CREATED)
+async def import_students(
+    file: UploadFile = File(..., description="File CSV (UTF-8) hoặc XLSX, dòng đầu là tiêu đề cột"),
+    class_id: Optional[int] = Form(None, description="Lớp mặc định cho các dòng không có cột class_id"),
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    """
+    Giống bản sync (app/api/school.py). Đọc / parse file là việc chặn (CPU, đĩa)
+    -> chạy trong threadpool từng lô IMPORT_BATCH_SIZE dòng, không giữ event loop.
+    """
+    importer = AsyncStudentImporter(cursor, current_user, default_class_id=class_id)
+    try:
+        # Dòng 1 là tiêu đề -> dữ liệu bắt đầu từ dòng 2
+        rows = enumerate(iter_upload_rows(file.filename, file.file), start=2)
+        while True:
+            chunk = await run_in_threadpool(list, islice(rows, IMPORT_BATCH_SIZE))
+            if not chunk:
+                break
+            for row_number, row in chunk:
+                if row is not None:
+                    await importer.add(row_number, row)
+        return await importer.finish()
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# --- 5. PUT: Cập nhật học sinh ---
+@router.put("/students/{student_id}", response_model=StudentDTO)
+async def update_student(student_id: int, student_in: StudentCreate, cursor = Depends(get_async_db_cursor)):
+    sql = """
+        UPDATE edu.students 
+        SET full_name=%s, class_id=%s, date_of_birth=%s, email=%s, phone_number=%s, status=%s
+        WHERE student_id = %s
+        RETURNING student_id, full_name, date_of_birth, email, phone_number, status
+    """
+    await cursor.execute(sql, (
+        student_in.full_name, student_in.class_id, student_in.date_of_birth,
+        student_in.email, student_in.phone_number, student_in.status,
+        student_id
+    ))
+    updated_student = await cursor.fetchone()
+    
+    if not updated_student:
+        raise HTTPException(status_code=404, detail="Không tìm thấy học sinh")
+        
+    return updated_student
+
+@router.get("/teacher/classes-lessons", response_model=List[ClassWithLessonsDTO])
+async def get_teacher_classes_with_lessons(
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_async_db_cursor)
+):
+    """
+    Lấy danh sách các lớp mà giáo viên đang dạy.
+    Với mỗi lớp, tự động tìm ra danh sách bài học tương ứng dựa trên Khối (Grade) và Môn (Subject).
+    """
+    
+    # Logic JOIN phức tạp:
+    # 1. Lấy các lớp do giáo viên này dạy (c.teacher_id = user_id)
+    # 2. JOIN sang bảng GradeLevels dựa trên c.grade_level (VD: số 10)
+    # 3. JOIN sang bảng Subjects dựa trên GradeLevels.id VÀ c.subject_name (VD: "Toán")
+    # 4. Từ Subject -> Books -> Chapters -> Lessons để lấy danh sách bài
+    
+    sql = """
+        SELECT 
+            c.class_id,
+            c.class_name,
+            s.name as school_name,
+            c.subject_name,
+            c.grade_level,
+            
+            -- Gom nhóm danh sách bài học thành JSON
+            COALESCE(
+                json_agg(
+                    json_build_object(
+                        'lesson_id', l.lesson_id,
+                        'lesson_name', l.lesson_name,
+                        'chapter_name', ch.chapter_name
+                    ) ORDER BY l.order_number
+                ) FILTER (WHERE l.lesson_id IS NOT NULL), 
+                '[]'
+            ) as lessons
+            
+        FROM edu.classes c
+        JOIN edu.schools s ON c.school_id = s.school_id
+        
+        -- Cầu nối 1: Tìm ID của Khối lớp (dựa trên số 10, 11...)
+        LEFT JOIN edu.grade_levels g ON g.value = c.grade_level
+        
+        -- Cầu nối 2: Tìm ID của Môn học (dựa trên Khối ID và Tên môn)
+        LEFT JOIN edu.subjects sub ON sub.grade_level_id = g.grade_level_id 
+                                   AND sub.subject_name = c.subject_name
+                                   
+        -- Đi xuống cây kiến thức để lấy bài học
+        LEFT JOIN edu.books b ON b.subject_id = sub.subject_id
+        LEFT JOIN edu.chapters ch ON ch.book_id = b.book_id
+        LEFT JOIN edu.lessons l ON l.chapter_id = ch.chapter_id
+        
+        WHERE c.teacher_id = %s
+        
+        GROUP BY c.class_id, s.name, c.subject_name, c.grade_level
+        ORDER BY c.class_id DESC;
+    """
+    
+    try:
+        await cursor.execute(sql, (current_user['user_id'],))
+        return await cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi lấy dữ liệu lớp học & bài giảng: {str(e)}")
\ No newline at end of file
@@ -1,29 +1,60 @@
 # app/api/auth.py
-from fastapi import APIRouter, Depends, HTTPException, status
+import math
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from datetime import timedelta
+from typing import Optional
 from fastapi.security import OAuth2PasswordRequestForm
 
 # Import các thành phần cần thiết
-from app.core.security import verify_password, create_access_token, get_password_hash
-from app.db.session import get_db_cursor
+from app.core.security import averify_and_update_password, create_access_token, get_password_hash
+from app.core.rate_limit import login_username_limiter, login_ip_limiter
+from app.db.session import get_db_cursor, primary_cursor
+from app.db.notify import publish_change
+from app.api.deps import user_cache, invalidate_cached_user
 from app.schemas import LoginRequest, TokenResponse, UserCreate, UserResponse
 
 router = APIRouter()
 
+def check_login_rate(request: Request, username: str):
+    """Token bucket theo username và theo IP, kiểm tra TRƯỚC khi tốn công băm mật khẩu."""
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = max(login_username_limiter.hit(username.lower()), login_ip_limiter.hit(client_ip))
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Đăng nhập quá nhiều lần, vui lòng thử lại sau.",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+
+def _fetch_login_user(username: str) -> Optional[dict]:
+    # Primary: trạng thái khóa / mật khẩu phải là bản mới nhất
+    with primary_cursor() as cursor:
+        cursor.execute("SELECT * FROM edu.users WHERE username = %s", (username,))
+        user = cursor.fetchone()
+    return dict(user) if user else None
+
+def _store_password_hash(user_id: int, new_hash: str):
+    with primary_cursor(commit=True) as cursor:
+        cursor.execute("UPDATE edu.users SET password_hash = %s WHERE user_id = %s", (new_hash, user_id))
+
 # --- 1. API Login ---
 @router.post("/login", response_model=TokenResponse)
-def login(
+async def login(
     # 2. Thay LoginRequest bằng OAuth2PasswordRequestForm
-    form_data: OAuth2PasswordRequestForm = Depends(), 
-    cursor = Depends(get_db_cursor)
+    request: Request,
+    form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
     API đăng nhập: Nhận username/password (Form Data) -> Trả về JWT Token
+    Không giữ kết nối DB hay thread nào trong lúc băm mật khẩu: đọc user (trả kết
+    nối ngay) -> băm (await hồ tiến trình) -> transaction ngắn nếu cần lưu hash mới.
+    Đợt đăng nhập lớn vì vậy không làm cạn hồ kết nối của các API khác.
     """
+    check_login_rate(request, form_data.username)
+
     # A. Tìm user (Dùng form_data.username thay vì login_data.username)
-    query = "SELECT * FROM edu.users WHERE username = %s"
-    cursor.execute(query, (form_data.username,))
-    user = cursor.fetchone()
+    user = await run_in_threadpool(_fetch_login_user, form_data.username)
 
     # B. Kiểm tra User tồn tại
     if not user:
@@ -32,13 +63,24 @@ def login(
             detail="Tài khoản không tồn tại hoặc sai tên đăng nhập"
         )
 
+    # Làm mới cache xác thực bằng bản ghi vừa đọc (trạng thái/role mới nhất)
+    user_cache.set(user['username'], dict(user))
+
     # C. Kiểm tra Mật khẩu (Dùng form_data.password)
-    if not verify_password(form_data.password, user['password_hash']):
+    # (Băm trong hồ tiến trình riêng, xem app/core/security.py)
+    verified, new_hash = await averify_and_update_password(form_data.password, user['password_hash'])
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Mật khẩu không chính xác"
         )
 
+    # Hash dùng cost cũ (BCRYPT_ROUNDS đã đổi) -> lưu hash mới
+    if new_hash:
+        await run_in_threadpool(_store_password_hash, user['user_id'], new_hash)
+        user['password_hash'] = new_hash
+        user_cache.set(user['username'], dict(user))
+
     # D. Kiểm tra Trạng thái
     if user['status'] != 'Hoạt động':
         raise HTTPException(
@@ -100,6 +142,8 @@ def create_user(user_in: UserCreate, cursor = Depends(get_db_cursor)):
         ))
         
         new_user = cursor.fetchone()
+        invalidate_cached_user(new_user['username'])
+        publish_change(cursor, "users", new_user['username'])
         return new_user
         
     except Exception as e:
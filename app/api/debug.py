@@ -0,0 +1,33 @@
+# app/api/debug.py
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from app.api.deps import get_current_user
+from app.core.profiling import list_profiles, read_profile
+
+router = APIRouter()
+
+def check_is_admin(user: dict):
+    if user.get('role') != 'admin':
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Chỉ Quản trị viên mới được xem dữ liệu profile."
+        )
+
+# --- 1. GET: Danh sách profile đã lưu (mới nhất trước) ---
+@router.get("/debug/profiles")
+def get_profiles(current_user: dict = Depends(get_current_user)):
+    check_is_admin(current_user)
+    return list_profiles()
+
+# --- 2. GET: Tải 1 profile (folded stacks, mở bằng speedscope / flamegraph.pl) ---
+@router.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, current_user: dict = Depends(get_current_user)):
+    check_is_admin(current_user)
+    content = read_profile(profile_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy profile")
+    return PlainTextResponse(
+        content,
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}"'}
+    )
@@ -1,12 +1,15 @@
+import time
 from typing import Generator, Optional
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from pydantic import ValidationError
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 from app.core.security import ALGORITHM
-from app.db.session import get_db_cursor
+from app.db.notify import subscribe
+from app.db.session import primary_cursor
 
 # 1. Cấu hình OAuth2
 # tokenUrl: Đường dẫn API Login để Swagger UI biết nơi lấy token
@@ -15,20 +18,43 @@ reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login"
 )
 
-# 2. Hàm Dependency chính: Lấy User hiện tại từ Token
-def get_current_user(
-    token: str = Depends(reusable_oauth2),
-    cursor = Depends(get_db_cursor)
-) -> dict:
+# Không báo lỗi khi thiếu header: dùng cho stream SSE (xem get_stream_user)
+optional_oauth2 = OAuth2PasswordBearer(
+    tokenUrl=f"{settings.API_V1_STR}/login", auto_error=False
+)
+
+# 2. Cache xác thực (trong tiến trình)
+# - token_cache: token -> username, bỏ qua bước kiểm tra chữ ký JWT khi gặp lại token
+# - user_cache: username -> bản ghi edu.users, bỏ qua 1 lượt query mỗi request
+#   AUTH_USER_CACHE_TTL là "cửa sổ" tối đa để thay đổi user (khóa tài khoản, đổi
+#   role/subject_id) có hiệu lực nếu không được invalidate trực tiếp.
+token_cache = TTLCache(maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_TTL)
+user_cache = TTLCache(maxsize=settings.AUTH_USER_CACHE_SIZE, ttl=settings.AUTH_USER_CACHE_TTL)
+
+def invalidate_cached_user(username: Optional[str] = None):
     """
-    Hàm này sẽ tự động:
-    1. Nhận token từ Header Authorization (Bearer ...)
-    2. Giải mã Token để lấy username (sub)
-    3. Truy vấn Database để tìm User
-    4. Trả về object User nếu hợp lệ, hoặc báo lỗi nếu không
+    Xóa user khỏi cache khi bản ghi edu.users thay đổi.
+    Không truyền username -> xóa toàn bộ.
     """
-    
-    # A. Giải mã Token
+    if username is None:
+        user_cache.clear()
+    else:
+        user_cache.pop(username)
+
+# Worker khác (hoặc trigger DB) báo edu.users đổi -> xóa user khỏi cache (app/db/notify.py)
+subscribe("users", invalidate_cached_user)
+
+def auth_cache_stats() -> dict:
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+def decode_token_subject(token: str) -> str:
+    """
+    Giải mã Token và trả về username (sub). Kết quả được cache tới khi token hết hạn.
+    """
+    username = token_cache.get(token)
+    if username is not None:
+        return username
+
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[ALGORITHM]
@@ -48,13 +74,46 @@ def get_current_user(
             detail="Không thể xác thực token (Token hết hạn hoặc sai)",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Không cache quá thời điểm hết hạn của token
+    ttl = settings.AUTH_TOKEN_CACHE_TTL
+    if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - time.time())
+    token_cache.set(token, username, ttl=ttl)
+    return username
+
+def load_user(username: str) -> Optional[dict]:
+    """
+    Tìm user: cache trước, Database sau (kết nối mượn riêng, chỉ khi cache trượt).
+    Luôn đọc ở primary: replica đang trễ có thể trả bản ghi cũ (VD: tài khoản vừa
+    bị khóa vẫn "Hoạt động") và bản đó sẽ nằm trong cache suốt AUTH_USER_CACHE_TTL.
+    """
+    user = user_cache.get(username)
+    if user is None:
+        with primary_cursor() as cursor:
+            cursor.execute("SELECT * FROM edu.users WHERE username = %s", (username,))
+            user = cursor.fetchone()
+        if user is None:
+            return None
+        user_cache.set(username, dict(user))
+    return dict(user)
+
+# 3. Hàm Dependency chính: Lấy User hiện tại từ Token
+def get_current_user(token: str = Depends(reusable_oauth2)) -> dict:
+    """
+    Hàm này sẽ tự động:
+    1. Nhận token từ Header Authorization (Bearer ...)
+    2. Giải mã Token để lấy username (sub) - có cache
+    3. Tìm User trong cache, nếu không có thì truy vấn Database
+    4. Trả về object User nếu hợp lệ, hoặc báo lỗi nếu không
+    """
+    
+    # A. Giải mã Token (có cache)
+    username = decode_token_subject(token)
         
-    # B. Tìm User trong Database
+    # B. Tìm User (cache trước, Database sau)
     try:
-        # Query tìm user
-        query = "SELECT * FROM edu.users WHERE username = %s"
-        cursor.execute(query, (username,))
-        user = cursor.fetchone()
+        user = load_user(username)
         
         # Kiểm tra tồn tại
         if user is None:
@@ -70,7 +129,7 @@ def get_current_user(
                 detail="Tài khoản này đang bị khóa hoặc không hoạt động"
             )
             
-        # C. Trả về User (để các API khác dùng)
+        # C. Trả về User (bản sao, để các API khác dùng mà không sửa vào cache)
         return user
         
     except Exception as e:
@@ -80,4 +139,30 @@ def get_current_user(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Lỗi xác thực Database: {str(e)}"
             )
-        raise e
\ No newline at end of file
+        raise e
+
+# 3b. Dependency cho stream SSE (/schedules/stream)
+def get_stream_user(
+    token: Optional[str] = Depends(optional_oauth2),
+    access_token: Optional[str] = Query(None, description="Token khi không gửi được header (EventSource)"),
+) -> dict:
+    """
+    EventSource của trình duyệt không gửi được header Authorization -> nhận thêm
+    token qua ?access_token= (chú ý: URL có thể nằm trong log của proxy).
+    """
+    if not (token or access_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return get_current_user(token or access_token)
+
+# 4. Tìm User từ token NGOÀI luồng Depends (VD: middleware profiling)
+def find_user_by_token(token: str) -> Optional[dict]:
+    """Giống get_current_user nhưng không báo lỗi: token sai / user không tồn tại -> None."""
+    try:
+        username = decode_token_subject(token)
+    except HTTPException:
+        return None
+    return load_user(username)
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from typing import List, Dict
 
-from app.db.session import get_db_cursor
+from app.core.responses import render_json
+from app.db.session import get_db_cursor, get_read_db_cursor, on_commit, primary_cursor
+from app.db.notify import publish_change
+from app.services.lesson_catalog import LESSON_CATALOG_TABLES, lesson_catalog_cache
 from app.api.deps import get_current_user
+from app.services.knowledge_tree import (
+    fetch_knowledge_tree, fetch_subtree, get_node_subject_id, get_subject_scope,
+    knowledge_tree_cache, etag_matches
+)
 from app.schemas.knowledge import (
     # Input Schemas
     GradeCreate, GradeUpdate, GradeResponse,
@@ -12,7 +19,7 @@ from app.schemas.knowledge import (
     LessonCreate, LessonUpdate, LessonResponse,
     KnowledgeUnitCreate, KnowledgeUnitUpdate, KnowledgeUnitResponse,
     # Output Tree Schema
-    GradeDTO
+    GradeDTO, KnowledgeNodeType, KnowledgeSubtreeDTO
 )
 
 router = APIRouter()
@@ -27,104 +34,93 @@ def check_is_admin(user: dict):
             detail="Chỉ Quản trị viên mới có quyền chỉnh sửa dữ liệu."
         )
 
+# ============================================================
+# HELPER: XÓA CACHE CÂY KIẾN THỨC / DANH MỤC BÀI HỌC KHI CÓ THAY ĐỔI
+# ============================================================
+def tree_changed(cursor, table: str):
+    # Xóa ngay + xóa lần nữa sau commit (request khác có thể đã nạp lại dữ liệu cũ)
+    knowledge_tree_cache.invalidate()
+    on_commit(cursor, knowledge_tree_cache.invalidate)
+    if table in LESSON_CATALOG_TABLES:
+        # Danh mục bài học của /teacher/classes-lessons
+        lesson_catalog_cache.invalidate()
+        on_commit(cursor, lesson_catalog_cache.invalidate)
+    # Báo cho các worker khác (gửi khi commit)
+    publish_change(cursor, table)
+
 # ============================================================
 # 1. API LẤY CÂY KIẾN THỨC (THE "DIVINE" QUERY)
 # ============================================================
 @router.get("/knowledge-tree", response_model=List[GradeDTO])
 def get_knowledge_tree(
-    current_user: dict = Depends(get_current_user),
-    cursor = Depends(get_db_cursor)
+    request: Request,
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Lấy toàn bộ cây kiến thức.
     - Admin: Thấy hết.
     - Giáo viên: Chỉ thấy môn mình dạy (theo subject_id).
+    Kết quả được cache (xóa khi có thay đổi) và trả kèm ETag:
+    client gửi If-None-Match trùng ETag sẽ nhận 304 Not Modified.
+    Cache trúng / 304 không cần kết nối DB; chỉ khi trượt mới mượn 1 kết nối.
     """
-    
-    # Điều kiện lọc theo giáo viên
-    subject_filter = ""
-    params = []
-    
-    # Nếu là giáo viên và có môn phụ trách -> Thêm điều kiện lọc Subject
-    if current_user['role'] == 'giáo viên' and current_user.get('subject_id'):
-        subject_filter = "AND s.subject_id = %s"
-        params.append(current_user['subject_id'])
-
-    # Query lồng nhau 6 cấp sử dụng json_agg
-    # Cấu trúc: Grade -> Subject -> Book -> Chapter -> Lesson -> KnowledgeUnit
-    sql = f"""
-        SELECT 
-            g.grade_level_id,
-            g.grade_level_name,
-            g.value,
-            COALESCE(
-                json_agg(
-                    json_build_object(
-                        'subject_id', s.subject_id,
-                        'subject_name', s.subject_name,
-                        'books', (
-                            SELECT COALESCE(
-                                json_agg(
-                                    json_build_object(
-                                        'book_id', b.book_id,
-                                        'book_name', b.book_name,
-                                        'chapters', (
-                                            SELECT COALESCE(
-                                                json_agg(
-                                                    json_build_object(
-                                                        'chapter_id', c.chapter_id,
-                                                        'chapter_name', c.chapter_name,
-                                                        'order_number', c.order_number,
-                                                        'lessons', (
-                                                            SELECT COALESCE(
-                                                                json_agg(
-                                                                    json_build_object(
-                                                                        'lesson_id', l.lesson_id,
-                                                                        'lesson_name', l.lesson_name,
-                                                                        'description', l.description,
-                                                                        'order_number', l.order_number,
-                                                                        'knowledge_units', (
-                                                                            SELECT COALESCE(
-                                                                                json_agg(
-                                                                                    json_build_object(
-                                                                                        'knowledge_unit_id', k.knowledge_unit_id,
-                                                                                        'content', k.content,
-                                                                                        'knowledge_type', k.knowledge_type
-                                                                                    ) ORDER BY k.knowledge_unit_id
-                                                                                ), '[]'
-                                                                            )
-                                                                            FROM edu.knowledge_units k WHERE k.lesson_id = l.lesson_id
-                                                                        )
-                                                                    ) ORDER BY l.order_number
-                                                                ), '[]'
-                                                            )
-                                                            FROM edu.lessons l WHERE l.chapter_id = c.chapter_id
-                                                        )
-                                                    ) ORDER BY c.order_number
-                                                ), '[]'
-                                            )
-                                            FROM edu.chapters c WHERE c.book_id = b.book_id
-                                        )
-                                    ) ORDER BY b.book_id
-                                ), '[]'
-                            )
-                            FROM edu.books b WHERE b.subject_id = s.subject_id
-                        )
-                    ) ORDER BY s.subject_id
-                ) FILTER (WHERE s.subject_id IS NOT NULL), 
-                '[]'
-            ) as subjects
-        FROM edu.grade_levels g
-        LEFT JOIN edu.subjects s ON g.grade_level_id = s.grade_level_id {subject_filter}
-        GROUP BY g.grade_level_id
-        ORDER BY g.value;
+    scope = get_subject_scope(current_user)
+
+    cached = knowledge_tree_cache.get(scope)
+    if cached is None:
+        version = knowledge_tree_cache.version
+
+        try:
+            # Primary: cây nạp vào cache không được lấy từ replica đang trễ
+            with primary_cursor() as cursor:
+                rows = fetch_knowledge_tree(cursor, scope)
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(500, f"Lỗi lấy cây kiến thức: {str(e)}")
+
+        body = render_json(rows, List[GradeDTO])
+        cached = knowledge_tree_cache.put(scope, version, body)
+
+    etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# ============================================================
+# 1b. API LẤY TỪNG NHÁNH (LAZY, GIỚI HẠN ĐỘ SÂU)
+# ============================================================
+@router.get("/knowledge-tree/{node_type}/{node_id}", response_model=KnowledgeSubtreeDTO)
+def get_knowledge_subtree(
+    node_type: KnowledgeNodeType,
+    node_id: int,
+    depth: int = Query(1, ge=0, le=5, description="Số tầng con cần tải (0 = chỉ node gốc)"),
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_read_db_cursor)
+):
     """
-    
+    Lấy 1 nhánh của cây kiến thức (VD: 1 chương kèm bài học) thay vì cả cây.
+    - child_counts: số con của các node ở tầng cuối, để UI hiện nút mở rộng.
+    - Giáo viên: chỉ xem được nhánh thuộc môn mình dạy.
+    """
+    scope = get_subject_scope(current_user)
+
     try:
-        cursor.execute(sql, tuple(params))
-        return cursor.fetchall()
+        if scope is not None and node_type != 'grade':
+            node_subject_id = get_node_subject_id(cursor, node_type, node_id)
+            if node_subject_id is not None and node_subject_id != scope:
+                raise HTTPException(403, "Bạn chỉ được xem nội dung thuộc môn mình phụ trách.")
+
+        subtree = fetch_subtree(cursor, node_type, node_id, depth, scope)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(500, f"Lỗi lấy cây kiến thức: {str(e)}")
+        raise HTTPException(500, f"Lỗi lấy nhánh cây kiến thức: {str(e)}")
+
+    if subtree is None:
+        raise HTTPException(404, "Không tìm thấy dữ liệu")
+    return subtree
 
 # ============================================================
 # 2. GROUP CRUD: GRADES (KHỐI LỚP)
@@ -132,6 +128,7 @@ def get_knowledge_tree(
 @router.post("/grades", response_model=GradeResponse, status_code=201)
 def create_grade(data: GradeCreate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "grade_levels")
     cursor.execute(
         "INSERT INTO edu.grade_levels (grade_level_name, value) VALUES (%s, %s) RETURNING *",
         (data.grade_level_name, data.value)
@@ -141,6 +138,7 @@ def create_grade(data: GradeCreate, user=Depends(get_current_user), cursor=Depen
 @router.put("/grades/{id}", response_model=GradeResponse)
 def update_grade(id: int, data: GradeUpdate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "grade_levels")
     cursor.execute(
         "UPDATE edu.grade_levels SET grade_level_name=COALESCE(%s, grade_level_name), value=COALESCE(%s, value) WHERE grade_level_id=%s RETURNING *",
         (data.grade_level_name, data.value, id)
@@ -152,6 +150,7 @@ def update_grade(id: int, data: GradeUpdate, user=Depends(get_current_user), cur
 @router.delete("/grades/{id}")
 def delete_grade(id: int, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "grade_levels")
     cursor.execute("DELETE FROM edu.grade_levels WHERE grade_level_id=%s RETURNING grade_level_id", (id,))
     if not cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Khối")
     return {"message": "Xóa thành công"}
@@ -162,6 +161,7 @@ def delete_grade(id: int, user=Depends(get_current_user), cursor=Depends(get_db_
 @router.post("/subjects", response_model=SubjectResponse, status_code=201)
 def create_subject(data: SubjectCreate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "subjects")
     cursor.execute(
         "INSERT INTO edu.subjects (subject_name, grade_level_id) VALUES (%s, %s) RETURNING *",
         (data.subject_name, data.grade_level_id)
@@ -171,6 +171,7 @@ def create_subject(data: SubjectCreate, user=Depends(get_current_user), cursor=D
 @router.put("/subjects/{id}", response_model=SubjectResponse)
 def update_subject(id: int, data: SubjectUpdate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "subjects")
     cursor.execute(
         "UPDATE edu.subjects SET subject_name=COALESCE(%s, subject_name), grade_level_id=COALESCE(%s, grade_level_id) WHERE subject_id=%s RETURNING *",
         (data.subject_name, data.grade_level_id, id)
@@ -182,6 +183,7 @@ def update_subject(id: int, data: SubjectUpdate, user=Depends(get_current_user),
 @router.delete("/subjects/{id}")
 def delete_subject(id: int, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "subjects")
     cursor.execute("DELETE FROM edu.subjects WHERE subject_id=%s RETURNING subject_id", (id,))
     if not cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Môn học")
     return {"message": "Xóa thành công"}
@@ -192,6 +194,7 @@ def delete_subject(id: int, user=Depends(get_current_user), cursor=Depends(get_d
 @router.post("/books", response_model=BookResponse, status_code=201)
 def create_book(data: BookCreate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "books")
     cursor.execute(
         "INSERT INTO edu.books (book_name, subject_id) VALUES (%s, %s) RETURNING *",
         (data.book_name, data.subject_id)
@@ -201,6 +204,7 @@ def create_book(data: BookCreate, user=Depends(get_current_user), cursor=Depends
 @router.put("/books/{id}", response_model=BookResponse)
 def update_book(id: int, data: BookUpdate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "books")
     cursor.execute(
         "UPDATE edu.books SET book_name=COALESCE(%s, book_name), subject_id=COALESCE(%s, subject_id) WHERE book_id=%s RETURNING *",
         (data.book_name, data.subject_id, id)
@@ -212,6 +216,7 @@ def update_book(id: int, data: BookUpdate, user=Depends(get_current_user), curso
 @router.delete("/books/{id}")
 def delete_book(id: int, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "books")
     cursor.execute("DELETE FROM edu.books WHERE book_id=%s RETURNING book_id", (id,))
     if not cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Sách")
     return {"message": "Xóa thành công"}
@@ -222,6 +227,7 @@ def delete_book(id: int, user=Depends(get_current_user), cursor=Depends(get_db_c
 @router.post("/chapters", response_model=ChapterResponse, status_code=201)
 def create_chapter(data: ChapterCreate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "chapters")
     cursor.execute(
         "INSERT INTO edu.chapters (chapter_name, book_id, order_number) VALUES (%s, %s, %s) RETURNING *",
         (data.chapter_name, data.book_id, data.order_number)
@@ -231,6 +237,7 @@ def create_chapter(data: ChapterCreate, user=Depends(get_current_user), cursor=D
 @router.put("/chapters/{id}", response_model=ChapterResponse)
 def update_chapter(id: int, data: ChapterUpdate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "chapters")
     cursor.execute(
         "UPDATE edu.chapters SET chapter_name=COALESCE(%s, chapter_name), order_number=COALESCE(%s, order_number) WHERE chapter_id=%s RETURNING *",
         (data.chapter_name, data.order_number, id)
@@ -242,6 +249,7 @@ def update_chapter(id: int, data: ChapterUpdate, user=Depends(get_current_user),
 @router.delete("/chapters/{id}")
 def delete_chapter(id: int, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "chapters")
     cursor.execute("DELETE FROM edu.chapters WHERE chapter_id=%s RETURNING chapter_id", (id,))
     if not cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Chương")
     return {"message": "Xóa thành công"}
@@ -252,6 +260,7 @@ def delete_chapter(id: int, user=Depends(get_current_user), cursor=Depends(get_d
 @router.post("/lessons", response_model=LessonResponse, status_code=201)
 def create_lesson(data: LessonCreate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "lessons")
     cursor.execute(
         "INSERT INTO edu.lessons (lesson_name, chapter_id, description, order_number) VALUES (%s, %s, %s, %s) RETURNING *",
         (data.lesson_name, data.chapter_id, data.description, data.order_number)
@@ -261,6 +270,7 @@ def create_lesson(data: LessonCreate, user=Depends(get_current_user), cursor=Dep
 @router.put("/lessons/{id}", response_model=LessonResponse)
 def update_lesson(id: int, data: LessonUpdate, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "lessons")
     cursor.execute(
         """UPDATE edu.lessons 
            SET lesson_name=COALESCE(%s, lesson_name), 
@@ -276,6 +286,7 @@ def update_lesson(id: int, data: LessonUpdate, user=Depends(get_current_user), c
 @router.delete("/lessons/{id}")
 def delete_lesson(id: int, user=Depends(get_current_user), cursor=Depends(get_db_cursor)):
     check_is_admin(user)
+    tree_changed(cursor, "lessons")
     cursor.execute("DELETE FROM edu.lessons WHERE lesson_id=%s RETURNING lesson_id", (id,))
     if not cursor.fetchone(): raise HTTPException(404, "Không tìm thấy Bài học")
     return {"message": "Xóa thành công"}
@@ -294,6 +305,7 @@ def create_unit(
     Tạo mới một Knowledge Unit
     """
     check_is_admin(user) # Chỉ Admin mới được tạo
+    tree_changed(cursor, "knowledge_units")
     
     query = """
         INSERT INTO edu.knowledge_units (content, lesson_id, knowledge_type) 
@@ -317,6 +329,7 @@ def update_unit(
     Cập nhật Knowledge Unit
     """
     check_is_admin(user)
+    tree_changed(cursor, "knowledge_units")
     
     query = """
         UPDATE edu.knowledge_units 
@@ -346,6 +359,7 @@ def delete_unit(
     Xóa Knowledge Unit
     """
     check_is_admin(user)
+    tree_changed(cursor, "knowledge_units")
     
     query = "DELETE FROM edu.knowledge_units WHERE knowledge_unit_id = %s RETURNING knowledge_unit_id"
     
@@ -1,61 +1,127 @@
 # app/api/schedule.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from datetime import date
-from typing import List
+from typing import List, Literal, Optional
+from psycopg2 import errors
 
-from app.db.session import get_db_cursor
-from app.api.deps import get_current_user
-from app.schemas.schedule import ScheduleDTO, ScheduleCreate
+from app.core.config import settings
+from app.db.session import get_db_cursor, get_read_db_cursor
+from app.db.notify import publish_change
+from app.api.deps import get_current_user, get_stream_user
+from app.schemas.schedule import (
+    ScheduleDTO, ScheduleCreate,
+    RecurringScheduleCreate, RecurringScheduleResult
+)
+from app.services.schedule_stream import (
+    ScheduleSubscription, publish_schedule_event, schedule_stream_hub, updated_event_data,
+)
+from app.services.schedule_export import export_filename, iter_schedule_rows, stream_csv, stream_ics
+from app.services.schedules import (
+    INSERT_SCHEDULE_SQL, UPDATE_SCHEDULE_SQL, get_weekday_str, overlap_message,
+    build_schedule_range_query, decode_schedule_cursor, schedule_page, schedule_teacher_filter,
+    MAX_RECURRING_OCCURRENCES, RECURRING_CONFLICT_SQL, RECURRING_INSERT_SQL,
+    count_weekly_occurrences, expand_weekly_slots, recurring_conflict_params, recurring_insert_params,
+    skipped_by_database, split_existing_conflicts, split_request_conflicts,
+)
 
 router = APIRouter()
 
-# Helper: Map thứ trong tuần
-def get_weekday_str(d: date) -> str:
-    days = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"]
-    return days[d.weekday()]
-
 # ==========================================
 # 1. GET: Lấy danh sách lịch dạy
 # ==========================================
 @router.get("/schedules", response_model=List[ScheduleDTO])
 def get_schedules(
+    response: Response,
     start_date: date = Query(..., description="Ngày bắt đầu (YYYY-MM-DD)"),
     end_date: date = Query(..., description="Ngày kết thúc (YYYY-MM-DD)"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.SCHEDULE_PAGE_MAX, description="Bỏ trống = cả khoảng ngày"),
+    cursor_token: Optional[str] = Query(None, alias="cursor", description="Header X-Next-Cursor của trang trước"),
     current_user: dict = Depends(get_current_user),
-    cursor = Depends(get_db_cursor)
+    cursor = Depends(get_read_db_cursor)
 ):
-    # Cập nhật SQL: Dùng schedule_date
-    sql = """
-        SELECT 
-            s.schedule_id,
-            s.schedule_date, -- <--- Đổi tên
-            s.week_day,
-            s.start_period,
-            s.end_period,
-            s.class_id,
-            c.class_name,
-            c.subject_name,
-            s.lesson_id,
-            l.lesson_name
-        FROM edu.schedules s
-        JOIN edu.classes c ON s.class_id = c.class_id
-        LEFT JOIN edu.lessons l ON s.lesson_id = l.lesson_id
-        WHERE s.schedule_date >= %s AND s.schedule_date <= %s -- <--- Đổi tên
     """
-    params = [start_date, end_date]
+    Lịch dạy trong khoảng ngày, sắp theo (ngày, tiết, id).
+    - Không có limit / cursor: trả cả khoảng ngày như trước (client cũ không bị cắt).
+    - Có ?limit: tối đa `limit` dòng; còn dữ liệu -> header X-Next-Cursor, gọi lại với
+      ?cursor=<giá trị header> để lấy trang sau (thiếu limit -> SCHEDULE_PAGE_DEFAULT).
+    Cần toàn bộ khoảng dài (cả năm học): nên dùng /schedules/export.ics hoặc .csv.
+    """
+    try:
+        keyset = decode_schedule_cursor(cursor_token, start_date, end_date) if cursor_token else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if keyset is not None and limit is None:
+        limit = settings.SCHEDULE_PAGE_DEFAULT
 
-    if current_user['role'] == 'giáo viên':
-        sql += " AND s.teacher_id = %s"
-        params.append(current_user['user_id'])
-    
-    sql += " ORDER BY s.schedule_date, s.start_period" # <--- Đổi tên
+    sql, params = build_schedule_range_query(
+        start_date, end_date, schedule_teacher_filter(current_user), keyset, limit
+    )
 
     try:
         cursor.execute(sql, tuple(params))
-        return cursor.fetchall()
+        rows = cursor.fetchall()
+        next_cursor = None
+        if limit is not None:
+            rows, next_cursor = schedule_page(rows, start_date, end_date, limit)
     except Exception as e:
         raise HTTPException(500, f"Lỗi tải lịch: {str(e)}")
 
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return rows
+
+# ==========================================
+# 1b. GET: Xuất lịch ra file (iCalendar / CSV), đọc và gửi theo luồng
+# ==========================================
+@router.get("/schedules/export.{extension}", response_class=StreamingResponse)
+def export_schedules(
+    extension: Literal["ics", "csv"],
+    start_date: date = Query(..., description="Ngày bắt đầu (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Ngày kết thúc (YYYY-MM-DD)"),
+    current_user: dict = Depends(get_current_user),
+):
+    """Xuất toàn bộ lịch trong khoảng ngày (không phân trang, bộ nhớ không đổi theo số dòng)."""
+    teacher_id = schedule_teacher_filter(current_user)
+    rows = iter_schedule_rows(start_date, end_date, teacher_id, current_user['username'])
+    body = stream_ics(rows) if extension == "ics" else stream_csv(rows)
+    media_type = "text/calendar" if extension == "ics" else "text/csv"  # Starlette tự thêm charset=utf-8
+    filename = export_filename(start_date, end_date, extension)
+    return StreamingResponse(
+        body, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+# ==========================================
+# 1c. GET: Nhận thay đổi lịch theo thời gian thực (Server-Sent Events)
+# ==========================================
+@router.get("/schedules/stream", response_class=StreamingResponse)
+async def stream_schedules(
+    start_date: date = Query(..., description="Ngày bắt đầu (YYYY-MM-DD)"),
+    end_date: date = Query(..., description="Ngày kết thúc (YYYY-MM-DD)"),
+    teacher_id: Optional[int] = Query(None, description="Chỉ lịch của giáo viên này"),
+    class_id: Optional[int] = Query(None, description="Chỉ lịch của lớp này"),
+    last_event_id: Optional[str] = Header(None, description="Trình duyệt tự gửi khi nối lại"),
+    current_user: dict = Depends(get_stream_user),
+):
+    """
+    Stream text/event-stream các thay đổi (created / updated / deleted / invalidate / reset)
+    của lịch trong khoảng ngày; giáo viên chỉ nhận lịch của chính mình.
+    Xem app/services/schedule_stream.py.
+    """
+    if end_date < start_date:
+        raise HTTPException(400, "Ngày kết thúc phải sau ngày bắt đầu.")
+    own_teacher = schedule_teacher_filter(current_user)
+    subscription = ScheduleSubscription(
+        start_date, end_date, own_teacher if own_teacher is not None else teacher_id, class_id
+    )
+    if not schedule_stream_hub.has_capacity():
+        raise HTTPException(503, "Hệ thống đang quá tải, vui lòng thử lại sau.", headers={"Retry-After": "5"})
+    return StreamingResponse(
+        schedule_stream_hub.stream(subscription, last_event_id), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},  # nginx: không gom buffer
+    )
+
 # ==========================================
 # 2. POST: Tạo lịch mới
 # ==========================================
@@ -69,60 +135,90 @@ def create_schedule(
     week_day_str = get_weekday_str(data.schedule_date) 
     teacher_id = current_user['user_id']
 
-    # 2. Validate: Check trùng lịch của Giáo viên (Dùng schedule_date)
-    check_sql = """
-        SELECT schedule_id FROM edu.schedules 
-        WHERE teacher_id = %s 
-          AND schedule_date = %s -- <--- Đổi tên
-          AND start_period <= %s 
-          AND end_period >= %s
-    """
-    cursor.execute(check_sql, (teacher_id, data.schedule_date, data.end_period, data.start_period))
-    if cursor.fetchone():
-        raise HTTPException(400, f"Bạn đã có lịch dạy khác vào khung giờ này ({week_day_str}).")
-
-    # 3. Validate: Check trùng lịch của Lớp học (Dùng schedule_date)
-    check_class_sql = """
-        SELECT schedule_id FROM edu.schedules 
-        WHERE class_id = %s 
-          AND schedule_date = %s -- <--- Đổi tên
-          AND start_period <= %s 
-          AND end_period >= %s
-    """
-    cursor.execute(check_class_sql, (data.class_id, data.schedule_date, data.end_period, data.start_period))
-    if cursor.fetchone():
-        raise HTTPException(400, f"Lớp này đã có lịch học môn khác vào khung giờ này.")
-
-    # 4. Insert (Dùng schedule_date)
-    insert_sql = """
-        INSERT INTO edu.schedules (class_id, lesson_id, teacher_id, schedule_date, week_day, start_period, end_period)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
-        RETURNING schedule_id
-    """
+    if data.start_period > data.end_period:
+        raise HTTPException(400, "Tiết bắt đầu phải nhỏ hơn hoặc bằng tiết kết thúc.")
+
+    # 2. Insert + fetch lại data đầy đủ trong 1 câu lệnh.
+    # Trùng lịch (giáo viên / lớp) do exclusion constraint của DB chặn -> không còn race
     try:
-        cursor.execute(insert_sql, (
+        cursor.execute(INSERT_SCHEDULE_SQL, (
             data.class_id, data.lesson_id, teacher_id, 
             data.schedule_date, week_day_str, data.start_period, data.end_period
         ))
-        new_id = cursor.fetchone()['schedule_id']
-        
-        # 5. Fetch lại data đầy đủ
-        fetch_sql = """
-            SELECT 
-                s.schedule_id, s.schedule_date, s.week_day, s.start_period, s.end_period,
-                s.class_id, c.class_name, c.subject_name,
-                s.lesson_id, l.lesson_name
-            FROM edu.schedules s
-            JOIN edu.classes c ON s.class_id = c.class_id
-            LEFT JOIN edu.lessons l ON s.lesson_id = l.lesson_id
-            WHERE s.schedule_id = %s
-        """
-        cursor.execute(fetch_sql, (new_id,))
-        return cursor.fetchone()
+        row = cursor.fetchone()
+        publish_change(cursor, "schedules", row['schedule_id'])
+        publish_schedule_event(cursor, "created", dict(row, teacher_id=teacher_id))
+        return row
 
+    except errors.ExclusionViolation as e:
+        message = overlap_message(e, week_day_str)
+        if message is None:
+            raise HTTPException(500, f"Lỗi tạo lịch: {str(e)}")
+        raise HTTPException(400, message)
     except Exception as e:
         raise HTTPException(500, f"Lỗi tạo lịch: {str(e)}")
     
+# ==========================================
+# 2b. POST: Tạo lịch lặp lại hàng tuần (cả học kỳ)
+# ==========================================
+@router.post("/schedules/recurring", response_model=RecurringScheduleResult, status_code=201)
+def create_recurring_schedule(
+    data: RecurringScheduleCreate,
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_db_cursor)
+):
+    """
+    Tạo lịch theo mẫu hàng tuần trong khoảng ngày (VD: 20 tuần x 5 tiết).
+    - Kiểm tra trùng lịch (giáo viên + lớp) của TẤT CẢ các buổi bằng 1 query.
+    - Insert mọi buổi không trùng bằng 1 câu lệnh (exclusion constraint của DB
+      chặn trùng lịch phát sinh đồng thời; buổi bị chặn được báo là trùng).
+    - Trả về danh sách buổi đã tạo và báo cáo trùng lịch cho từng buổi bị bỏ qua.
+    """
+    teacher_id = current_user['user_id']
+
+    if data.end_date < data.start_date:
+        raise HTTPException(400, "Ngày kết thúc phải sau ngày bắt đầu.")
+    for slot in data.slots:
+        if slot.start_period > slot.end_period:
+            raise HTTPException(400, "Tiết bắt đầu phải nhỏ hơn hoặc bằng tiết kết thúc.")
+
+    # Đếm trước khi trải ra: request quá lớn bị từ chối mà không tốn bộ nhớ / CPU
+    total = count_weekly_occurrences(data)
+    if total > MAX_RECURRING_OCCURRENCES:
+        raise HTTPException(400, f"Quá nhiều buổi học ({total}), tối đa {MAX_RECURRING_OCCURRENCES} buổi mỗi lần tạo.")
+
+    occurrences = expand_weekly_slots(data)
+
+    # 1. Trùng nhau ngay trong yêu cầu
+    accepted, conflicts = split_request_conflicts(occurrences)
+
+    # 2. Trùng với lịch đã có: 1 query cho tất cả các buổi
+    to_insert = accepted
+    if accepted:
+        cursor.execute(RECURRING_CONFLICT_SQL, recurring_conflict_params(teacher_id, data.class_id, accepted))
+        to_insert, existing = split_existing_conflicts(accepted, cursor.fetchall())
+        conflicts.extend(existing)
+
+    # 3. Insert tất cả buổi hợp lệ bằng 1 câu lệnh, trả về dữ liệu đầy đủ
+    created = []
+    if to_insert:
+        try:
+            cursor.execute(RECURRING_INSERT_SQL, recurring_insert_params(teacher_id, data.class_id, to_insert))
+            created = cursor.fetchall()
+            if created:
+                publish_change(cursor, "schedules")
+                # Nhiều buổi (vượt giới hạn 1 NOTIFY) -> client tải lại khoảng ngày
+                publish_schedule_event(cursor, "invalidate", {
+                    "teacher_id": teacher_id, "class_id": data.class_id,
+                    "start_date": created[0]['schedule_date'], "end_date": created[-1]['schedule_date'],
+                })
+        except Exception as e:
+            raise HTTPException(500, f"Lỗi tạo lịch: {str(e)}")
+        conflicts.extend(skipped_by_database(to_insert, created))
+
+    conflicts.sort(key=lambda o: (o["schedule_date"], o["start_period"]))
+    return {"created": created, "conflicts": conflicts}
+
 # ==========================================
 # 3. PUT: Cập nhật lịch (MỚI - SỬA LỖI TRÙNG LỊCH)
 # ==========================================
@@ -135,67 +231,32 @@ def update_schedule(
 ):
     # 1. Tính thứ trong tuần
     week_day_str = get_weekday_str(data.schedule_date)
-    teacher_id = current_user['user_id']
 
-    # 2. Validate: Check trùng lịch của Giáo viên (LOẠI TRỪ CHÍNH NÓ)
-    # Thêm điều kiện: AND schedule_id != %s
-    check_sql = """
-        SELECT schedule_id FROM edu.schedules 
-        WHERE teacher_id = %s 
-          AND schedule_date = %s
-          AND start_period <= %s 
-          AND end_period >= %s
-          AND schedule_id != %s 
-    """
-    cursor.execute(check_sql, (teacher_id, data.schedule_date, data.end_period, data.start_period, schedule_id))
-    if cursor.fetchone():
-        raise HTTPException(400, f"Bạn đã có lịch dạy khác vào khung giờ này ({week_day_str}).")
-
-    # 3. Validate: Check trùng lịch của Lớp học (LOẠI TRỪ CHÍNH NÓ)
-    check_class_sql = """
-        SELECT schedule_id FROM edu.schedules 
-        WHERE class_id = %s 
-          AND schedule_date = %s
-          AND start_period <= %s 
-          AND end_period >= %s
-          AND schedule_id != %s
-    """
-    cursor.execute(check_class_sql, (data.class_id, data.schedule_date, data.end_period, data.start_period, schedule_id))
-    if cursor.fetchone():
-        raise HTTPException(400, f"Lớp này đã có lịch học môn khác vào khung giờ này.")
-
-    # 4. Update
-    update_sql = """
-        UPDATE edu.schedules 
-        SET class_id = %s, lesson_id = %s, schedule_date = %s, week_day = %s, start_period = %s, end_period = %s
-        WHERE schedule_id = %s
-        RETURNING schedule_id
-    """
+    if data.start_period > data.end_period:
+        raise HTTPException(400, "Tiết bắt đầu phải nhỏ hơn hoặc bằng tiết kết thúc.")
+
+    # 2. Update + fetch lại data đầy đủ trong 1 câu lệnh.
+    # Exclusion constraint tự loại trừ chính dòng đang sửa khi kiểm tra trùng
     try:
-        cursor.execute(update_sql, (
+        cursor.execute(UPDATE_SCHEDULE_SQL, (
             data.class_id, data.lesson_id, 
             data.schedule_date, week_day_str, data.start_period, data.end_period,
             schedule_id
         ))
+        row = cursor.fetchone()
         
         # Kiểm tra xem update có thành công không (có dòng nào bị tác động không)
-        if cursor.rowcount == 0:
+        if row is None:
              raise HTTPException(404, "Không tìm thấy lịch dạy hoặc bạn không có quyền sửa.")
+        publish_change(cursor, "schedules", schedule_id)
+        publish_schedule_event(cursor, "updated", updated_event_data(row))
+        return row
 
-        # 5. Fetch lại data đầy đủ để trả về UI
-        fetch_sql = """
-            SELECT 
-                s.schedule_id, s.schedule_date, s.week_day, s.start_period, s.end_period,
-                s.class_id, c.class_name, c.subject_name,
-                s.lesson_id, l.lesson_name
-            FROM edu.schedules s
-            JOIN edu.classes c ON s.class_id = c.class_id
-            LEFT JOIN edu.lessons l ON s.lesson_id = l.lesson_id
-            WHERE s.schedule_id = %s
-        """
-        cursor.execute(fetch_sql, (schedule_id,))
-        return cursor.fetchone()
-
+    except errors.ExclusionViolation as e:
+        message = overlap_message(e, week_day_str)
+        if message is None:
+            raise HTTPException(500, f"Lỗi cập nhật lịch: {str(e)}")
+        raise HTTPException(400, message)
     except Exception as e:
         # Nếu đã raise HTTP exception ở trên thì ném tiếp
         if isinstance(e, HTTPException):
@@ -221,5 +282,12 @@ def delete_schedule(
     if current_user['role'] != 'admin' and row['teacher_id'] != current_user['user_id']:
         raise HTTPException(403, "Bạn không có quyền xóa lịch dạy của người khác")
 
-    cursor.execute("DELETE FROM edu.schedules WHERE schedule_id = %s RETURNING schedule_id", (id,))
+    cursor.execute(
+        "DELETE FROM edu.schedules WHERE schedule_id = %s RETURNING schedule_id, teacher_id, class_id, schedule_date",
+        (id,)
+    )
+    deleted = cursor.fetchone()
+    publish_change(cursor, "schedules", id)
+    if deleted:
+        publish_schedule_event(cursor, "deleted", dict(deleted))
     return {"message": "Xóa thành công", "id": id}
\ No newline at end of file
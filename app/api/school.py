@@ -1,9 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from app.db.session import get_db_cursor
-from app.schemas.school import ClassDTO, ClassCreate, StudentDTO, StudentCreate
+from fastapi import APIRouter, Depends, HTTPException, Query, status, UploadFile, File, Form
+from app.db.session import get_db_cursor, get_read_db_cursor
+from app.db.notify import publish_change
+from app.db.prepared import execute_prepared, register
+from app.schemas.school import (
+    ClassDTO, ClassCreate, ClassSummaryDTO, StudentDTO, StudentCreate, StudentImportResult, StudentPage
+)
 from app.api.deps import get_current_user 
-from typing import List
+from typing import List, Optional
 from app.schemas.school import ClassWithLessonsDTO
+from app.core.responses import fast_json_response
+from app.services.lesson_catalog import fetch_classes_with_lessons
+from app.services.rosters import (
+    CLASS_OWNER_SQL, CLASS_SUMMARY_SQL, ROSTER_DEFAULT_LIMIT, ROSTER_MAX_LIMIT, SCHOOL_DATA_SQL,
+    RosterSort, SortOrder, build_roster_query, roster_page
+)
+from app.services.student_import import ImportFormatError, StudentImporter, iter_upload_rows
 
 router = APIRouter()
 
@@ -11,48 +22,62 @@ router = APIRouter()
 @router.get("/school-data", response_model=List[ClassDTO])
 def get_school_data(
     current_user: dict = Depends(get_current_user),
-    cursor = Depends(get_db_cursor)
+    cursor = Depends(get_read_db_cursor)
 ):
-    sql = """
-        SELECT 
-            c.class_id,
-            c.class_name,
-            s.name as school_name,
-            c.subject_name,
-            c.grade_level,
-            c.teacher_id,
-            c.start_year,
-            c.end_year,
-            c.status as class_status,
-            COALESCE(
-                json_agg(
-                    json_build_object(
-                        'student_id', st.student_id,
-                        'full_name', st.full_name,
-                        'date_of_birth', st.date_of_birth,
-                        'email', st.email,
-                        'phone_number', st.phone_number,
-                        'status', st.status
-                    ) 
-                ) FILTER (WHERE st.student_id IS NOT NULL), 
-                '[]'
-            ) as students
-        FROM edu.classes c
-        JOIN edu.schools s ON c.school_id = s.school_id
-        LEFT JOIN edu.students st ON c.class_id = st.class_id
-        
-        -- Lọc theo teacher_id (người dùng hiện tại)
-        WHERE c.teacher_id = %s
-        
-        GROUP BY c.class_id, s.name
-        ORDER BY c.class_id DESC;
+    try:
+        # Câu SQL cố định, chạy mỗi lần mở màn hình lớp -> prepared statement (app/db/prepared.py)
+        execute_prepared(cursor, register("school_data", SCHOOL_DATA_SQL), (current_user['user_id'],))
+        results = cursor.fetchall()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    # JSON đã dựng sẵn trong Postgres -> encode thẳng; RESPONSE_VALIDATION=true thì
+    # validate qua ClassDTO (xem app/core/responses.py). Ngoài try: lỗi schema không
+    # bị báo nhầm thành lỗi Database
+    return fast_json_response(results, List[ClassDTO])
+
+# --- 1b. GET: Bản tóm tắt (không kèm học sinh, chỉ số đếm) ---
+@router.get("/school-data/summary", response_model=List[ClassSummaryDTO])
+def get_school_data_summary(
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_read_db_cursor)
+):
+    """
+    Danh sách lớp kèm sĩ số và số học sinh theo trạng thái.
+    Dùng cho màn hình danh sách lớp; học sinh tải riêng qua /classes/{class_id}/students.
     """
     try:
-        cursor.execute(sql, (current_user['user_id'],)) 
+        execute_prepared(cursor, register("class_summary", CLASS_SUMMARY_SQL), (current_user['user_id'],))
         results = cursor.fetchall()
-        return results
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return fast_json_response(results, List[ClassSummaryDTO])
+
+# --- 1c. GET: Học sinh của 1 lớp (phân trang keyset) ---
+@router.get("/classes/{class_id}/students", response_model=StudentPage)
+def get_class_students(
+    class_id: int,
+    status_filter: Optional[str] = Query(None, alias="status", description="Lọc theo trạng thái, VD: Hoạt động"),
+    sort: RosterSort = Query("full_name"),
+    order: SortOrder = Query("asc"),
+    cursor_token: Optional[str] = Query(None, alias="cursor", description="next_cursor của trang trước"),
+    limit: int = Query(ROSTER_DEFAULT_LIMIT, ge=1, le=ROSTER_MAX_LIMIT),
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_read_db_cursor)
+):
+    cursor.execute(CLASS_OWNER_SQL, (class_id,))
+    owner = cursor.fetchone()
+    if owner is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy lớp học")
+    if current_user['role'] != 'admin' and owner['teacher_id'] != current_user['user_id']:
+        raise HTTPException(status_code=403, detail="Bạn không có quyền xem học sinh của lớp này")
+
+    try:
+        sql, params = build_roster_query(class_id, status_filter, sort, order, cursor_token, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    cursor.execute(sql, tuple(params))
+    return roster_page(cursor.fetchall(), status_filter, sort, order, limit)
 
 # --- 2. POST: Tạo lớp học ---
 @router.post("/classes", response_model=ClassDTO, status_code=status.HTTP_201_CREATED)
@@ -94,6 +119,7 @@ def create_class(
     ))
     
     new_class = cursor.fetchone()
+    publish_change(cursor, "classes", new_class['class_id'])
     
     return {
         **new_class,
@@ -134,6 +160,7 @@ def update_class(
     
     if not updated_class:
         raise HTTPException(status_code=404, detail="Không tìm thấy lớp học")
+    publish_change(cursor, "classes", class_id)
 
     return {
         **updated_class,
@@ -158,6 +185,30 @@ def create_student(student_in: StudentCreate, cursor = Depends(get_db_cursor)):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# --- 4b. POST: Nhập học sinh hàng loạt từ file CSV / XLSX ---
+@router.post("/students/import", response_model=StudentImportResult, status_code=status.HTTP_201_CREATED)
+def import_students(
+    file: UploadFile = File(..., description="File CSV (UTF-8) hoặc XLSX, dòng đầu là tiêu đề cột"),
+    class_id: Optional[int] = Form(None, description="Lớp mặc định cho các dòng không có cột class_id"),
+    current_user: dict = Depends(get_current_user),
+    cursor = Depends(get_db_cursor)
+):
+    """
+    Nhập danh sách học sinh cho 1 hoặc nhiều lớp.
+    Cột: class_id, full_name, date_of_birth, email, phone_number, status
+    (chấp nhận tên cột tiếng Việt: Mã lớp, Họ và tên, Ngày sinh...).
+    Dòng hợp lệ được nạp bằng COPY theo lô; dòng lỗi được liệt kê trong kết quả.
+    """
+    importer = StudentImporter(cursor, current_user, default_class_id=class_id)
+    try:
+        # Dòng 1 là tiêu đề -> dữ liệu bắt đầu từ dòng 2
+        for row_number, row in enumerate(iter_upload_rows(file.filename, file.file), start=2):
+            if row is not None:
+                importer.add(row_number, row)
+        return importer.finish()
+    except ImportFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # --- 5. PUT: Cập nhật học sinh ---
 @router.put("/students/{student_id}", response_model=StudentDTO)
 def update_student(student_id: int, student_in: StudentCreate, cursor = Depends(get_db_cursor)):
@@ -182,62 +233,17 @@ def update_student(student_id: int, student_in: StudentCreate, cursor = Depends(
 @router.get("/teacher/classes-lessons", response_model=List[ClassWithLessonsDTO])
 def get_teacher_classes_with_lessons(
     current_user: dict = Depends(get_current_user),
-    cursor = Depends(get_db_cursor)
+    cursor = Depends(get_db_cursor)  # Primary: danh mục bài nạp vào cache không được lấy từ replica đang trễ
 ):
     """
     Lấy danh sách các lớp mà giáo viên đang dạy.
     Với mỗi lớp, tự động tìm ra danh sách bài học tương ứng dựa trên Khối (Grade) và Môn (Subject).
     """
     
-    # Logic JOIN phức tạp:
-    # 1. Lấy các lớp do giáo viên này dạy (c.teacher_id = user_id)
-    # 2. JOIN sang bảng GradeLevels dựa trên c.grade_level (VD: số 10)
-    # 3. JOIN sang bảng Subjects dựa trên GradeLevels.id VÀ c.subject_name (VD: "Toán")
-    # 4. Từ Subject -> Books -> Chapters -> Lessons để lấy danh sách bài
-    
-    sql = """
-        SELECT 
-            c.class_id,
-            c.class_name,
-            s.name as school_name,
-            c.subject_name,
-            c.grade_level,
-            
-            -- Gom nhóm danh sách bài học thành JSON
-            COALESCE(
-                json_agg(
-                    json_build_object(
-                        'lesson_id', l.lesson_id,
-                        'lesson_name', l.lesson_name,
-                        'chapter_name', ch.chapter_name
-                    ) ORDER BY l.order_number
-                ) FILTER (WHERE l.lesson_id IS NOT NULL), 
-                '[]'
-            ) as lessons
-            
-        FROM edu.classes c
-        JOIN edu.schools s ON c.school_id = s.school_id
-        
-        -- Cầu nối 1: Tìm ID của Khối lớp (dựa trên số 10, 11...)
-        LEFT JOIN edu.grade_levels g ON g.value = c.grade_level
-        
-        -- Cầu nối 2: Tìm ID của Môn học (dựa trên Khối ID và Tên môn)
-        LEFT JOIN edu.subjects sub ON sub.grade_level_id = g.grade_level_id 
-                                   AND sub.subject_name = c.subject_name
-                                   
-        -- Đi xuống cây kiến thức để lấy bài học
-        LEFT JOIN edu.books b ON b.subject_id = sub.subject_id
-        LEFT JOIN edu.chapters ch ON ch.book_id = b.book_id
-        LEFT JOIN edu.lessons l ON l.chapter_id = ch.chapter_id
-        
-        WHERE c.teacher_id = %s
-        
-        GROUP BY c.class_id, s.name, c.subject_name, c.grade_level
-        ORDER BY c.class_id DESC;
-    """
-    
+    # Danh sách lớp + danh mục bài theo (Khối, Môn) từ cache dùng chung
+    # (app/services/lesson_catalog.py), ghép trong bộ nhớ
     try:
-        cursor.execute(sql, (current_user['user_id'],))
-        return cursor.fetchall()
+        rows = fetch_classes_with_lessons(cursor, current_user['user_id'])
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Lỗi lấy dữ liệu lớp học & bài giảng: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Lỗi lấy dữ liệu lớp học & bài giảng: {str(e)}")
+    return fast_json_response(rows, List[ClassWithLessonsDTO])
\ No newline at end of file
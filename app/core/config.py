@@ -1,4 +1,5 @@
 # app/core/config.py
+from typing import Literal
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -12,6 +13,99 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     POSTGRES_PORT: str
 
+    # Hồ kết nối psycopg2 (app/db/pool.py)
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 20
+    DB_POOL_MAX_OVERFLOW: int = 5          # Kết nối mở thêm tạm thời lúc cao điểm
+    DB_POOL_TIMEOUT: float = 10.0          # Giây chờ tối đa khi hồ cạn
+    DB_POOL_MAX_LIFETIME: float = 1800.0   # Giây; quá tuổi thì đóng và mở lại
+    DB_POOL_PING_IDLE_AFTER: float = 30.0  # Giây nằm chờ trước khi phải ping lại
+
+    # Tổng số kết nối tới primary cho cả app (mọi worker của app/launcher.py, kể cả
+    # kết nối LISTEN); launcher chia đều và thu nhỏ hồ của từng worker. 0 = không giới hạn
+    DB_MAX_CONNECTIONS: int = 0
+
+    # Prepared statement phía server cho các query đọc lớn, cố định (app/db/prepared.py)
+    PREPARED_STATEMENTS_ENABLED: bool = True
+
+    # Read replica cho các API GET (app/db/routing.py), cùng kích thước hồ với primary
+    DB_REPLICA_URLS: str = ""                # URI libpq cách nhau dấu phẩy; rỗng = chỉ dùng primary
+    DB_READ_YOUR_WRITES_WINDOW: float = 2.0  # Giây sau khi user ghi: mọi lần đọc của user đi primary
+    DB_READ_YOUR_WRITES_TTL: float = 60.0    # Giây tối đa chờ replica replay tới LSN lần ghi của user
+    DB_REPLICA_RETRY_AFTER: float = 5.0      # Giây tạm bỏ qua replica bị lỗi
+
+    # Cache xác thực trong get_current_user (giây / số phần tử)
+    AUTH_USER_CACHE_TTL: float = 30.0    # Cửa sổ tối đa để khóa tài khoản có hiệu lực
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_TTL: float = 300.0
+    AUTH_TOKEN_CACHE_SIZE: int = 50000
+
+    # Băm mật khẩu bcrypt (app/core/security.py)
+    BCRYPT_ROUNDS: int = 12                   # Đổi giá trị -> hash cũ được băm lại khi đăng nhập
+    PASSWORD_HASH_WORKERS: int = 2            # Số tiến trình băm riêng; 0 = chạy ngay trong thread
+    PASSWORD_HASH_MAX_PENDING: int = 64       # Số yêu cầu băm tối đa (đang chạy + chờ)
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 2.0  # Giây chờ chỗ trong hàng đợi trước khi trả 503
+    PASSWORD_HASH_CPUS: str = ""              # VD "6,7": ghim tiến trình băm vào các CPU này; rỗng = không ghim
+
+    # Giới hạn tần suất /login (token bucket, app/core/rate_limit.py)
+    LOGIN_RATE_PER_USERNAME: float = 10.0  # Số lần / phút cho mỗi username
+    LOGIN_BURST_PER_USERNAME: int = 5
+    LOGIN_RATE_PER_IP: float = 120.0       # Số lần / phút cho mỗi IP (cả trường dùng chung NAT)
+    LOGIN_BURST_PER_IP: int = 60
+
+    # Cách dựng /knowledge-tree (app/services/knowledge_tree.py):
+    # - "flat": mỗi cấp 1 query phẳng, ghép cây trong Python (tuyến tính)
+    # - "nested": query json_agg lồng nhau 6 cấp (cách cũ)
+    KNOWLEDGE_TREE_BUILDER: Literal["flat", "nested"] = "flat"
+
+    # Validate body của các API đọc lớn (/knowledge-tree, /school-data...) theo
+    # response_model trước khi trả. Tắt ở production (app/core/responses.py),
+    # bật khi chạy kiểm thử / debug để phát hiện SQL trả sai schema.
+    RESPONSE_VALIDATION: bool = False
+
+    # Đo đạc request (app/core/metrics.py, endpoint /metrics)
+    METRICS_ENABLED: bool = True
+    SLOW_QUERY_MS: float = 200.0  # Câu SQL chậm hơn ngưỡng này được ghi log (đã chuẩn hóa)
+
+    # Profile theo yêu cầu (app/core/profiling.py): admin gửi header X-Profile: 1
+    PROFILING_ENABLED: bool = False
+    PROFILE_DIR: str = "profiles"        # Thư mục lưu file .folded (vòng tròn)
+    PROFILE_MAX_FILES: int = 50
+    PROFILE_INTERVAL_MS: float = 2.0     # Chu kỳ lấy mẫu stack
+    PROFILE_MAX_SECONDS: float = 60.0    # Dừng lấy mẫu nếu request chạy quá lâu
+
+    # Lịch dạy (app/services/schedules.py, app/services/schedule_export.py)
+    SCHEDULE_PAGE_DEFAULT: int = 1000       # Cỡ trang GET /schedules khi có ?cursor mà thiếu ?limit
+    SCHEDULE_PAGE_MAX: int = 5000
+    SCHEDULE_EXPORT_CHUNK: int = 2000       # Số dòng mỗi đoạn (1 query keyset, 1 transaction ngắn) khi xuất .ics / .csv
+    SCHEDULE_UTC_OFFSET_HOURS: int = 7      # Múi giờ của giờ tiết học (Việt Nam, không có DST)
+
+    # Đẩy thay đổi lịch qua SSE, GET /schedules/stream (app/services/schedule_stream.py)
+    SCHEDULE_STREAM_BUFFER: int = 1000          # Số sự kiện gần nhất giữ để nối lại (Last-Event-ID)
+    SCHEDULE_STREAM_QUEUE: int = 100            # Sự kiện chờ tối đa / client; đầy -> gửi "reset"
+    SCHEDULE_STREAM_HEARTBEAT: float = 15.0     # Giây rảnh trước khi gửi dòng ping
+    SCHEDULE_STREAM_RETRY_MS: int = 3000        # Trình duyệt chờ bao lâu trước khi nối lại
+    SCHEDULE_STREAM_MAX_SUBSCRIBERS: int = 5000 # Số client tối đa / worker; quá -> 503
+
+    # Đồng bộ cache giữa các worker / máy chủ qua LISTEN/NOTIFY (app/db/notify.py)
+    CHANGE_NOTIFY_ENABLED: bool = True
+    CHANGE_NOTIFY_CHANNEL: str = "edu_changes"
+    CHANGE_NOTIFY_KEEPALIVE: float = 30.0       # Giây rảnh trước khi ping kết nối LISTEN
+    CHANGE_NOTIFY_RECONNECT_MAX: float = 30.0   # Giây chờ tối đa giữa 2 lần kết nối lại
+
+    # Khởi động / readiness (app/core/startup.py)
+    STARTUP_DB_ATTEMPTS: int = 5                # Số lần thử kết nối DB trước khi worker bỏ cuộc
+    STARTUP_RETRY_BACKOFF: float = 0.5          # Giây chờ trước lần thử thứ 2 (gấp đôi mỗi lần)
+    STARTUP_RETRY_BACKOFF_MAX: float = 8.0      # Giây chờ tối đa giữa 2 lần thử
+    STARTUP_WARM_CACHES: bool = True            # Nạp sẵn cache cây kiến thức / danh mục bài
+    STARTUP_LISTENER_TIMEOUT: float = 5.0       # Giây chờ luồng LISTEN kết nối trước khi nạp sẵn cache
+    READINESS_DB_TIMEOUT: float = 1.0           # Giây chờ kết nối tối đa khi kiểm tra /readyz
+
+    # Chế độ truy cập Database:
+    # - False: dùng psycopg2 đồng bộ (handler chạy trong threadpool của FastAPI)
+    # - True: dùng psycopg 3 bất đồng bộ (handler chạy trực tiếp trên event loop)
+    USE_ASYNC_DB: bool = False
+
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,229 @@
+# app/core/metrics.py
+"""
+Số liệu theo request và endpoint /metrics (định dạng text của Prometheus).
+
+- RequestStats: số query, thời gian DB, số dòng, thời gian chờ hồ kết nối của
+  request hiện tại (lưu trong contextvar, cursor ở app/db/instrumented.py ghi vào).
+- MetricsMiddleware (ASGI thuần, không dùng BaseHTTPMiddleware để đỡ tốn):
+  đo thời gian request, gộp vào histogram theo route (mẫu đường dẫn, VD:
+  /api/v1/schedules/{schedule_id}) và gắn header Server-Timing.
+- Chi phí: vài lần perf_counter + 1 lock mỗi request -> để bật ở production.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    __slots__ = ("method", "path", "queries", "db_time", "rows", "pool_wait", "slow_queries", "plan_saved")
+
+    def __init__(self, method: str = "", path: str = ""):
+        self.method = method
+        self.path = path
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.pool_wait = 0.0
+        self.slow_queries = 0
+        self.plan_saved = 0.0  # Ước lượng thời gian lập kế hoạch tiết kiệm nhờ prepared statement
+
+
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+class Histogram:
+    """Histogram tích lũy có nhãn, an toàn đa luồng."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}  # nhãn -> [đếm theo bucket..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            prefix = base + "," if base else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {series[-1]}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+        return "\n".join(lines)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            lines.append(f"{self.name}{{{base}}} {value}")
+        return "\n".join(lines)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Thời gian xử lý request theo route.",
+    ("method", "route", "status"), LATENCY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Tổng thời gian chạy SQL trong 1 request.",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+REQUEST_POOL_WAIT = Histogram(
+    "http_request_db_pool_wait_seconds", "Thời gian chờ lấy kết nối từ hồ trong 1 request.",
+    ("method", "route"), LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Số câu SQL trong 1 request.",
+    ("method", "route"), QUERY_COUNT_BUCKETS,
+)
+REQUEST_ROWS = Counter("http_request_db_rows_total", "Tổng số dòng SQL trả về / tác động.", ("method", "route"))
+SLOW_QUERIES = Counter("db_slow_queries_total", "Số câu SQL chậm hơn SLOW_QUERY_MS.", ("route",))
+REQUEST_PLAN_SAVED = Counter(
+    "http_request_db_plan_saved_seconds_total",
+    "Thời gian lập kế hoạch ước lượng tiết kiệm nhờ prepared statement.", ("method", "route"),
+)
+
+# Prepared statement phía server (app/db/prepared.py), theo query đã đăng ký
+PREPARES = Counter("db_prepared_prepares_total", "Số lần PREPARE (lần đầu trên mỗi kết nối / sau khi schema đổi).", ("query",))
+PREPARED_EXECUTIONS = Counter("db_prepared_executions_total", "Số lần EXECUTE statement đã prepare.", ("query",))
+PREPARED_PLAN_SAVED = Counter(
+    "db_prepared_plan_saved_seconds_total", "Thời gian lập kế hoạch ước lượng tiết kiệm được.", ("query",),
+)
+
+METRICS = [
+    REQUEST_LATENCY, REQUEST_DB_TIME, REQUEST_POOL_WAIT, REQUEST_QUERIES, REQUEST_ROWS, SLOW_QUERIES,
+    REQUEST_PLAN_SAVED, PREPARES, PREPARED_EXECUTIONS, PREPARED_PLAN_SAVED,
+]
+
+
+def render_gauges(prefix: str, values: dict) -> str:
+    """Số liệu dạng gauge từ 1 dict phẳng (VD: stats() của hồ kết nối)."""
+    lines = []
+    for key, value in values.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        lines.append(f"# TYPE {prefix}_{key} gauge")
+        lines.append(f"{prefix}_{key} {value}")
+    return "\n".join(lines)
+
+
+def render_histogram_snapshot(name: str, snapshot: dict) -> str:
+    """Histogram đã tích lũy sẵn dạng {"count", "sum", "buckets": {le: số lần}} (VD: hồ kết nối)."""
+    lines = [f"# TYPE {name} histogram"]
+    for bound, count in snapshot["buckets"].items():
+        lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+    lines.append(f"{name}_sum {snapshot['sum']}")
+    lines.append(f"{name}_count {snapshot['count']}")
+    return "\n".join(lines)
+
+
+def render_metrics(extra: Sequence[str] = ()) -> str:
+    return "\n".join([m.render() for m in METRICS] + list(extra)) + "\n"
+
+
+class MetricsMiddleware:
+    """Middleware ASGI thuần: đo request, gộp số liệu theo route, thêm header Server-Timing."""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_by_endpoint = {}
+
+    def _route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"  # 404: không dùng path thật để tránh bùng nổ số nhãn
+        route = self._route_by_endpoint.get(endpoint)
+        if route is None:
+            app = scope.get("app")
+            for candidate in getattr(getattr(app, "router", None), "routes", ()):
+                if getattr(candidate, "endpoint", None) is endpoint:
+                    route = candidate.path
+                    break
+            else:
+                route = getattr(endpoint, "__name__", "unknown")
+            self._route_by_endpoint[endpoint] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope["method"], scope["path"])
+        token = current_request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # DB đã xong trước khi gửi response (dependency yield của FastAPI)
+                timing = (f"db;dur={stats.db_time * 1000:.1f};desc=\"{stats.queries} queries\", "
+                          f"pool;dur={stats.pool_wait * 1000:.1f}")
+                if stats.plan_saved:
+                    timing += f", plan-saved;dur={stats.plan_saved * 1000:.2f}"
+                timing = timing.encode()
+                message = dict(message, headers=list(message.get("headers", [])) + [(b"server-timing", timing)])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            method = scope["method"]
+            route = self._route_template(scope)
+            REQUEST_LATENCY.observe(elapsed, method, route, str(status_code))
+            if stats.queries:
+                REQUEST_DB_TIME.observe(stats.db_time, method, route)
+                REQUEST_POOL_WAIT.observe(stats.pool_wait, method, route)
+                REQUEST_QUERIES.observe(stats.queries, method, route)
+                REQUEST_ROWS.inc(method, route, amount=stats.rows)
+            if stats.plan_saved:
+                REQUEST_PLAN_SAVED.inc(method, route, amount=stats.plan_saved)
+            if stats.slow_queries:
+                SLOW_QUERIES.inc(route, amount=stats.slow_queries)
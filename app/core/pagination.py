@@ -0,0 +1,33 @@
+# app/core/pagination.py
+"""
+Cursor cho phân trang keyset: client chỉ nhận / gửi lại 1 chuỗi base64 "mờ".
+
+Cursor chứa tham số sắp xếp / lọc của trang trước (để phát hiện client đổi
+tham số giữa chừng) và khóa của dòng cuối cùng đã trả.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Không đưa được kiểu {type(value).__name__} vào cursor")
+
+
+def encode_cursor(data: dict) -> str:
+    raw = json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> dict:
+    """Giải mã cursor; chuỗi hỏng -> ValueError (router đổi thành 400)."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        data = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Cursor không hợp lệ") from e
+    if not isinstance(data, dict):
+        raise ValueError("Cursor không hợp lệ")
+    return data
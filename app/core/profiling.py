@@ -0,0 +1,207 @@
+# app/core/profiling.py
+"""
+Profile theo yêu cầu cho 1 request (bật bằng PROFILING_ENABLED).
+
+Admin gửi request kèm header `X-Profile: 1` (hoặc query `?__profile=1`):
+1 luồng lấy mẫu chụp stack của mọi thread đang làm việc (sys._current_frames)
+mỗi PROFILE_INTERVAL_MS trong lúc request chạy -> bao trọn event loop, các
+dependency chạy trong threadpool (get_current_user, get_db_cursor), thời gian
+chờ SQL, validate Pydantic và serialize.
+
+Kết quả ghi dạng "folded stacks" (dùng được với flamegraph.pl, speedscope,
+https://www.speedscope.app) vào thư mục PROFILE_DIR, giữ tối đa
+PROFILE_MAX_FILES file mới nhất (vòng tròn). Tên file trả về ở header
+X-Profile-Id; tải lại qua GET /debug/profiles/{id} (app/api/debug.py).
+
+Lưu ý: lấy mẫu toàn tiến trình nên request khác chạy cùng lúc cũng lọt vào
+profile (tên thread nằm ở đầu mỗi stack để phân biệt).
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+# Thread đang rảnh (chờ việc / chờ I/O của event loop) -> bỏ qua mẫu
+_IDLE_FRAMES = {("queue.py", "get"), ("selectors.py", "select"), ("selectors.py", "poll")}
+_PROFILE_ID = re.compile(r"^[\w.-]+\.folded$")
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    for marker in ("site-packages" + os.sep, os.sep + "app" + os.sep):
+        index = filename.rfind(marker)
+        if index != -1:
+            filename = filename[index + len(marker):] if marker.startswith("site") else filename[index + 1:]
+            break
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Profiler thống kê: luồng nền chụp stack của các thread khác theo chu kỳ."""
+
+    def __init__(self, interval: float, max_seconds: float):
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples = Counter()  # stack dạng folded -> số mẫu
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                idle = False
+                while frame is not None:
+                    code = frame.f_code
+                    if len(stack) < 3 and (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+                        idle = True
+                        break
+                    stack.append(_frame_label(code))
+                    frame = frame.f_back
+                if idle or not stack:
+                    continue
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.samples[";".join(reversed(stack))] += 1
+            self.sample_count += 1
+            self._stop.wait(self.interval)
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+# ============================================================
+# Lưu trữ vòng tròn trên đĩa
+# ============================================================
+def profile_dir() -> Path:
+    return Path(settings.PROFILE_DIR)
+
+
+def save_profile(method: str, path: str, elapsed_ms: float, content: str) -> str:
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^\w-]+", "_", path.strip("/"))[:80] or "root"
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{int(time.time() * 1000) % 1000:03d}_{method}_{slug}_{elapsed_ms:.0f}ms.folded"
+    (directory / profile_id).write_text(content, encoding="utf-8")
+
+    files = sorted(directory.glob("*.folded"), key=lambda p: p.stat().st_mtime)
+    for old in files[:max(0, len(files) - settings.PROFILE_MAX_FILES)]:
+        old.unlink(missing_ok=True)
+    return profile_id
+
+
+def list_profiles() -> List[dict]:
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    files = sorted(directory.glob("*.folded"), key=lambda p: p.stat().st_mtime, reverse=True)
+    return [{"id": p.name, "size": p.stat().st_size, "created_at": p.stat().st_mtime} for p in files]
+
+
+def read_profile(profile_id: str) -> Optional[str]:
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = profile_dir() / profile_id
+    return path.read_text(encoding="utf-8") if path.is_file() else None
+
+
+# ============================================================
+# Middleware
+# ============================================================
+def _profile_requested(scope) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile" and value.strip() not in (b"", b"0", b"false"):
+            return True
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+    return query.get("__profile", ["0"])[0] not in ("", "0", "false")
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token.strip()
+    return None
+
+
+class ProfilingMiddleware:
+    """Middleware ASGI thuần: chỉ profile khi có cờ VÀ token thuộc admin."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def _is_admin(self, scope) -> bool:
+        from app.api.deps import find_user_by_token  # Tránh import vòng (deps -> db -> core)
+
+        token = _bearer_token(scope)
+        if token is None:
+            return False
+        try:
+            user = await run_in_threadpool(find_user_by_token, token)
+        except Exception:
+            return False  # Lỗi tra cứu user -> chạy request bình thường, không profile
+        return bool(user) and user.get("role") == "admin" and user.get("status") == "Hoạt động"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _profile_requested(scope) or not await self._is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = SamplingProfiler(settings.PROFILE_INTERVAL_MS / 1000.0, settings.PROFILE_MAX_SECONDS)
+        started = time.perf_counter()
+        response_start = None
+        profiler.start()
+
+        async def send_wrapper(message):
+            nonlocal response_start
+            if message["type"] == "http.response.start":
+                # Giữ lại header, gửi sau khi đã có profile id
+                response_start = message
+                return
+            if response_start is not None:
+                start, response_start = response_start, None
+                await send(finish(start))
+            await send(message)
+
+        def finish(start_message):
+            profiler.stop()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            profile_id = save_profile(scope["method"], scope["path"], elapsed_ms, profiler.folded())
+            headers = list(start_message.get("headers", [])) + [
+                (b"x-profile-id", profile_id.encode()),
+                (b"x-profile-samples", str(profiler.sample_count).encode()),
+            ]
+            return dict(start_message, headers=headers)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Request lỗi trước khi gửi response: vẫn lưu profile
+            if profiler._thread.is_alive():
+                profiler.stop()
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                save_profile(scope["method"], scope["path"], elapsed_ms, profiler.folded())
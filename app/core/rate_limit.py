@@ -0,0 +1,49 @@
+# app/core/rate_limit.py
+import threading
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+
+
+class TokenBucketLimiter:
+    """
+    Giới hạn tần suất theo khóa (username, IP...) bằng thuật toán token bucket.
+    Mỗi khóa có tối đa `burst` token, hồi `rate_per_minute` token mỗi phút;
+    mỗi lần gọi hit() tiêu 1 token. Số khóa được theo dõi có giới hạn (LRU).
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int, maxsize: int = 100000):
+        self.rate = rate_per_minute / 60.0  # token / giây
+        self.burst = burst
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()  # khóa -> (số token, thời điểm cập nhật)
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def hit(self, key) -> float:
+        """Tiêu 1 token. Trả về 0 nếu được phép, ngược lại số giây cần chờ."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+            if tokens >= 1:
+                retry_after = 0.0
+                tokens -= 1
+            else:
+                retry_after = (1 - tokens) / self.rate if self.rate > 0 else 60.0
+                self.rejected += 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+            return retry_after
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._buckets), "rejected": self.rejected}
+
+
+# Giới hạn /login: chặn dò mật khẩu và không cho dùng bcrypt để khuếch đại tải
+login_username_limiter = TokenBucketLimiter(settings.LOGIN_RATE_PER_USERNAME, settings.LOGIN_BURST_PER_USERNAME)
+login_ip_limiter = TokenBucketLimiter(settings.LOGIN_RATE_PER_IP, settings.LOGIN_BURST_PER_IP)
@@ -0,0 +1,66 @@
+# app/core/responses.py
+"""
+Đường trả JSON nhanh cho các API đọc lớn (/knowledge-tree, /school-data,
+/teacher/classes-lessons): dữ liệu đã được Postgres dựng sẵn (json_agg) nên
+bỏ bước validate Pydantic + jsonable_encoder, encode thẳng bằng orjson.
+
+- Body giữ nguyên như đường cũ (JSON gọn, giữ ký tự Unicode, thứ tự key theo SQL).
+- RESPONSE_VALIDATION=true (khi chạy kiểm thử / debug): validate qua response
+  model như trước để phát hiện SQL trả sai schema.
+- OpenAPI không đổi vì route vẫn khai báo response_model.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+
+try:
+    import orjson
+except ImportError:  # orjson là tùy chọn, thiếu thì dùng json chuẩn
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Không encode được kiểu {type(value).__name__} sang JSON")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def loads(data):
+    """Giải mã JSON (dùng cho cột json/jsonb của psycopg2, xem app/db/session.py)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+@lru_cache(maxsize=None)
+def _adapter(response_model) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+
+def render_json(content: Any, response_model=None) -> bytes:
+    """Encode nội dung; chỉ validate theo response_model khi bật RESPONSE_VALIDATION."""
+    if settings.RESPONSE_VALIDATION and response_model is not None:
+        adapter = _adapter(response_model)
+        return adapter.dump_json(adapter.validate_python(content))
+    return dumps(content)
+
+
+def fast_json_response(content: Any, response_model=None, **kwargs) -> Response:
+    return Response(content=render_json(content, response_model), media_type="application/json", **kwargs)
@@ -1,28 +1,175 @@
 # app/core/security.py
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta, timezone
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
+from starlette.concurrency import run_in_threadpool
 from jose import jwt # Thư viện xử lý JWT
 from passlib.context import CryptContext # Thư viện xử lý Hash mật khẩu
 from app.core.config import settings
 
 # Cấu hình thuật toán Hash (dùng bcrypt rất mạnh)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds = max_rounds = BCRYPT_ROUNDS: hash có cost khác bị coi là cần băm lại
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 ALGORITHM = "HS256" # Thuật toán ký Token
 
 # --- 1. Hàm xử lý Mật khẩu ---
+# bcrypt tốn CPU (~0.2s/lần ở cost 12). Chạy trong threadpool chung của FastAPI thì
+# 1 đợt đăng nhập đầu giờ làm nghẽn cả các API khác -> đẩy sang hồ tiến trình riêng,
+# có giới hạn số yêu cầu chờ (PASSWORD_HASH_MAX_PENDING); đầy thì báo bận (503).
+
+class PasswordHasherBusy(Exception):
+    """Hàng đợi băm mật khẩu đã đầy."""
+
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+_hash_slots = threading.BoundedSemaphore(max(1, settings.PASSWORD_HASH_MAX_PENDING))
+_hash_stats = {"pending": 0, "completed": 0, "rejected": 0}
+
+def _pin_hash_worker(cpus):
+    # Tiến trình băm chạy trên các CPU riêng (app/launcher.py --hash-cpus),
+    # không tranh CPU với các worker web
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+
+def _get_hash_executor() -> Optional[ProcessPoolExecutor]:
+    global _hash_executor
+    if settings.PASSWORD_HASH_WORKERS <= 0:
+        return None
+    with _hash_executor_lock:
+        if _hash_executor is None:
+            # "spawn": không fork tiến trình web đang có nhiều thread
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_pin_hash_worker,
+                initargs=({int(cpu) for cpu in settings.PASSWORD_HASH_CPUS.split(",") if cpu.strip()},),
+            )
+        return _hash_executor
+
+def _run_hash_job(fn, *args):
+    executor = _get_hash_executor()
+    if executor is None:
+        return fn(*args)
+
+    if not _hash_slots.acquire(timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT):
+        with _hash_executor_lock:
+            _hash_stats["rejected"] += 1
+        raise PasswordHasherBusy()
+    with _hash_executor_lock:
+        _hash_stats["pending"] += 1
+    try:
+        return executor.submit(fn, *args).result()
+    except BrokenProcessPool:
+        # Tiến trình con bị kill -> bỏ hồ hỏng, lần sau tạo lại
+        shutdown_password_hasher()
+        raise
+    finally:
+        with _hash_executor_lock:
+            _hash_stats["pending"] -= 1
+            _hash_stats["completed"] += 1
+        _hash_slots.release()
+
+async def _arun_hash_job(fn, *args):
+    """
+    Bản cho handler async: chờ chỗ trong hàng đợi và chờ kết quả bằng await
+    (run_in_executor), không giữ thread nào của threadpool trong lúc băm.
+    """
+    executor = _get_hash_executor()
+    if executor is None:
+        return await run_in_threadpool(fn, *args)
+
+    deadline = time.monotonic() + settings.PASSWORD_HASH_QUEUE_TIMEOUT
+    while not _hash_slots.acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            with _hash_executor_lock:
+                _hash_stats["rejected"] += 1
+            raise PasswordHasherBusy()
+        await asyncio.sleep(0.01)
+    with _hash_executor_lock:
+        _hash_stats["pending"] += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        shutdown_password_hasher()
+        raise
+    finally:
+        with _hash_executor_lock:
+            _hash_stats["pending"] -= 1
+            _hash_stats["completed"] += 1
+        _hash_slots.release()
+
+def shutdown_password_hasher():
+    global _hash_executor
+    with _hash_executor_lock:
+        executor, _hash_executor = _hash_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def warm_password_hasher():
+    """
+    Khởi động sẵn các tiến trình băm (spawn + import passlib / bcrypt) lúc boot
+    để đợt đăng nhập đầu tiên sau deploy không phải chờ.
+    """
+    executor = _get_hash_executor()
+    if executor is None:
+        _load_backend()
+        return
+    futures = [executor.submit(_load_backend) for _ in range(settings.PASSWORD_HASH_WORKERS)]
+    for future in futures:
+        future.result()
+
+def password_hasher_stats() -> dict:
+    with _hash_executor_lock:
+        return dict(_hash_stats, workers=settings.PASSWORD_HASH_WORKERS, max_pending=settings.PASSWORD_HASH_MAX_PENDING)
+
+# Các hàm chạy trong tiến trình con (phải ở cấp module để pickle được)
+def _verify_and_update(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _load_backend() -> str:
+    return pwd_context.handler("bcrypt").get_backend()
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Kiểm tra mật khẩu nhập vào (plain) có khớp với hash trong DB không.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return _run_hash_job(_verify_and_update, plain_password, hashed_password)[0]
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Kiểm tra mật khẩu; nếu khớp nhưng hash dùng cost cũ (BCRYPT_ROUNDS đã đổi)
+    thì trả thêm hash mới để lưu lại, ngược lại hash mới là None.
+    """
+    return _run_hash_job(_verify_and_update, plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """
     Tạo hash từ mật khẩu thô (Dùng khi tạo User mới).
     """
-    return pwd_context.hash(password)
+    return _run_hash_job(_hash, password)
+
+async def averify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Như verify_and_update_password, cho handler async (không chiếm thread khi chờ)."""
+    return await _arun_hash_job(_verify_and_update, plain_password, hashed_password)
+
+async def aget_password_hash(password: str) -> str:
+    return await _arun_hash_job(_hash, password)
 
 # --- 2. Hàm tạo Token (JWT) ---
 
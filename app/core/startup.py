@@ -0,0 +1,260 @@
+# app/core/startup.py
+"""
+Vòng đời ứng dụng (FastAPI lifespan) và trạng thái cho /livez, /readyz.
+
+Khởi động (mỗi worker), đo thời gian từng bước:
+1. Mở sẵn DB_POOL_MIN_SIZE kết nối song song (primary; replica lỗi chỉ bị tạm
+   bỏ qua). Postgres chưa sẵn sàng -> thử lại STARTUP_DB_ATTEMPTS lần, chờ tăng
+   dần; vẫn lỗi -> raise, worker không lên (fail fast, orchestrator khởi động lại).
+   Kết nối được nhưng schema thiếu constraint chống trùng lịch (migration 002)
+   -> cũng raise: ghi lịch khi đó không còn gì chặn lịch trùng.
+2. Luồng LISTEN đồng bộ cache / đẩy sự kiện lịch (SSE) - cả chế độ USE_ASYNC_DB,
+   tiến trình băm mật khẩu.
+3. Nạp sẵn cache nóng (app/services/warmup.py); lỗi ở bước này chỉ ghi log,
+   cache sẽ tự nạp khi có request.
+Xong mới đánh dấu ready: /readyz trả 200 -> rolling deploy chỉ chuyển traffic
+sang worker đã sẵn sàng. Lúc tắt thì /readyz trả 503 trước khi đóng tài nguyên.
+"""
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class BootState:
+    def __init__(self):
+        self.ready = False
+        self.stopping = False
+        self.db_attempts = 0
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}  # Bước -> giây
+        self.warmed: Dict[str, int] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "stopping": self.stopping,
+            "db_attempts": self.db_attempts,
+            "error": self.error,
+            "seconds": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "warmed": self.warmed,
+        }
+
+
+boot = BootState()
+
+
+def _backoff_delays():
+    delay = settings.STARTUP_RETRY_BACKOFF
+    for _ in range(settings.STARTUP_DB_ATTEMPTS - 1):
+        yield delay * random.uniform(0.8, 1.2)
+        delay = min(delay * 2, settings.STARTUP_RETRY_BACKOFF_MAX)
+
+
+def _require_ready(problem: Optional[str]):
+    if problem:
+        boot.error = problem
+        logger.error(f"❌ Database chưa dùng được: {problem}")
+        raise RuntimeError(problem)
+
+
+def _open_with_retry(open_pool):
+    """Gọi open_pool() tới khi thành công hoặc hết STARTUP_DB_ATTEMPTS lần (lần cuối raise)."""
+    delays = _backoff_delays()
+    while True:
+        boot.db_attempts += 1
+        try:
+            return open_pool()
+        except Exception as e:
+            delay = next(delays, None)
+            boot.error = str(e).strip()
+            if delay is None:
+                logger.error(f"❌ Không kết nối được PostgreSQL sau {boot.db_attempts} lần: {boot.error}")
+                raise
+            logger.warning(f"PostgreSQL chưa sẵn sàng (lần {boot.db_attempts}), thử lại sau {delay:.1f}s: {boot.error}")
+            time.sleep(delay)
+
+
+async def _aopen_with_retry(pool):
+    delays = _backoff_delays()
+    await pool.open(wait=False)
+    while True:
+        boot.db_attempts += 1
+        try:
+            return await pool.wait(timeout=settings.DB_POOL_TIMEOUT)
+        except Exception as e:
+            delay = next(delays, None)
+            boot.error = str(e).strip()
+            if delay is None:
+                logger.error(f"❌ Không kết nối được PostgreSQL sau {boot.db_attempts} lần: {boot.error}")
+                raise
+            logger.warning(f"PostgreSQL chưa sẵn sàng (lần {boot.db_attempts}), thử lại sau {delay:.1f}s: {boot.error}")
+            await asyncio.sleep(delay)
+
+
+def _warm_caches():
+    from psycopg2.extras import RealDictCursor
+
+    from app.db.session import connection_pool
+    from app.services.warmup import warm_caches
+
+    conn = connection_pool.getconn()
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            boot.warmed = warm_caches(cursor)
+        conn.rollback()
+    finally:
+        connection_pool.putconn(conn)
+
+
+def start_sync():
+    from app.core.security import warm_password_hasher
+    from app.db.notify import start_listener
+    from app.db.session import connection_pool, read_router
+
+    with boot.phase("db_pool"):
+        _open_with_retry(connection_pool.open)
+        boot.error = None
+        _require_ready(check_ready_sync())
+    logger.info(f"✅ Kết nối PostgreSQL thành công ({connection_pool.min_size} kết nối mở sẵn)")
+    if read_router.enabled:
+        with boot.phase("read_replicas"):
+            opened = read_router.open()
+        logger.info(f"Read replica: {opened}/{len(read_router.replicas)} sẵn sàng")
+
+    with boot.phase("change_listener"):
+        # Chờ lần xóa cache đầu tiên của luồng LISTEN xong rồi mới nạp sẵn cache,
+        # không thì lần xóa đó đến sau và bỏ hết cache vừa nạp
+        if not start_listener(wait=settings.STARTUP_LISTENER_TIMEOUT):
+            logger.warning(f"Chưa LISTEN được sau {settings.STARTUP_LISTENER_TIMEOUT:g}s, "
+                           "cache nạp sẵn có thể bị xóa khi kết nối xong")
+    with boot.phase("password_hasher"):
+        warm_password_hasher()
+
+    if settings.STARTUP_WARM_CACHES:
+        with boot.phase("warm_caches"):
+            try:
+                _warm_caches()
+            except Exception as e:
+                logger.warning(f"Không nạp sẵn được cache (sẽ nạp khi có request): {e}")
+
+
+def stop_sync():
+    from app.core.security import shutdown_password_hasher
+    from app.db.notify import stop_listener
+    from app.db.session import connection_pool, read_router
+
+    stop_listener()
+    shutdown_password_hasher()
+    read_router.close()
+    connection_pool.closeall()
+
+
+def check_ready_sync() -> Optional[str]:
+    """None = sẵn sàng; ngược lại là lý do (trả trong body 503)."""
+    from app.db.session import connection_pool
+    from app.services.schedules import (
+        CLASS_OVERLAP_CONSTRAINT, OVERLAP_CONSTRAINTS_SQL, TEACHER_OVERLAP_CONSTRAINT, missing_overlap_constraints,
+    )
+
+    try:
+        conn = connection_pool.getconn(timeout=settings.READINESS_DB_TIMEOUT)
+    except Exception as e:
+        return f"db: {str(e).strip()}"
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(OVERLAP_CONSTRAINTS_SQL, (TEACHER_OVERLAP_CONSTRAINT, CLASS_OVERLAP_CONSTRAINT))
+            found = {row[0] for row in cursor.fetchall()}
+        conn.rollback()
+        problem = missing_overlap_constraints(found)
+        return f"db: {problem}" if problem else None
+    except Exception as e:
+        return f"db: {str(e).strip()}"
+    finally:
+        connection_pool.putconn(conn)
+
+
+async def check_ready_async() -> Optional[str]:
+    from app.db.async_session import async_connection_pool
+    from app.services.schedules import (
+        CLASS_OVERLAP_CONSTRAINT, OVERLAP_CONSTRAINTS_SQL, TEACHER_OVERLAP_CONSTRAINT, missing_overlap_constraints,
+    )
+
+    try:
+        async with async_connection_pool.connection(timeout=settings.READINESS_DB_TIMEOUT) as conn:
+            cursor = await conn.execute(OVERLAP_CONSTRAINTS_SQL, (TEACHER_OVERLAP_CONSTRAINT, CLASS_OVERLAP_CONSTRAINT))
+            found = {row["conname"] for row in await cursor.fetchall()}
+    except Exception as e:
+        return f"db: {str(e).strip()}"
+    problem = missing_overlap_constraints(found)
+    return f"db: {problem}" if problem else None
+
+
+async def readiness() -> Optional[str]:
+    if boot.stopping:
+        return "đang tắt"
+    if not boot.ready:
+        return "đang khởi động"
+    if settings.USE_ASYNC_DB:
+        return await check_ready_async()
+    return await run_in_threadpool(check_ready_sync)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    started = time.perf_counter()
+    boot.stopping = False
+    from app.services.schedule_stream import schedule_stream_hub
+
+    schedule_stream_hub.bind(asyncio.get_running_loop())  # Trước LISTEN: không lỡ sự kiện nào
+    if settings.USE_ASYNC_DB:
+        from app.core.security import shutdown_password_hasher, warm_password_hasher
+        from app.db.async_session import async_connection_pool, close_async_pool
+        from app.db.notify import start_listener, stop_listener
+
+        with boot.phase("db_pool"):
+            await _aopen_with_retry(async_connection_pool)
+            boot.error = None
+            _require_ready(await check_ready_async())
+        logger.info("✅ Kết nối PostgreSQL thành công (Async Connection Pool created)")
+        # Cùng luồng LISTEN với chế độ sync: xóa cache user / cây kiến thức, đẩy sự kiện lịch
+        with boot.phase("change_listener"):
+            if not await run_in_threadpool(start_listener, settings.STARTUP_LISTENER_TIMEOUT):
+                logger.warning(f"Chưa LISTEN được sau {settings.STARTUP_LISTENER_TIMEOUT:g}s")
+        with boot.phase("password_hasher"):
+            await run_in_threadpool(warm_password_hasher)
+    else:
+        await run_in_threadpool(start_sync)
+
+    boot.phases["startup"] = time.perf_counter() - started
+    boot.ready = True
+    logger.info(f"Worker sẵn sàng sau {boot.phases['startup']:.2f}s: "
+                + ", ".join(f"{k}={v:.3f}s" for k, v in boot.phases.items()))
+    try:
+        yield
+    finally:
+        boot.ready = False
+        boot.stopping = True
+        schedule_stream_hub.close()
+        if settings.USE_ASYNC_DB:
+            await run_in_threadpool(stop_listener)
+            shutdown_password_hasher()
+            await close_async_pool()
+        else:
+            await run_in_threadpool(stop_sync)
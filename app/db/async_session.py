@@ -0,0 +1,49 @@
+# app/db/async_session.py
+import logging
+
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Hồ kết nối bất đồng bộ (psycopg 3)
+# open=False: chỉ mở khi app khởi động (trong event loop, app/core/startup.py), không mở lúc import
+async_connection_pool = AsyncConnectionPool(
+    conninfo="",
+    min_size=settings.DB_POOL_MIN_SIZE,
+    max_size=settings.DB_POOL_MAX_SIZE,
+    timeout=settings.DB_POOL_TIMEOUT,
+    max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+    check=AsyncConnectionPool.check_connection,  # Loại kết nối chết trước khi giao
+    open=False,
+    kwargs={
+        "user": settings.POSTGRES_USER,
+        "password": settings.POSTGRES_PASSWORD,
+        "host": settings.POSTGRES_SERVER,
+        "port": settings.POSTGRES_PORT,
+        "dbname": settings.POSTGRES_DB,
+        "options": "-c search_path=edu,public",  # Trỏ thẳng vào schema 'edu'
+        "row_factory": dict_row,  # Trả về dict giống RealDictCursor
+    },
+)
+
+async def close_async_pool():
+    await async_connection_pool.close()
+
+# Dependency Injection (bản async): cùng ngữ nghĩa commit/rollback với get_db_cursor
+async def get_async_db_cursor():
+    async with async_connection_pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+
+            # API dùng xong -> commit transaction
+            await conn.commit()
+        except Exception as e:
+            await conn.rollback()  # Nếu lỗi thì rollback
+            logger.error(f"DB Error: {e}")
+            raise e
+        finally:
+            await cursor.close()
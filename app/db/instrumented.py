@@ -0,0 +1,70 @@
+# app/db/instrumented.py
+import logging
+import re
+import time
+
+from psycopg2.extras import RealDictCursor
+
+from app.core.config import settings
+from app.core.metrics import current_request_stats
+
+logger = logging.getLogger(__name__)
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query) -> str:
+    """Gom câu SQL về 1 dạng để log / nhóm: bỏ comment, hằng số -> ?, gộp khoảng trắng."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    query = _COMMENT.sub(" ", str(query))
+    query = _LITERAL.sub("?", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class InstrumentedCursor(RealDictCursor):
+    """
+    RealDictCursor có đo đạc: mỗi câu lệnh cộng số query / thời gian / số dòng
+    vào RequestStats của request hiện tại (app/core/metrics.py) và ghi log
+    câu lệnh chậm hơn SLOW_QUERY_MS (đã chuẩn hóa, không lộ tham số).
+    """
+
+    def _record(self, query, elapsed: float):
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_time += elapsed
+            if self.rowcount > 0:
+                stats.rows += self.rowcount
+        if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+            if stats is not None:
+                stats.slow_queries += 1
+            logger.warning(
+                "Slow query %.1fms [%s %s] rows=%s: %s",
+                elapsed * 1000,
+                stats.method if stats else "-", stats.path if stats else "-",
+                self.rowcount, normalize_sql(query)[:1000],
+            )
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            self._record(query, time.perf_counter() - started)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            self._record(query, time.perf_counter() - started)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            self._record(sql, time.perf_counter() - started)
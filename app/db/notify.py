@@ -0,0 +1,200 @@
+# app/db/notify.py
+"""
+Đồng bộ cache trong tiến trình giữa nhiều worker / nhiều máy qua LISTEN/NOTIFY.
+
+- Ghi: publish_change(cursor, bảng, key) (apublish_change cho router async) gọi
+  pg_notify trong CÙNG transaction của request -> Postgres chỉ gửi khi commit
+  (rollback thì không gửi), các thông báo trùng trong 1 transaction được gộp.
+  Trigger ở migration 003 gửi cùng định dạng cho thay đổi ngoài API (psql, script).
+- Đọc: mỗi worker (cả chế độ USE_ASYNC_DB) chạy 1 luồng nền giữ 1 kết nối LISTEN
+  riêng (không lấy từ hồ), nhận thông báo và gọi các hàm đã subscribe(bảng,
+  callback) với key (None = xóa toàn bộ dữ liệu của bảng đó).
+- Mất kết nối: thử lại với backoff tăng dần; kết nối lại được thì xóa TOÀN BỘ
+  cache (thông báo trong lúc mất kết nối đã bị lỡ).
+
+Payload: {"table": "users", "key": "gv01"} (key có thể null).
+"""
+import json
+import logging
+import random
+import select
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import psycopg2
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_subscribers: Dict[str, List[Callable[[Optional[str]], None]]] = defaultdict(list)
+_listener: Optional["ChangeListener"] = None
+
+
+def make_payload(table: str, key=None) -> str:
+    return json.dumps({"table": table, "key": None if key is None else str(key)},
+                      ensure_ascii=False, separators=(",", ":"))
+
+
+NOTIFY_SQL = "SELECT pg_notify(%s, %s)"
+
+
+def publish_change(cursor, table: str, key=None):
+    """Báo cho mọi worker dữ liệu `table` (dòng `key`, None = nhiều dòng) đã đổi; gửi khi commit."""
+    if not settings.CHANGE_NOTIFY_ENABLED:
+        return
+    cursor.execute(NOTIFY_SQL, (settings.CHANGE_NOTIFY_CHANNEL, make_payload(table, key)))
+
+
+async def apublish_change(cursor, table: str, key=None):
+    """Như publish_change, cho cursor psycopg 3 (router async)."""
+    if not settings.CHANGE_NOTIFY_ENABLED:
+        return
+    await cursor.execute(NOTIFY_SQL, (settings.CHANGE_NOTIFY_CHANNEL, make_payload(table, key)))
+
+
+def subscribe(table: str, callback: Callable[[Optional[str]], None]):
+    """Đăng ký hàm xóa / làm mới cache khi bảng `table` đổi: callback(key), key=None -> xóa hết."""
+    _subscribers[table].append(callback)
+
+
+def dispatch(table: str, key: Optional[str]):
+    for callback in _subscribers.get(table, ()):
+        try:
+            callback(key)
+        except Exception:
+            logger.exception("Lỗi xử lý thông báo thay đổi %s/%s", table, key)
+
+
+def flush_all():
+    """Xóa toàn bộ cache đã đăng ký (khi có thể đã lỡ thông báo)."""
+    for table in list(_subscribers):
+        dispatch(table, None)
+
+
+class ChangeListener(threading.Thread):
+    """Luồng nền LISTEN kênh thay đổi; tự kết nối lại và xóa toàn bộ cache sau mỗi lần mất kết nối."""
+
+    def __init__(self, channel: str):
+        super().__init__(name="change-listener", daemon=True)
+        self.channel = channel
+        self._stopping = threading.Event()
+        self.listening = threading.Event()  # Đã LISTEN + xóa cache lần đầu (startup chờ trước khi nạp sẵn cache)
+        self._conn = None
+        self.connected = False
+        self.received = 0
+        self.reconnects = 0
+        self.flushes = 0
+        self.last_error: Optional[str] = None
+
+    def _connect(self):
+        conn = psycopg2.connect(
+            user=settings.POSTGRES_USER,
+            password=settings.POSTGRES_PASSWORD,
+            host=settings.POSTGRES_SERVER,
+            port=settings.POSTGRES_PORT,
+            database=settings.POSTGRES_DB,
+            application_name="edu-change-listener",
+            keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3,
+        )
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+        return conn
+
+    def _handle(self, notify):
+        self.received += 1
+        try:
+            payload = json.loads(notify.payload)
+            table, key = payload["table"], payload.get("key")
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Thông báo thay đổi không hợp lệ: %r", notify.payload)
+            return
+        dispatch(table, key)
+
+    def _listen(self):
+        last_activity = time.monotonic()
+        while not self._stopping.is_set():
+            ready, _, _ = select.select([self._conn], [], [], 1.0)
+            if ready:
+                self._conn.poll()
+                while self._conn.notifies:
+                    self._handle(self._conn.notifies.pop(0))
+                last_activity = time.monotonic()
+            elif time.monotonic() - last_activity > settings.CHANGE_NOTIFY_KEEPALIVE:
+                # Kết nối "chết im lặng" (mạng đứt, failover) -> lỗi ở đây để kết nối lại
+                with self._conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                last_activity = time.monotonic()
+
+    def run(self):
+        delay = 0.5
+        while not self._stopping.is_set():
+            try:
+                self._conn = self._connect()
+                self.connected = True
+                # Lần đầu: cache có thể đã nạp trước khi LISTEN; các lần sau: đã lỡ thông báo
+                flush_all()
+                self.flushes += 1
+                self.listening.set()
+                delay = 0.5
+                self._listen()
+            except Exception as e:
+                if self._stopping.is_set():
+                    break
+                self.last_error = str(e).strip()
+                logger.warning("Mất kết nối LISTEN %s: %s (thử lại sau %.1fs)", self.channel, self.last_error, delay)
+            finally:
+                self.connected = False
+                if self._conn is not None:
+                    try:
+                        self._conn.close()
+                    except Exception:
+                        pass
+                    self._conn = None
+            if self._stopping.wait(delay * random.uniform(0.8, 1.2)):
+                break
+            self.reconnects += 1
+            delay = min(delay * 2, settings.CHANGE_NOTIFY_RECONNECT_MAX)
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping.set()
+        self.join(timeout)
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "received": self.received,
+            "reconnects": self.reconnects,
+            "flushes": self.flushes,
+            "last_error": self.last_error,
+        }
+
+
+def start_listener(wait: float = 0.0) -> bool:
+    """
+    Chạy luồng LISTEN; wait > 0: chờ tối đa `wait` giây tới khi đã LISTEN và xóa
+    cache lần đầu. False = chưa kịp (lần xóa đó có thể đến sau, xóa cache đã nạp).
+    """
+    global _listener
+    if not settings.CHANGE_NOTIFY_ENABLED:
+        return True
+    if _listener is None:
+        _listener = ChangeListener(settings.CHANGE_NOTIFY_CHANNEL)
+        _listener.start()
+    return _listener.listening.wait(wait) if wait > 0 else _listener.listening.is_set()
+
+
+def stop_listener():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def listener_stats() -> dict:
+    if _listener is None:
+        return {"enabled": settings.CHANGE_NOTIFY_ENABLED, "running": False}
+    return dict(_listener.stats(), enabled=True, running=_listener.is_alive())
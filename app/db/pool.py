@@ -0,0 +1,262 @@
+# app/db/pool.py
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+
+logger = logging.getLogger(__name__)
+
+# Các mốc (giây) của histogram thời gian chờ lấy kết nối
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PoolTimeout(Exception):
+    """Hết thời gian chờ mà vẫn không lấy được kết nối (hồ đã cạn)."""
+
+
+class ConnectionPool:
+    """
+    Hồ kết nối psycopg2 an toàn đa luồng (thay cho SimpleConnectionPool).
+
+    - Giữ tối đa `max_size` kết nối, cho phép mở thêm `max_overflow` kết nối
+      tạm thời khi cao điểm (đóng ngay khi trả về).
+    - Hết kết nối thì xếp hàng chờ tối đa `timeout` giây rồi báo PoolTimeout.
+    - Kết nối nằm chờ quá `ping_idle_after` giây được kiểm tra bằng `SELECT 1`
+      trước khi giao (loại bỏ kết nối chết sau khi Postgres khởi động lại).
+    - Kết nối sống quá `max_lifetime` giây bị đóng và mở lại.
+    - open(): mở sẵn `min_size` kết nối song song lúc khởi động (app/core/startup.py).
+    - stats(): số liệu đang dùng / rảnh / đang chờ và histogram thời gian chờ.
+
+    Giữ nguyên API getconn()/putconn()/closeall() của psycopg2.pool.
+    """
+
+    def __init__(self, min_size, max_size, max_overflow=0, timeout=10.0,
+                 max_lifetime=1800.0, ping_idle_after=30.0, **connect_kwargs):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_idle_after = ping_idle_after
+        self._connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = deque()      # (conn, thời điểm trả về hồ)
+        self._created = {}        # id(conn) -> thời điểm mở kết nối
+        self._size = 0            # Tổng số kết nối đang mở (kể cả đang mở dở)
+        self._in_use = 0
+        self._waiters = 0
+        self._closed = False
+
+        # Số liệu thống kê
+        self._wait_counts = [0] * (len(WAIT_BUCKETS) + 1)
+        self._wait_sum = 0.0
+        self._wait_count = 0
+        self._timeouts = 0
+        self._connections_opened = 0
+        self._connections_discarded = 0
+
+    def open(self):
+        """
+        Mở sẵn các kết nối còn thiếu so với min_size, song song (gọi lúc khởi động).
+        Khởi tạo hồ không mở kết nối nào; không gọi open() thì getconn() tự mở dần.
+        Có kết nối lỗi -> giữ các kết nối đã mở được rồi raise (gọi lại để thử tiếp).
+        """
+        with self._cond:
+            missing = max(0, self.min_size - self._size)
+            self._size += missing  # Giữ chỗ trước, getconn() song song không mở quá max_size
+        if not missing:
+            return
+
+        opened, error = [], None
+        with ThreadPoolExecutor(max_workers=missing, thread_name_prefix="db-pool-open") as executor:
+            for future in [executor.submit(self._connect) for _ in range(missing)]:
+                try:
+                    opened.append(future.result())
+                except Exception as e:
+                    error = error or e
+
+        with self._cond:
+            self._size -= missing - len(opened)
+            now = time.monotonic()
+            self._idle.extend((conn, now) for conn in opened)
+            self._cond.notify_all()
+        if error is not None:
+            raise error
+
+    # --- Mở / đóng kết nối vật lý ---
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        with self._cond:
+            self._created[id(conn)] = time.monotonic()
+            self._connections_opened += 1
+        return conn
+
+    def _release_slot(self, conn):
+        """Trả lại suất của kết nối sắp đóng. Gọi khi ĐANG giữ lock."""
+        self._created.pop(id(conn), None)
+        self._size -= 1
+        self._connections_discarded += 1
+        self._cond.notify()
+
+    def _discard(self, conn):
+        """Đóng kết nối và trả lại 1 suất cho hồ. Gọi khi KHÔNG giữ lock."""
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._release_slot(conn)
+
+    def _is_expired(self, conn):
+        created = self._created.get(id(conn))
+        return created is None or time.monotonic() - created > self.max_lifetime
+
+    def _is_alive(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.ping_idle_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    # --- API chính ---
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn = None
+            idle_since = None
+            must_connect = False
+
+            with self._cond:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+
+                self._waiters += 1
+                try:
+                    while not self._idle and self._size >= self.max_size + self.max_overflow:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            self._record_wait(time.monotonic() - started)
+                            raise PoolTimeout(
+                                f"Không lấy được kết nối sau {timeout:.1f}s "
+                                f"(đang dùng {self._in_use}/{self.max_size + self.max_overflow})"
+                            )
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+                if self._idle:
+                    conn, idle_since = self._idle.pop()  # LIFO: ưu tiên kết nối "nóng"
+                else:
+                    self._size += 1  # Giữ chỗ rồi mới mở kết nối (ngoài lock)
+                    must_connect = True
+                self._in_use += 1
+
+            if must_connect:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+            elif self._is_expired(conn) or not self._is_alive(conn, idle_since):
+                # Kết nối chết hoặc quá tuổi -> bỏ và thử lại
+                with self._cond:
+                    self._in_use -= 1
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._record_wait(time.monotonic() - started)
+            return conn
+
+    def putconn(self, conn, close=False):
+        with self._cond:
+            self._in_use -= 1
+
+        broken = conn.closed or conn.info.transaction_status == extensions.TRANSACTION_STATUS_UNKNOWN
+        if not broken and conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            # Transaction còn dở (handler quên commit/rollback) -> dọn sạch
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+
+        if close or broken or self._closed or self._is_expired(conn):
+            self._discard(conn)
+            return
+
+        with self._cond:
+            if self._size <= self.max_size:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                return
+            # Đang mở quá max_size (kết nối overflow) -> đóng. Trả suất ngay trong
+            # lock: các kết nối trả về cùng lúc không cùng bị coi là overflow
+            self._release_slot(conn)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    # --- Thống kê ---
+
+    def _record_wait(self, seconds):
+        """Ghi nhận thời gian chờ. Gọi khi ĐANG giữ lock."""
+        self._wait_counts[bisect_left(WAIT_BUCKETS, seconds)] += 1
+        self._wait_sum += seconds
+        self._wait_count += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(WAIT_BUCKETS + (float("inf"),), self._wait_counts):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "max_overflow": self.max_overflow,
+                "size": self._size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "waiters": self._waiters,
+                "timeouts": self._timeouts,
+                "connections_opened": self._connections_opened,
+                "connections_discarded": self._connections_discarded,
+                "wait_seconds": {
+                    "count": self._wait_count,
+                    "sum": round(self._wait_sum, 6),
+                    "buckets": buckets,
+                },
+            }
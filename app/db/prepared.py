@@ -0,0 +1,170 @@
+# app/db/prepared.py
+"""
+Prepared statement phía server cho các query đọc lớn, cố định (cây kiến thức,
+/school-data, /teacher/classes-lessons).
+
+- register(label, sql): đăng ký 1 câu SQL (tham số %s), đặt tên cố định theo
+  nội dung -> cùng câu SQL luôn cùng tên trên mọi kết nối.
+- execute_prepared(cursor, query, params): lần đầu trên mỗi kết nối thì PREPARE,
+  sau đó chỉ EXECUTE theo tên (Postgres bỏ qua parse / analyze và, khi đã chọn
+  generic plan, cả bước lập kế hoạch).
+- Kết nối mới (mở lại sau lỗi, hết tuổi thọ) là object mới -> PREPARE lại.
+  Đổi schema làm đổi kiểu kết quả ("cached plan must not change result type")
+  hoặc statement mất trên server -> bỏ statement đó, PREPARE lại; nếu lỗi xảy ra
+  ở câu đầu tiên của transaction thì rollback và chạy lại ngay.
+- Thời gian lập kế hoạch tiết kiệm được (ước lượng bằng "Planning Time" của
+  EXPLAIN, đo 1 lần khi PREPARE) cộng vào số liệu của request (/metrics,
+  header Server-Timing).
+
+Chỉ dùng cho psycopg2 (chế độ sync); psycopg 3 (USE_ASYNC_DB) đã tự prepare
+các query chạy lặp lại (prepare_threshold).
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import weakref
+from typing import Dict, Optional
+
+from psycopg2 import errors, extensions
+
+from app.core.config import settings
+from app.core.metrics import PREPARED_EXECUTIONS, PREPARED_PLAN_SAVED, PREPARES, current_request_stats
+
+logger = logging.getLogger(__name__)
+
+# Postgres dùng custom plan (lập kế hoạch mỗi lần) cho 5 lần chạy đầu của
+# statement có tham số, sau đó mới có thể chuyển sang generic plan
+CUSTOM_PLAN_RUNS = 5
+
+_PLACEHOLDER = re.compile(r"%(s|%)")
+_RETRYABLE = (errors.InvalidSqlStatementName, errors.FeatureNotSupported)
+
+
+class PreparedQuery:
+    def __init__(self, label: str, sql: str):
+        self.label = label
+        self.sql = sql
+        digest = hashlib.sha1(sql.encode("utf-8")).hexdigest()[:10]
+        self.name = f"{re.sub(r'[^a-z0-9_]', '_', label.lower())}_{digest}"
+
+        count = 0
+
+        def positional(match):
+            nonlocal count
+            if match.group(1) == "%":
+                return "%"
+            count += 1
+            return f"${count}"
+
+        body = _PLACEHOLDER.sub(positional, sql.strip().rstrip(";"))
+        self.param_count = count
+        self.prepare_sql = f"PREPARE {self.name} AS {body}"
+        self.execute_sql = f"EXECUTE {self.name}" + (f" ({', '.join(['%s'] * count)})" if count else "")
+        self.plan_seconds: Optional[float] = None  # Đo 1 lần / tiến trình (đo lại khi schema đổi)
+
+
+_registry: Dict[str, PreparedQuery] = {}
+_registry_lock = threading.Lock()
+
+# Kết nối -> {tên statement: số lần đã EXECUTE}; kết nối bị đóng / thu hồi thì tự biến mất
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+
+
+def register(label: str, sql: str) -> PreparedQuery:
+    """Đăng ký (hoặc lấy lại) query theo nội dung SQL; gọi được ở mức module hoặc lúc chạy."""
+    query = _registry.get(sql)
+    if query is None:
+        with _registry_lock:
+            query = _registry.setdefault(sql, PreparedQuery(label, sql))
+    return query
+
+
+def _statements(conn) -> Dict[str, int]:
+    with _prepared_lock:
+        statements = _prepared.get(conn)
+        if statements is None:
+            statements = _prepared[conn] = {}
+        return statements
+
+
+def _measure_plan(cursor, query: PreparedQuery, params):
+    """Ước lượng thời gian lập kế hoạch (chỉ lập kế hoạch, không chạy query)."""
+    cursor.execute(f"EXPLAIN (SUMMARY ON, FORMAT JSON) {query.sql}", params)
+    row = cursor.fetchone()
+    plan = next(iter(row.values())) if isinstance(row, dict) else row[0]
+    try:
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        query.plan_seconds = plan[0]["Planning Time"] / 1000
+    except (ValueError, LookupError, TypeError) as e:
+        logger.warning(f"Không đo được thời gian lập kế hoạch của {query.name}: {e}")
+        query.plan_seconds = 0.0
+
+
+def _prepare(cursor, query: PreparedQuery, params, statements: Dict[str, int], stale: bool):
+    if stale:
+        cursor.execute(f"DEALLOCATE {query.name}")
+    if query.plan_seconds is None:
+        _measure_plan(cursor, query, params)
+    cursor.execute(query.prepare_sql)
+    statements[query.name] = 0
+    PREPARES.inc(query.label)
+
+
+def execute_prepared(cursor, query: PreparedQuery, params=()):
+    """Chạy query đã đăng ký bằng EXECUTE theo tên (PREPARE lần đầu trên kết nối này)."""
+    if not settings.PREPARED_STATEMENTS_ENABLED:
+        cursor.execute(query.sql, params)
+        return
+
+    conn = cursor.connection
+    statements = _statements(conn)
+    first_in_transaction = conn.info.transaction_status == extensions.TRANSACTION_STATUS_IDLE
+    runs = statements.get(query.name)
+    try:
+        if runs is None or runs < 0:
+            _prepare(cursor, query, params, statements, stale=runs is not None)
+        cursor.execute(query.execute_sql, params)
+    except _RETRYABLE as e:
+        if isinstance(e, errors.FeatureNotSupported) and "cached plan" not in str(e):
+            raise
+        # Statement mất trên server -> chỉ cần PREPARE; còn nhưng lỗi thời -> DEALLOCATE trước
+        missing = isinstance(e, errors.InvalidSqlStatementName)
+        if missing:
+            statements.pop(query.name, None)
+        else:
+            statements[query.name] = -1
+        query.plan_seconds = None
+        logger.warning(f"Prepared statement {query.name} cần PREPARE lại: {str(e).strip()}")
+        if not first_in_transaction:
+            raise  # Transaction đã có câu lệnh khác -> không chạy lại được; lần sau PREPARE lại
+        conn.rollback()
+        _prepare(cursor, query, params, statements, stale=not missing)
+        cursor.execute(query.execute_sql, params)
+
+    runs = statements[query.name] = statements[query.name] + 1
+    PREPARED_EXECUTIONS.inc(query.label)
+    # Lần chạy ngay sau PREPARE vẫn phải lập kế hoạch; statement có tham số thì
+    # 5 lần đầu luôn dùng custom plan (lập kế hoạch lại mỗi lần)
+    if runs > (CUSTOM_PLAN_RUNS if query.param_count else 1) and query.plan_seconds:
+        PREPARED_PLAN_SAVED.inc(query.label, amount=query.plan_seconds)
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.plan_saved += query.plan_seconds
+
+
+def prepared_stats() -> dict:
+    with _prepared_lock:
+        connections = len(_prepared)
+        statements = sum(len(s) for s in _prepared.values())
+    return {
+        "registered": len(_registry),
+        "connections": connections,
+        "statements": statements,
+        "plan_ms": {
+            q.name: round(q.plan_seconds * 1000, 3) for q in list(_registry.values()) if q.plan_seconds is not None
+        },
+    }
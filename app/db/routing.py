@@ -0,0 +1,214 @@
+# app/db/routing.py
+"""
+Định tuyến đọc sang bản sao (read replica) cho các API GET.
+
+- Ghi: luôn ở primary (get_db_cursor).
+- Đọc: get_read_db_cursor lấy kết nối từ 1 replica (xoay vòng); replica lỗi
+  thì tạm bỏ qua DB_REPLICA_RETRY_AFTER giây, hết replica -> đọc ở primary.
+
+Đọc được dữ liệu mình vừa ghi (read-your-writes), theo từng user:
+- Request ghi có token thì sau commit ghi lại (thời điểm, LSN hiện tại của
+  primary) cho user đó. Trong DB_READ_YOUR_WRITES_WINDOW giây sau đó mọi lần
+  đọc của user đi primary.
+- Hết cửa sổ mà replica chưa replay tới LSN đó (pg_last_wal_replay_lsn) thì
+  vẫn đọc ở primary; replay xong thì bỏ dấu. Dấu quá DB_READ_YOUR_WRITES_TTL
+  giây thì bỏ (replica trễ quá lâu -> chấp nhận đọc dữ liệu cũ).
+- Worker khác nhận dấu ghi qua LISTEN/NOTIFY (bảng giả "db_writes", chỉ có
+  cửa sổ thời gian, không có LSN). Kết nối LISTEN bị mất (có thể lỡ thông báo)
+  -> mọi user đọc ở primary trong 1 cửa sổ.
+
+Thử nghiệm không cần streaming replication: trỏ DB_REPLICA_URLS vào 1 database
+khác (bản sao dữ liệu). Kết nối replica luôn ở chế độ chỉ đọc; database không ở
+trạng thái recovery thì coi như luôn đã replay (chỉ còn cửa sổ thời gian).
+"""
+import itertools
+import logging
+import threading
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+import psycopg2
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.db.notify import make_payload, subscribe
+from app.db.pool import ConnectionPool, PoolTimeout
+
+logger = logging.getLogger(__name__)
+
+WRITES_TABLE = "db_writes"
+MAX_TRACKED_WRITERS = 10000
+
+# Transaction đã ghi (đã được cấp xid) -> báo cho worker khác, gửi khi commit
+_MARK_WRITE_NOTIFY_SQL = """
+    SELECT pg_notify(%s, %s)
+    FROM (SELECT txid_current_if_assigned() AS xid) t
+    WHERE xid IS NOT NULL
+"""
+_MARK_WRITE_SQL = "SELECT 1 WHERE txid_current_if_assigned() IS NOT NULL"
+REPLAYED_SQL = "SELECT NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= %s::pg_lsn"
+
+
+class WriteMark(NamedTuple):
+    written_at: float     # time.monotonic()
+    lsn: Optional[str]    # None = nhận qua NOTIFY từ worker khác
+
+
+def mark_write(cursor, key: str) -> bool:
+    """Gọi trước commit: True nếu transaction đã ghi dữ liệu (kèm NOTIFY cho worker khác)."""
+    if settings.CHANGE_NOTIFY_ENABLED:
+        cursor.execute(_MARK_WRITE_NOTIFY_SQL, (settings.CHANGE_NOTIFY_CHANNEL, make_payload(WRITES_TABLE, key)))
+    else:
+        cursor.execute(_MARK_WRITE_SQL)
+    return cursor.rowcount > 0
+
+
+def current_wal_lsn(conn) -> Optional[str]:
+    """Gọi sau commit: vị trí WAL hiện tại của primary (>= LSN commit vừa rồi)."""
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_current_wal_lsn()::text")
+            return cursor.fetchone()[0]
+    except psycopg2.Error as e:
+        logger.warning(f"Không lấy được LSN sau commit: {e}")
+        return None
+    finally:
+        conn.autocommit = False
+
+
+class ReadRouter:
+    """Chọn replica cho 1 lần đọc; None = đọc ở primary."""
+
+    def __init__(self, replicas: List[ConnectionPool], window: float, ttl: float, retry_after: float):
+        self.replicas = replicas
+        self.window = window
+        self.retry_after = retry_after
+        self._writes = TTLCache(maxsize=MAX_TRACKED_WRITERS, ttl=ttl)
+        self._lock = threading.Lock()
+        self._order = itertools.count()
+        self._down_until = [0.0] * len(replicas)
+        self._primary_until = 0.0
+
+        # Số liệu cho /health
+        self.replica_reads = 0
+        self.sticky_reads = 0     # Trong cửa sổ sau khi ghi
+        self.lagging_reads = 0    # Replica chưa replay tới LSN của user
+        self.fallback_reads = 0   # Mọi replica đang lỗi
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def open(self) -> int:
+        """Mở sẵn kết nối của từng replica; replica lỗi bị tạm bỏ qua (không chặn khởi động)."""
+        opened = 0
+        for index, pool in enumerate(self.replicas):
+            try:
+                pool.open()
+                opened += 1
+            except Exception as e:
+                self._mark_down(index, e)
+        return opened
+
+    def close(self):
+        for pool in self.replicas:
+            pool.closeall()
+
+    def record_write(self, key: Optional[str], lsn: Optional[str] = None):
+        if not self.replicas:
+            return
+        now = time.monotonic()
+        if key is None:
+            # Có thể đã lỡ thông báo ghi -> mọi user đọc ở primary trong 1 cửa sổ
+            self._primary_until = now + self.window
+            return
+        with self._lock:
+            previous = self._writes.get(key)
+            if lsn is None and previous is not None:
+                lsn = previous.lsn  # NOTIFY của chính worker này tới sau bản ghi có LSN
+            self._writes.set(key, WriteMark(now, lsn))
+
+    def _forget(self, key: str, mark: WriteMark):
+        with self._lock:
+            if self._writes.get(key) is mark:
+                self._writes.pop(key)
+
+    def _mark_down(self, index: int, error: Exception):
+        self.errors += 1
+        self._down_until[index] = time.monotonic() + self.retry_after
+        logger.warning(f"Replica #{index} lỗi, tạm đọc ở primary {self.retry_after:g}s: {str(error).strip()}")
+
+    def checkout(self, key: Optional[str]) -> Optional[Tuple[ConnectionPool, object]]:
+        """Trả (pool, conn) của 1 replica dùng được cho user `key`, hoặc None (đọc ở primary)."""
+        if not self.replicas:
+            return None
+        now = time.monotonic()
+        mark = self._writes.get(key) if key is not None else None
+        if now < self._primary_until or (mark is not None and now - mark.written_at < self.window):
+            self.sticky_reads += 1
+            return None
+
+        for _ in range(len(self.replicas)):
+            index = next(self._order) % len(self.replicas)
+            if self._down_until[index] > now:
+                continue
+            pool = self.replicas[index]
+            try:
+                conn = pool.getconn()
+            except (PoolTimeout, psycopg2.Error) as e:
+                self._mark_down(index, e)
+                continue
+
+            if mark is not None and mark.lsn is not None:
+                try:
+                    with conn.cursor() as cursor:
+                        cursor.execute(REPLAYED_SQL, (mark.lsn,))
+                        replayed = cursor.fetchone()[0]
+                except psycopg2.Error as e:
+                    pool.putconn(conn, close=True)
+                    self._mark_down(index, e)
+                    continue
+                if not replayed:
+                    pool.putconn(conn)
+                    self.lagging_reads += 1
+                    return None
+                self._forget(key, mark)
+
+            self.replica_reads += 1
+            return pool, conn
+
+        self.fallback_reads += 1
+        return None
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "replicas": [
+                dict(pool.stats(), down=self._down_until[i] > now) for i, pool in enumerate(self.replicas)
+            ],
+            "tracked_writers": self._writes.stats()["size"],
+            "replica_reads": self.replica_reads,
+            "sticky_reads": self.sticky_reads,
+            "lagging_reads": self.lagging_reads,
+            "fallback_reads": self.fallback_reads,
+            "errors": self.errors,
+        }
+
+
+def create_read_router(create_pool) -> ReadRouter:
+    """Tạo hồ (chưa mở kết nối) cho từng URI trong DB_REPLICA_URLS."""
+    replicas = [
+        # Chỉ đọc ở mức phiên: database thay thế (không phải standby) cũng từ chối ghi
+        create_pool(dsn=url, options="-c search_path=edu,public -c default_transaction_read_only=on")
+        for url in filter(None, (u.strip() for u in settings.DB_REPLICA_URLS.split(",")))
+    ]
+    router = ReadRouter(
+        replicas,
+        window=settings.DB_READ_YOUR_WRITES_WINDOW,
+        ttl=settings.DB_READ_YOUR_WRITES_TTL,
+        retry_after=settings.DB_REPLICA_RETRY_AFTER,
+    )
+    subscribe(WRITES_TABLE, router.record_write)
+    return router
@@ -1,57 +1,163 @@
 # app/db/session.py
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from psycopg2 import pool
+from psycopg2.extras import register_default_json, register_default_jsonb
 import logging
+import time
+from contextlib import contextmanager
+from typing import Optional
+from fastapi import HTTPException, Request, status
 from app.core.config import settings
+from app.core.metrics import current_request_stats
+from app.core.responses import loads as json_loads
+from app.db.instrumented import InstrumentedCursor
+from app.db.pool import ConnectionPool, PoolTimeout
+from app.db.routing import create_read_router, current_wal_lsn, mark_write
 
 # Cấu hình logging để dễ debug
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-try:
-    # Tạo hồ kết nối (Connection Pool)
-    # Minconn=1, Maxconn=20
-    connection_pool = psycopg2.pool.SimpleConnectionPool(
-        1, 20,
-        user=settings.POSTGRES_USER,
-        password=settings.POSTGRES_PASSWORD,
-        host=settings.POSTGRES_SERVER,
-        port=settings.POSTGRES_PORT,
-        database=settings.POSTGRES_DB,
-        options="-c search_path=edu,public" # Quan trọng: Trỏ thẳng vào schema 'edu'
+# Giải mã cột json/jsonb (kết quả json_agg) bằng orjson nếu có
+register_default_json(globally=True, loads=json_loads)
+register_default_jsonb(globally=True, loads=json_loads)
+
+def _create_pool(**target):
+    # Kích thước / timeout / tuổi thọ kết nối lấy từ Settings (DB_POOL_*), dùng chung cho primary và replica
+    return ConnectionPool(
+        min_size=settings.DB_POOL_MIN_SIZE,
+        max_size=settings.DB_POOL_MAX_SIZE,
+        max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+        timeout=settings.DB_POOL_TIMEOUT,
+        max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+        ping_idle_after=settings.DB_POOL_PING_IDLE_AFTER,
+        **target
     )
 
-    if connection_pool:
-        logger.info("✅ Kết nối PostgreSQL thành công (Connection Pool created)")
+# Tạo hồ kết nối (Connection Pool) an toàn đa luồng tới primary.
+# Chưa mở kết nối nào lúc import: lifespan (app/core/startup.py) mở sẵn min_size
+# kết nối song song, có thử lại, và chỉ báo /readyz khi đã xong.
+connection_pool = _create_pool(
+    user=settings.POSTGRES_USER,
+    password=settings.POSTGRES_PASSWORD,
+    host=settings.POSTGRES_SERVER,
+    port=settings.POSTGRES_PORT,
+    database=settings.POSTGRES_DB,
+    options="-c search_path=edu,public" # Quan trọng: Trỏ thẳng vào schema 'edu'
+)
+
+# Hồ kết nối tới các read replica (DB_REPLICA_URLS), xem app/db/routing.py; mở cùng lúc với primary
+read_router = create_read_router(_create_pool)
 
-except (Exception, psycopg2.DatabaseError) as error:
-    logger.error(f"❌ Lỗi kết nối PostgreSQL: {error}")
+def session_key(request: Request) -> Optional[str]:
+    """User của request (username trong Bearer token) để theo dõi read-your-writes; chỉ tính khi có replica."""
+    if not read_router.enabled:
+        return None
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    from app.api.deps import decode_token_subject  # deps import session -> import muộn
 
-# Dependency Injection: Hàm này sẽ được gọi trong mỗi API request
-def get_db_cursor():
-    conn = None
     try:
-        # Lấy 1 kết nối từ hồ
-        conn = connection_pool.getconn()
-        
+        return decode_token_subject(token)
+    except HTTPException:
+        return None
+
+def _getconn(pool):
+    # Lấy 1 kết nối từ hồ (xếp hàng chờ tối đa DB_POOL_TIMEOUT giây)
+    started = time.perf_counter()
+    try:
+        return pool.getconn()
+    except PoolTimeout as e:
+        logger.warning(f"DB Pool exhausted: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Hệ thống đang quá tải, vui lòng thử lại sau."
+        )
+    finally:
+        stats = current_request_stats.get()
+        if stats is not None:
+            stats.pool_wait += time.perf_counter() - started
+
+def _cursor_session(pool, conn, writer: Optional[str] = None):
+    """Thân chung của get_db_cursor / get_read_db_cursor: cấp cursor, commit/rollback, trả kết nối."""
+    try:
         # Tạo con trỏ (Cursor) trả về Dictionary thay vì Tuple
         # Ví dụ: thay vì (1, 'admin'), nó trả về {'id': 1, 'username': 'admin'}
-        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        # InstrumentedCursor: đếm query / thời gian / số dòng cho /metrics
+        cursor = conn.cursor(cursor_factory=InstrumentedCursor)
         
         yield cursor # Trả cursor cho hàm xử lý API dùng
+
+        # User vừa ghi -> đọc của user đó đi primary tới khi replica bắt kịp
+        wrote = writer is not None and mark_write(cursor, writer)
         
         # Sau khi API dùng xong, commit transaction
         conn.commit()
         cursor.close()
+
+        if wrote:
+            read_router.record_write(writer, current_wal_lsn(conn))
+
+        # Chạy các hàm đăng ký qua on_commit() (VD: xóa cache sau khi ghi)
+        for callback in getattr(cursor, "after_commit", ()):
+            callback()
         
     except Exception as e:
-        if conn:
-            conn.rollback() # Nếu lỗi thì rollback
+        conn.rollback() # Nếu lỗi thì rollback
         logger.error(f"DB Error: {e}")
         raise e
         
     finally:
-        if conn:
-            # Trả kết nối về hồ để người khác dùng
-            connection_pool.putconn(conn)
\ No newline at end of file
+        # Trả kết nối về hồ để người khác dùng
+        pool.putconn(conn)
+
+# Dependency Injection: Hàm này sẽ được gọi trong mỗi API request ghi dữ liệu (primary)
+def get_db_cursor(request: Request):
+    conn = _getconn(connection_pool)
+    yield from _cursor_session(connection_pool, conn, session_key(request))
+
+# Dependency cho API chỉ đọc: replica nếu có và đã bắt kịp lần ghi gần nhất của user, không thì primary
+def get_read_db_cursor(request: Request):
+    checked_out = read_router.checkout(session_key(request))
+    if checked_out is None:
+        pool, conn = connection_pool, _getconn(connection_pool)
+    else:
+        pool, conn = checked_out
+    yield from _cursor_session(pool, conn)
+
+@contextmanager
+def read_connection(key: Optional[str] = None):
+    """Mượn 1 kết nối đọc NGOÀI luồng Depends (cùng quy tắc chọn replica); transaction dở được rollback khi trả."""
+    checked_out = read_router.checkout(key)
+    if checked_out is None:
+        pool, conn = connection_pool, _getconn(connection_pool)
+    else:
+        pool, conn = checked_out
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+@contextmanager
+def primary_cursor(commit: bool = False):
+    """
+    Cursor trên primary, mượn NGOÀI luồng Depends: chỉ lấy kết nối khi thật sự cần
+    query (VD: cache trượt) và trả ngay sau đó, không chạy mark_write như get_db_cursor.
+    commit=True: commit khi khối lệnh xong (transaction ghi ngắn); lỗi -> rollback.
+    """
+    conn = _getconn(connection_pool)
+    try:
+        with conn.cursor(cursor_factory=InstrumentedCursor) as cursor:
+            yield cursor
+        if commit:
+            conn.commit()
+    finally:
+        connection_pool.putconn(conn)  # putconn rollback transaction còn dở (chỉ đọc, hoặc lỗi)
+
+def on_commit(cursor, callback):
+    """
+    Đăng ký hàm chạy sau khi transaction của request commit thành công.
+    Dùng để xóa cache: xóa trước commit thì request khác có thể nạp lại dữ liệu cũ.
+    """
+    if not hasattr(cursor, "after_commit"):
+        cursor.after_commit = []
+    cursor.after_commit.append(callback)
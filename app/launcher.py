@@ -0,0 +1,358 @@
+# app/launcher.py
+"""
+Chạy production nhiều worker (Linux):
+    python -m app.launcher --workers 4 --port 8000
+    python -m app.launcher --db-budget 80 --hash-cpus 2
+
+- Tiến trình cha mở 1 socket lắng nghe, các worker (fork) cùng accept trên đó.
+- Nạp sẵn app trước khi fork (mặc định): worker lên nhanh, dùng chung bộ nhớ mã.
+  Import app không mở kết nối / thread nào; mỗi worker tự mở hồ kết nối, LISTEN,
+  ... trong lifespan của mình (app/core/startup.py).
+- Ngân sách kết nối: DB_MAX_CONNECTIONS (hoặc --db-budget) chia đều cho các
+  worker; hồ của mỗi worker bị thu nhỏ để tổng (max_size + max_overflow + kết
+  nối LISTEN) không vượt ngân sách -> thêm worker không vượt max_connections.
+- SIGHUP: khởi động lại lần lượt từng worker. Worker cũ nhận SIGTERM, ngừng nhận
+  kết nối mới, chạy nốt request đang dở (tối đa --graceful-timeout giây) rồi
+  thoát; worker mới phải sẵn sàng (lifespan xong) mới tới worker tiếp theo.
+  Dừng worker cũ trước rồi mới mở worker mới -> không lúc nào vượt ngân sách.
+  Worker mới khởi động lỗi -> dừng đợt khởi động lại, các worker cũ vẫn chạy.
+  Nạp sẵn thì worker mới vẫn chạy mã đã nạp: deploy mã mới thì dùng --no-preload
+  (mỗi worker tự import) hoặc khởi động lại launcher.
+- Worker chết bất thường -> mở lại ngay; chết lúc khởi động (VD: DB chưa lên)
+  -> mở lại với thời gian chờ tăng dần.
+- --hash-cpus K: dành K CPU cuối cho tiến trình băm bcrypt (PASSWORD_HASH_CPUS),
+  worker web chỉ chạy trên các CPU còn lại -> đợt đăng nhập không làm chậm API khác.
+- SIGTERM / SIGINT: dừng mọi worker (chạy nốt request) rồi thoát.
+"""
+import argparse
+import logging
+import math
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from typing import List, Optional
+
+import uvicorn
+
+from app.core.config import settings
+
+logger = logging.getLogger("app.launcher")
+
+RESPAWN_BACKOFF = 0.5
+RESPAWN_BACKOFF_MAX = 30.0
+KILL_GRACE = 5.0  # Giây chờ thêm sau --graceful-timeout trước khi SIGKILL
+WORKER_BOOT_FAILED = 3
+
+
+def budget_pools(budget: int, workers: int) -> dict:
+    """Kích thước hồ cho mỗi worker để tổng kết nối tới primary không vượt budget."""
+    listener = 0 if settings.USE_ASYNC_DB or not settings.CHANGE_NOTIFY_ENABLED else 1
+    available = budget // workers - listener
+    if available < 1:
+        raise SystemExit(
+            f"Ngân sách {budget} kết nối không đủ cho {workers} worker (mỗi worker cần ít nhất {listener + 1})"
+        )
+    max_size = min(settings.DB_POOL_MAX_SIZE, available)
+    overflow = 0 if settings.USE_ASYNC_DB else min(settings.DB_POOL_MAX_OVERFLOW, available - max_size)
+    return {
+        "DB_POOL_MIN_SIZE": min(settings.DB_POOL_MIN_SIZE, max_size),
+        "DB_POOL_MAX_SIZE": max_size,
+        "DB_POOL_MAX_OVERFLOW": overflow,
+    }
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class _WorkerServer(uvicorn.Server):
+    """uvicorn.Server báo cho tiến trình cha (qua pipe) khi lifespan đã sẵn sàng; đóng stream SSE khi dừng."""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets=None):
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+
+    async def shutdown(self, sockets=None):
+        if not settings.USE_ASYNC_DB:
+            from app.services.schedule_stream import schedule_stream_hub
+
+            # Stream SSE không tự kết thúc -> đóng trước, không thì worker chờ hết
+            # --graceful-timeout; trình duyệt tự nối lại sang worker khác (Last-Event-ID)
+            schedule_stream_hub.close()
+        await super().shutdown(sockets=sockets)
+
+
+class Worker:
+    def __init__(self, slot: int, pid: int, ready_fd: int):
+        self.slot = slot
+        self.pid = pid
+        self.ready_fd: Optional[int] = ready_fd  # None sau khi đã đọc xong
+        self.ready = False
+        self.started_at = time.monotonic()
+
+
+class Launcher:
+    def __init__(self, args, sock: socket.socket, io_cpus: Optional[set]):
+        self.args = args
+        self.sock = sock
+        self.io_cpus = io_cpus
+        self.slots: List[Optional[Worker]] = [None] * args.workers
+        self.failures = [0] * args.workers   # Số lần khởi động lỗi liên tiếp
+        self.spawn_at = [0.0] * args.workers
+        self.stopping = {}                   # pid -> hạn chót trước khi SIGKILL
+        self.roll_queue = deque()
+        self.roll_slot: Optional[int] = None
+        self.roll_pid: Optional[int] = None
+        self.shutdown = False
+        self.reload = False
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+
+    # --- Tiến trình con ---
+
+    def spawn(self, slot: int):
+        ready_r, ready_w = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            code = 1
+            try:
+                code = self._run_worker(ready_w)
+            except BaseException:
+                logger.exception(f"Worker #{slot} lỗi")
+            finally:
+                os._exit(code)
+        os.close(ready_w)
+        self.slots[slot] = Worker(slot, pid, ready_r)
+        logger.info(f"Worker #{slot} [{pid}] đang khởi động")
+
+    def _run_worker(self, ready_fd: int) -> int:
+        signal.set_wakeup_fd(-1)
+        for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, signal.SIG_DFL)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        os.close(self._wakeup_r)
+        os.close(self._wakeup_w)
+        for worker in self.slots:
+            if worker is not None and worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+        if self.io_cpus:
+            os.sched_setaffinity(0, self.io_cpus)
+
+        from app.main import app  # Nạp sẵn thì đã có trong sys.modules
+
+        config = uvicorn.Config(
+            app,
+            lifespan="on",
+            log_level=self.args.log_level,
+            timeout_graceful_shutdown=self.args.graceful_timeout,
+        )
+        server = _WorkerServer(config, ready_fd)
+        server.run(sockets=[self.sock])
+        return 0 if server.started else WORKER_BOOT_FAILED
+
+    def _terminate(self, worker: Worker):
+        if worker.pid in self.stopping:
+            return
+        self.stopping[worker.pid] = time.monotonic() + self.args.graceful_timeout + KILL_GRACE
+        try:
+            os.kill(worker.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    # --- Vòng lặp chính ---
+
+    def _on_signal(self, signum, frame):
+        if signum == signal.SIGHUP:
+            self.reload = True
+        elif signum in (signal.SIGTERM, signal.SIGINT):
+            self.shutdown = True
+        # SIGCHLD: chỉ để đánh thức select() (set_wakeup_fd)
+
+    def _wait(self, timeout: float):
+        timeout = max(timeout, 0.0)
+        waiting = {w.ready_fd: w for w in self.slots if w is not None and w.ready_fd is not None}
+        try:
+            readable, _, _ = select.select([self._wakeup_r, *waiting], [], [], timeout)
+        except InterruptedError:
+            return
+        for fd in readable:
+            if fd == self._wakeup_r:
+                try:
+                    while os.read(fd, 512):
+                        pass
+                except BlockingIOError:
+                    pass
+                continue
+            worker = waiting[fd]
+            if os.read(fd, 1):
+                worker.ready = True
+                self.failures[worker.slot] = 0
+                logger.info(f"Worker #{worker.slot} [{worker.pid}] sẵn sàng sau "
+                            f"{time.monotonic() - worker.started_at:.2f}s")
+            os.close(fd)  # Đọc được EOF = khởi động lỗi, xử lý khi thu hồi tiến trình
+            worker.ready_fd = None
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            expected = self.stopping.pop(pid, None) is not None
+            worker = next((w for w in self.slots if w is not None and w.pid == pid), None)
+            if worker is None:
+                continue
+            self.slots[worker.slot] = None
+            if worker.ready_fd is not None:
+                os.close(worker.ready_fd)
+            code = os.waitstatus_to_exitcode(status)
+            now = time.monotonic()
+            if expected:
+                logger.info(f"Worker #{worker.slot} [{pid}] đã dừng")
+                self.spawn_at[worker.slot] = now
+            elif not worker.ready:
+                self.failures[worker.slot] += 1
+                delay = min(RESPAWN_BACKOFF * 2 ** (self.failures[worker.slot] - 1), RESPAWN_BACKOFF_MAX)
+                self.spawn_at[worker.slot] = now + delay
+                logger.error(f"Worker #{worker.slot} [{pid}] khởi động lỗi (mã {code}), thử lại sau {delay:.1f}s")
+            else:
+                self.spawn_at[worker.slot] = now
+                logger.error(f"Worker #{worker.slot} [{pid}] dừng bất thường (mã {code}), mở lại")
+
+    def _respawn(self):
+        now = time.monotonic()
+        for slot, worker in enumerate(self.slots):
+            if worker is None and now >= self.spawn_at[slot]:
+                self.spawn(slot)
+
+    def _roll(self):
+        if self.reload:
+            self.reload = False
+            logger.info("SIGHUP: khởi động lại lần lượt các worker")
+            self.roll_queue = deque(slot for slot in range(len(self.slots)) if slot != self.roll_slot)
+
+        if self.roll_slot is not None:
+            worker = self.slots[self.roll_slot]
+            if self.failures[self.roll_slot]:
+                logger.error(f"Worker #{self.roll_slot} mới khởi động lỗi, dừng đợt khởi động lại")
+                self.roll_queue.clear()
+            elif worker is None or worker.pid == self.roll_pid or not worker.ready:
+                return  # Worker cũ đang chạy nốt request / worker mới chưa sẵn sàng
+            self.roll_slot = None
+
+        while self.roll_slot is None and self.roll_queue:
+            slot = self.roll_queue.popleft()
+            worker = self.slots[slot]
+            if worker is None or not worker.ready:
+                continue  # Đang khởi động lại sẵn
+            self.roll_slot, self.roll_pid = slot, worker.pid
+            self._terminate(worker)
+
+    def _kill_overdue(self):
+        now = time.monotonic()
+        for pid, deadline in list(self.stopping.items()):
+            if now > deadline:
+                logger.warning(f"Worker [{pid}] quá {self.args.graceful_timeout:g}s chưa dừng, SIGKILL")
+                self.stopping[pid] = math.inf
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+
+    def run(self) -> int:
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(sig, self._on_signal)
+        signal.set_wakeup_fd(self._wakeup_w)
+
+        for slot in range(len(self.slots)):
+            self.spawn(slot)
+        while True:
+            now = time.monotonic()
+            pending = [self.spawn_at[slot] - now for slot, worker in enumerate(self.slots) if worker is None]
+            self._wait(min([1.0, *pending]) if not self.shutdown else 1.0)
+            self._reap()
+            if self.shutdown:
+                for worker in self.slots:
+                    if worker is not None:
+                        self._terminate(worker)
+                if all(worker is None for worker in self.slots):
+                    break
+            else:
+                self._roll()
+                self._respawn()
+            self._kill_overdue()
+        self.sock.close()
+        logger.info("Đã dừng mọi worker")
+        return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=0, help="Số worker (mặc định: số CPU dành cho web)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--db-budget", type=int, default=settings.DB_MAX_CONNECTIONS,
+                        help="Tổng kết nối tới primary cho mọi worker (mặc định DB_MAX_CONNECTIONS, 0 = không giới hạn)")
+    parser.add_argument("--hash-cpus", type=int, default=0, help="Số CPU dành riêng cho tiến trình băm bcrypt")
+    parser.add_argument("--graceful-timeout", type=float, default=30.0,
+                        help="Giây tối đa chờ worker chạy nốt request khi dừng / khởi động lại")
+    parser.add_argument("--no-preload", dest="preload", action="store_false",
+                        help="Mỗi worker tự import app (SIGHUP nạp được mã mới)")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s [launcher] %(levelname)s %(message)s")
+
+    cpus = sorted(os.sched_getaffinity(0))
+    io_cpus = None
+    if args.hash_cpus:
+        if args.hash_cpus >= len(cpus):
+            parser.error(f"--hash-cpus phải nhỏ hơn số CPU ({len(cpus)})")
+        hash_cpus = cpus[-args.hash_cpus:]
+        io_cpus = set(cpus[:-args.hash_cpus])
+    args.workers = args.workers or len(io_cpus or cpus)
+
+    # Sửa settings trước khi import app: worker (fork) thừa hưởng giá trị mới
+    if args.hash_cpus:
+        settings.PASSWORD_HASH_CPUS = ",".join(map(str, hash_cpus))
+        if settings.PASSWORD_HASH_WORKERS > 0:
+            # Tổng số tiến trình băm của mọi worker ~ số CPU dành riêng
+            settings.PASSWORD_HASH_WORKERS = max(1, math.ceil(len(hash_cpus) / args.workers))
+        logger.info(f"CPU web: {sorted(io_cpus)}, CPU băm mật khẩu: {hash_cpus} "
+                    f"({settings.PASSWORD_HASH_WORKERS} tiến trình / worker)")
+    if args.db_budget:
+        for name, value in budget_pools(args.db_budget, args.workers).items():
+            setattr(settings, name, value)
+        logger.info(f"Ngân sách {args.db_budget} kết nối / {args.workers} worker: hồ mỗi worker "
+                    f"{settings.DB_POOL_MIN_SIZE}-{settings.DB_POOL_MAX_SIZE} (+{settings.DB_POOL_MAX_OVERFLOW})")
+
+    sock = bind_socket(args.host, args.port, args.backlog)
+    logger.info(f"Lắng nghe {args.host}:{args.port}, {args.workers} worker, "
+                f"{'nạp sẵn app' if args.preload else 'mỗi worker tự import app'}")
+    if args.preload:
+        import app.main  # noqa: F401
+
+    return Launcher(args, sock, io_cpus).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
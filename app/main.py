@@ -1,13 +1,28 @@
 # app/main.py
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()  # Đo thời gian import (báo cáo ở /readyz, /health)
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.core.config import settings
-from app.api import school, auth  # <--- Import thêm auth
-from app.api import school, auth, knowledge
-from app.api import school, auth, knowledge, schedule
+from app.core.profiling import ProfilingMiddleware
+from app.core.metrics import MetricsMiddleware, render_gauges, render_histogram_snapshot, render_metrics
+from app.core.security import PasswordHasherBusy, password_hasher_stats
+from app.core.startup import boot, lifespan, readiness
 
-app = FastAPI(title=settings.PROJECT_NAME)
+# Chọn bộ Router theo chế độ Database (xem USE_ASYNC_DB trong config)
+if settings.USE_ASYNC_DB:
+    from app.api.aio import school, auth, knowledge, schedule
+else:
+    from app.api import school, auth  # <--- Import thêm auth
+    from app.api import school, auth, knowledge
+    from app.api import school, auth, knowledge, schedule
+
+# Khởi động / tắt (hồ kết nối, LISTEN, băm mật khẩu, nạp cache): app/core/startup.py
+app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
 # --- Cấu hình CORS ---
 origins = [
@@ -21,12 +36,86 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Trình duyệt chỉ cho JS đọc header được liệt kê (phân trang lịch, tên file xuất)
+    expose_headers=["X-Next-Cursor", "Content-Disposition"],
 )
 
+# --- Profile theo yêu cầu (admin + header X-Profile), xem app/core/profiling.py ---
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# --- Đo đạc request cho /metrics (thêm sau cùng = lớp ngoài cùng, đo cả CORS) ---
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# --- Hồ tiến trình băm mật khẩu ---
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Hệ thống đang quá tải, vui lòng thử lại sau."},
+        headers={"Retry-After": "1"},
+    )
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to AronEdu API"}
 
+# --- Probe cho orchestrator / load balancer ---
+# /livez: tiến trình còn phục vụ được request (không chạm DB)
+# /readyz: đã khởi động xong và DB trả lời -> được nhận traffic
+@app.get("/livez", include_in_schema=False)
+def livez():
+    return {"status": "ok"}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    reason = await readiness()
+    if reason is not None:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "reason": reason, "boot": boot.stats()})
+    return {"status": "ok", "boot": boot.stats()}
+
+# --- Health check: số liệu Hồ kết nối (phát hiện cạn kết nối) ---
+@app.get("/health")
+def health():
+    if settings.USE_ASYNC_DB:
+        from app.db.async_session import async_connection_pool
+        return {"status": "ok", "boot": boot.stats(), "db_pool": async_connection_pool.get_stats()}
+
+    from app.db.notify import listener_stats
+    from app.db.prepared import prepared_stats
+    from app.db.session import connection_pool, read_router
+    from app.api.deps import auth_cache_stats
+    from app.core.rate_limit import login_username_limiter, login_ip_limiter
+    from app.services.knowledge_tree import knowledge_tree_cache
+    from app.services.lesson_catalog import lesson_catalog_cache
+    from app.services.schedule_stream import schedule_stream_hub
+    return {
+        "status": "ok",
+        "boot": boot.stats(),
+        "db_pool": connection_pool.stats(),
+        "read_replicas": read_router.stats(),
+        "prepared_statements": prepared_stats(),
+        "auth_cache": auth_cache_stats(),
+        "password_hasher": password_hasher_stats(),
+        "login_rate_limit": {"username": login_username_limiter.stats(), "ip": login_ip_limiter.stats()},
+        "knowledge_tree_cache": knowledge_tree_cache.stats(),
+        "lesson_catalog_cache": lesson_catalog_cache.stats(),
+        "change_listener": listener_stats(),
+        "schedule_stream": schedule_stream_hub.stats(),
+    }
+
+# --- Số liệu dạng Prometheus (histogram theo route + hồ kết nối) ---
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    extra = [render_gauges("app_boot_seconds", boot.phases), render_gauges("app_boot", {"ready": int(boot.ready)})]
+    if not settings.USE_ASYNC_DB:
+        from app.db.session import connection_pool
+        pool_stats = connection_pool.stats()
+        extra.append(render_histogram_snapshot("db_pool_wait_seconds", pool_stats.pop("wait_seconds")))
+        extra.append(render_gauges("db_pool", pool_stats))
+    return PlainTextResponse(render_metrics(extra), media_type="text/plain; version=0.0.4")
+
 # --- Đăng ký các Router ---
 
 # 1. Router Authentication (Login, Register)
@@ -36,6 +125,13 @@ app.include_router(school.router, prefix=settings.API_V1_STR, tags=["School"])
 app.include_router(knowledge.router, prefix=settings.API_V1_STR, tags=["Knowledge"])
 app.include_router(schedule.router, prefix=settings.API_V1_STR, tags=["Schedule"])
 
+if settings.PROFILING_ENABLED and not settings.USE_ASYNC_DB:
+    from app.api import debug
+    app.include_router(debug.router, prefix=settings.API_V1_STR, tags=["Debug"])
+
+boot.phases["import"] = time.perf_counter() - _import_started
+
+# Chạy thử 1 tiến trình; production nhiều worker: python -m app.launcher (app/launcher.py)
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
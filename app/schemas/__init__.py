@@ -2,8 +2,15 @@
 
 from .user import UserCreate, UserResponse
 from .auth import LoginRequest, TokenResponse
-from .school import ClassDTO, ClassCreate, StudentDTO, StudentCreate
-from .schedule import ScheduleCreate, ScheduleDTO
+from .school import (
+    ClassDTO, ClassCreate, StudentDTO, StudentCreate,
+    ClassSummaryDTO, StudentPage,
+    StudentImportError, StudentImportResult
+)
+from .schedule import (
+    ScheduleCreate, ScheduleDTO,
+    WeeklySlot, RecurringScheduleCreate, ScheduleConflict, RecurringScheduleResult
+)
 
 from .knowledge import (
     # CRUD Schemas
@@ -15,5 +22,8 @@ from .knowledge import (
     KnowledgeUnitCreate, KnowledgeUnitUpdate, KnowledgeUnitResponse,
     
     # Nested DTOs
-    GradeDTO, SubjectDTO, BookDTO, ChapterDTO, LessonDTO, KnowledgeUnitDTO
+    GradeDTO, SubjectDTO, BookDTO, ChapterDTO, LessonDTO, KnowledgeUnitDTO,
+
+    # Subtree
+    KnowledgeSubtreeDTO
 )
\ No newline at end of file
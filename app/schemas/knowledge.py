@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal, Union
 
 # ==========================================
 # 1. INPUT SCHEMAS (Create & Update)
@@ -119,4 +119,19 @@ class GradeDTO(BaseModel):
     grade_level_id: int
     grade_level_name: str
     value: int
-    subjects: List[SubjectDTO] = []
\ No newline at end of file
+    subjects: List[SubjectDTO] = []
+
+# ==========================================
+# 3. SUBTREE (API lấy từng nhánh, giới hạn độ sâu)
+# ==========================================
+
+KnowledgeNodeType = Literal['grade', 'subject', 'book', 'chapter', 'lesson']
+
+class KnowledgeSubtreeDTO(BaseModel):
+    node_type: KnowledgeNodeType
+    depth: int
+    # Node gốc của nhánh; các cấp con được tải tối đa `depth` tầng
+    node: Union[GradeDTO, SubjectDTO, BookDTO, ChapterDTO, LessonDTO]
+    # Số con trực tiếp của các node ở tầng sâu nhất đã tải (chưa tải con của chúng)
+    # VD: {"chapter": {"12": 5}} -> chương 12 có 5 bài học (để UI hiện mũi tên mở rộng)
+    child_counts: Dict[str, Dict[int, int]] = {}
@@ -1,6 +1,6 @@
 # app/schemas/schedule.py
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional
 from datetime import date
 
 # Input: Tạo lịch mới
@@ -24,4 +24,44 @@ class ScheduleDTO(BaseModel):
     schedule_date: date # <--- Đã đổi tên
     week_day: str
     start_period: int
-    end_period: int
\ No newline at end of file
+    end_period: int
+
+# ==========================================
+# LỊCH LẶP LẠI HÀNG TUẦN (tạo cả học kỳ trong 1 request)
+# ==========================================
+
+# 1 khung giờ trong tuần
+class WeeklySlot(BaseModel):
+    week_day: int = Field(..., ge=0, le=6, description="0 = Thứ Hai ... 6 = Chủ Nhật")
+    start_period: int
+    end_period: int
+    lesson_id: Optional[int] = None
+
+# Khoảng ngày tối đa của 1 request lịch lặp lại (1 năm học)
+MAX_RECURRING_SPAN_DAYS = 366
+
+# Input: Tạo lịch lặp lại theo tuần trong khoảng ngày
+class RecurringScheduleCreate(BaseModel):
+    class_id: int
+    start_date: date
+    end_date: date
+    slots: List[WeeklySlot] = Field(..., min_length=1)
+
+    @model_validator(mode="after")
+    def check_span(self):
+        if (self.end_date - self.start_date).days > MAX_RECURRING_SPAN_DAYS:
+            raise ValueError(f"Khoảng ngày tối đa {MAX_RECURRING_SPAN_DAYS} ngày mỗi lần tạo.")
+        return self
+
+# 1 buổi không tạo được do trùng lịch
+class ScheduleConflict(BaseModel):
+    schedule_date: date
+    week_day: str
+    start_period: int
+    end_period: int
+    reason: str
+
+# Output: Các buổi đã tạo + báo cáo trùng lịch theo từng buổi
+class RecurringScheduleResult(BaseModel):
+    created: List[ScheduleDTO] = []
+    conflicts: List[ScheduleConflict] = []
\ No newline at end of file
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict
 from datetime import date
 
 # --- STUDENT ---
@@ -37,6 +37,25 @@ class ClassDTO(BaseModel):
     class_status: str
     students: List[StudentDTO] = []
 
+# Bản tóm tắt (GET /school-data/summary): thay danh sách học sinh bằng số đếm
+class ClassSummaryDTO(BaseModel):
+    class_id: int
+    class_name: str
+    school_name: str
+    subject_name: Optional[str] = None
+    grade_level: Optional[int] = None
+    teacher_id: Optional[int] = None
+    start_year: int
+    end_year: int
+    class_status: str
+    student_count: int = 0
+    status_counts: Dict[str, int] = {} # VD: {"Hoạt động": 38, "Nghỉ học": 2}
+
+# 1 trang danh sách học sinh (GET /classes/{class_id}/students)
+class StudentPage(BaseModel):
+    items: List[StudentDTO] = []
+    next_cursor: Optional[str] = None # None = hết dữ liệu; gửi lại qua ?cursor= để lấy trang sau
+
 class ClassCreate(BaseModel):
     class_name: str
     school_name: str
@@ -68,4 +87,20 @@ class ClassWithLessonsDTO(BaseModel):
     grade_level: int
     
     # Danh sách bài học tương ứng với Khối & Môn của lớp này
-    lessons: List[LessonSimpleDTO] = []
\ No newline at end of file
+    lessons: List[LessonSimpleDTO] = []
+
+# ==========================================
+# SCHEMAS CHO API: NHẬP HỌC SINH HÀNG LOẠT
+# ==========================================
+
+class StudentImportError(BaseModel):
+    row: int # Số dòng trong file (dòng tiêu đề là 1)
+    class_id: Optional[int] = None
+    message: str
+
+class StudentImportResult(BaseModel):
+    total_rows: int
+    imported: int
+    failed: int
+    errors: List[StudentImportError] = []
+    errors_truncated: bool = False # True nếu có nhiều lỗi hơn số lỗi trả về
@@ -0,0 +1,406 @@
+# app/services/knowledge_tree.py
+import hashlib
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.db.notify import subscribe
+from app.db.prepared import execute_prepared, register
+
+# Query lồng nhau 6 cấp sử dụng json_agg
+# Cấu trúc: Grade -> Subject -> Book -> Chapter -> Lesson -> KnowledgeUnit
+# {subject_filter}: điều kiện lọc môn học (rỗng nếu không lọc)
+# Mỗi cấp sắp giống TREE_LEVELS.order_by (kèm khóa chính) -> thứ tự ổn định, trùng builder "flat"
+KNOWLEDGE_TREE_SQL = """
+    SELECT 
+        g.grade_level_id,
+        g.grade_level_name,
+        g.value,
+        COALESCE(
+            json_agg(
+                json_build_object(
+                    'subject_id', s.subject_id,
+                    'subject_name', s.subject_name,
+                    'books', (
+                        SELECT COALESCE(
+                            json_agg(
+                                json_build_object(
+                                    'book_id', b.book_id,
+                                    'book_name', b.book_name,
+                                    'chapters', (
+                                        SELECT COALESCE(
+                                            json_agg(
+                                                json_build_object(
+                                                    'chapter_id', c.chapter_id,
+                                                    'chapter_name', c.chapter_name,
+                                                    'order_number', c.order_number,
+                                                    'lessons', (
+                                                        SELECT COALESCE(
+                                                            json_agg(
+                                                                json_build_object(
+                                                                    'lesson_id', l.lesson_id,
+                                                                    'lesson_name', l.lesson_name,
+                                                                    'description', l.description,
+                                                                    'order_number', l.order_number,
+                                                                    'knowledge_units', (
+                                                                        SELECT COALESCE(
+                                                                            json_agg(
+                                                                                json_build_object(
+                                                                                    'knowledge_unit_id', k.knowledge_unit_id,
+                                                                                    'content', k.content,
+                                                                                    'knowledge_type', k.knowledge_type
+                                                                                ) ORDER BY k.knowledge_unit_id
+                                                                            ), '[]'
+                                                                        )
+                                                                        FROM edu.knowledge_units k WHERE k.lesson_id = l.lesson_id
+                                                                    )
+                                                                ) ORDER BY l.order_number, l.lesson_id
+                                                            ), '[]'
+                                                        )
+                                                        FROM edu.lessons l WHERE l.chapter_id = c.chapter_id
+                                                    )
+                                                ) ORDER BY c.order_number, c.chapter_id
+                                            ), '[]'
+                                        )
+                                        FROM edu.chapters c WHERE c.book_id = b.book_id
+                                    )
+                                ) ORDER BY b.book_id
+                            ), '[]'
+                        )
+                        FROM edu.books b WHERE b.subject_id = s.subject_id
+                    )
+                ) ORDER BY s.subject_id
+            ) FILTER (WHERE s.subject_id IS NOT NULL), 
+            '[]'
+        ) as subjects
+    FROM edu.grade_levels g
+    LEFT JOIN edu.subjects s ON g.grade_level_id = s.grade_level_id {subject_filter}
+    GROUP BY g.grade_level_id
+    ORDER BY g.value, g.grade_level_id;
+"""
+
+def get_subject_scope(user: dict) -> Optional[int]:
+    """
+    Phạm vi môn học của người dùng khi xem cây kiến thức.
+    - Admin: None (thấy hết).
+    - Giáo viên có môn phụ trách: subject_id của môn đó.
+    """
+    if user['role'] == 'giáo viên' and user.get('subject_id'):
+        return user['subject_id']
+    return None
+
+def build_knowledge_tree_query(subject_id: Optional[int] = None) -> Tuple[str, tuple]:
+    """
+    Trả về (sql, params) của query cây kiến thức, có lọc theo môn nếu cần.
+    """
+    if subject_id is None:
+        return KNOWLEDGE_TREE_SQL.format(subject_filter=""), ()
+    return KNOWLEDGE_TREE_SQL.format(subject_filter="AND s.subject_id = %s"), (subject_id,)
+
+def fetch_tree_nested(cursor, subject_id: Optional[int] = None) -> List[dict]:
+    """Builder cũ: 1 query json_agg lồng nhau (subquery tương quan ở mỗi cấp)."""
+    sql, params = build_knowledge_tree_query(subject_id)
+    execute_prepared(cursor, register("knowledge_tree", sql), params)
+    return cursor.fetchall()
+
+# ============================================================
+# BUILDER "FLAT": MỖI CẤP 1 LƯỢT QUÉT PHẲNG, GHÉP CÂY TRONG PYTHON
+# ============================================================
+
+class TreeLevel(NamedTuple):
+    node_type: str
+    table: str
+    id_column: str
+    parent_column: Optional[str]
+    columns: Tuple[str, ...]       # Đúng thứ tự field của *DTO tương ứng
+    order_by: str                  # Trùng ORDER BY từng cấp của KNOWLEDGE_TREE_SQL (kèm khóa chính)
+    children_key: Optional[str]
+
+TREE_LEVELS = (
+    TreeLevel("grade", "edu.grade_levels", "grade_level_id", None,
+              ("grade_level_id", "grade_level_name", "value"), "value, grade_level_id", "subjects"),
+    TreeLevel("subject", "edu.subjects", "subject_id", "grade_level_id",
+              ("subject_id", "subject_name"), "subject_id", "books"),
+    TreeLevel("book", "edu.books", "book_id", "subject_id",
+              ("book_id", "book_name"), "book_id", "chapters"),
+    TreeLevel("chapter", "edu.chapters", "chapter_id", "book_id",
+              ("chapter_id", "chapter_name", "order_number"), "order_number, chapter_id", "lessons"),
+    TreeLevel("lesson", "edu.lessons", "lesson_id", "chapter_id",
+              ("lesson_id", "lesson_name", "description", "order_number"), "order_number, lesson_id", "knowledge_units"),
+    TreeLevel("knowledge_unit", "edu.knowledge_units", "knowledge_unit_id", "lesson_id",
+              ("knowledge_unit_id", "content", "knowledge_type"), "knowledge_unit_id", None),
+)
+
+def level_sql(level: TreeLevel, where: str = "") -> str:
+    """SELECT 1 cấp (kèm cột khóa cha để ghép cây), sắp theo thứ tự của cây."""
+    columns = ([level.parent_column] if level.parent_column else []) + list(level.columns)
+    sql = f"SELECT {', '.join(columns)} FROM {level.table}"
+    if where:
+        sql += f" {where}"
+    return sql + f" ORDER BY {level.order_by}"
+
+def make_node(level: TreeLevel, row: dict) -> dict:
+    node = {column: row[column] for column in level.columns}
+    if level.children_key:
+        node[level.children_key] = []
+    return node
+
+def attach_level(parents: Dict[int, dict], children_key: str, level: TreeLevel, rows: List[dict]) -> Dict[int, dict]:
+    """
+    Gắn các dòng của `level` vào node cha (O(n)). Dòng đã sắp xếp sẵn nên danh sách
+    con của mỗi cha giữ đúng thứ tự. Trả về các node vừa tạo theo id.
+    """
+    nodes = {}
+    for row in rows:
+        parent = parents.get(row[level.parent_column])
+        if parent is None:
+            continue  # Cha không nằm trong kết quả (bị lọc hoặc dữ liệu mồ côi)
+        node = make_node(level, row)
+        parent[children_key].append(node)
+        nodes[row[level.id_column]] = node
+    return nodes
+
+def _flat_steps(subject_id: Optional[int]):
+    """
+    Các query của builder "flat" (dùng chung cho sync / async, giống _subtree_steps):
+    yield (cấp, sql, params), nhận lại các dòng, return danh sách Khối.
+    """
+    grade_level = TREE_LEVELS[0]
+    rows = yield grade_level, level_sql(grade_level), ()
+    grades = [make_node(grade_level, row) for row in rows]
+    parents = {grade["grade_level_id"]: grade for grade in grades}
+
+    for parent_level, level in zip(TREE_LEVELS, TREE_LEVELS[1:]):
+        if not parents:
+            break
+        if subject_id is None:
+            where, params = "", ()
+        elif level.node_type == "subject":
+            where, params = "WHERE subject_id = %s", (subject_id,)
+        else:
+            where, params = f"WHERE {level.parent_column} = ANY(%s)", (list(parents),)
+        rows = yield level, level_sql(level, where), params
+        parents = attach_level(parents, parent_level.children_key, level, rows)
+
+    return grades
+
+def fetch_tree_flat(cursor, subject_id: Optional[int] = None) -> List[dict]:
+    """
+    Builder mới: tối đa 6 query phẳng (1 query / cấp), ghép cây tuyến tính.
+    - Không lọc: mỗi cấp là 1 lượt quét toàn bảng có thứ tự.
+    - Lọc theo môn: cấp dưới chỉ đọc con của các node cấp trên (parent = ANY(ids)).
+    Kết quả giống hệt fetch_tree_nested().
+    """
+    return _run_steps(cursor, _flat_steps(subject_id))
+
+LEVELS_BY_TYPE = {level.node_type: level for level in TREE_LEVELS}
+
+# Query tìm môn học (subject_id) chứa một node, dùng để giới hạn quyền giáo viên
+_NODE_SUBJECT_SQL = {
+    "subject": "SELECT subject_id FROM edu.subjects WHERE subject_id = %s",
+    "book": "SELECT subject_id FROM edu.books WHERE book_id = %s",
+    "chapter": """
+        SELECT b.subject_id FROM edu.chapters c
+        JOIN edu.books b ON b.book_id = c.book_id
+        WHERE c.chapter_id = %s
+    """,
+    "lesson": """
+        SELECT b.subject_id FROM edu.lessons l
+        JOIN edu.chapters c ON c.chapter_id = l.chapter_id
+        JOIN edu.books b ON b.book_id = c.book_id
+        WHERE l.lesson_id = %s
+    """,
+}
+
+def get_node_subject_id(cursor, node_type: str, node_id: int) -> Optional[int]:
+    cursor.execute(_NODE_SUBJECT_SQL[node_type], (node_id,))
+    row = cursor.fetchone()
+    return row["subject_id"] if row else None
+
+async def aget_node_subject_id(cursor, node_type: str, node_id: int) -> Optional[int]:
+    await cursor.execute(_NODE_SUBJECT_SQL[node_type], (node_id,))
+    row = await cursor.fetchone()
+    return row["subject_id"] if row else None
+
+def _children_filter(level: TreeLevel, parent_ids: List[int], subject_id: Optional[int]) -> Tuple[str, tuple]:
+    where = f"WHERE {level.parent_column} = ANY(%s)"
+    params = (parent_ids,)
+    if level.node_type == "subject" and subject_id is not None:
+        where += " AND subject_id = %s"
+        params += (subject_id,)
+    return where, params
+
+def _subtree_steps(node_type: str, node_id: int, depth: int, subject_id: Optional[int]):
+    """
+    Các bước của fetch_subtree, không tự chạy SQL: yield (cấp, sql, params), nhận
+    lại các dòng qua send(); kết thúc bằng StopIteration(value = kết quả).
+    cấp = None: query đếm con (số biến thể không cố định, không prepare).
+    Dùng chung cho bản psycopg2 (fetch_subtree) và psycopg 3 (afetch_subtree).
+    """
+    index = [level.node_type for level in TREE_LEVELS].index(node_type)
+    level = TREE_LEVELS[index]
+
+    where = f"WHERE {level.id_column} = %s"
+    rows = yield level, level_sql(level, where), (node_id,)
+    if not rows:
+        return None
+    root = make_node(level, rows[0])
+
+    parents = {node_id: root}
+    parent_level = level
+    for child_level in TREE_LEVELS[index + 1:index + 1 + depth]:
+        if not parents:
+            break
+        where, params = _children_filter(child_level, list(parents), subject_id)
+        rows = yield child_level, level_sql(child_level, where), params
+        parents = attach_level(parents, parent_level.children_key, child_level, rows)
+        parent_level = child_level
+
+    # Đếm con của tầng cuối (để UI biết node nào còn mở rộng được)
+    child_counts = {}
+    child_index = TREE_LEVELS.index(parent_level) + 1
+    if parents and child_index < len(TREE_LEVELS):
+        child_level = TREE_LEVELS[child_index]
+        where, params = _children_filter(child_level, list(parents), subject_id)
+        rows = yield None, (
+            f"SELECT {child_level.parent_column} AS parent_id, COUNT(*) AS total "
+            f"FROM {child_level.table} {where} GROUP BY {child_level.parent_column}"
+        ), params
+        counts = {row["parent_id"]: row["total"] for row in rows}
+        child_counts[parent_level.node_type] = {parent_id: counts.get(parent_id, 0) for parent_id in parents}
+
+    return {
+        "node_type": node_type,
+        "depth": depth,
+        "node": root,
+        "child_counts": child_counts,
+    }
+
+def fetch_subtree(cursor, node_type: str, node_id: int, depth: int,
+                  subject_id: Optional[int] = None) -> Optional[dict]:
+    """
+    Lấy 1 nhánh của cây: node gốc + tối đa `depth` tầng con (mỗi tầng 1 query),
+    kèm số con trực tiếp của các node ở tầng cuối (1 query GROUP BY).
+    subject_id: phạm vi môn của giáo viên (chỉ ảnh hưởng khi gốc là Khối).
+    Trả về None nếu không tìm thấy node.
+    """
+    return _run_steps(cursor, _subtree_steps(node_type, node_id, depth, subject_id))
+
+async def afetch_subtree(cursor, node_type: str, node_id: int, depth: int,
+                         subject_id: Optional[int] = None) -> Optional[dict]:
+    """Như fetch_subtree, cho cursor psycopg 3 (router async)."""
+    return await _arun_steps(cursor, _subtree_steps(node_type, node_id, depth, subject_id))
+
+def _run_steps(cursor, steps):
+    """
+    Chạy các query của 1 generator *_steps. Query theo cấp (level khác None) có số
+    biến thể `where` cố định (vài cái / cấp) -> chạy bằng prepared statement.
+    """
+    try:
+        level, sql, params = next(steps)
+        while True:
+            if level is None:
+                cursor.execute(sql, params)
+            else:
+                execute_prepared(cursor, register(f"tree_{level.node_type}", sql), params)
+            level, sql, params = steps.send(cursor.fetchall())
+    except StopIteration as done:
+        return done.value
+
+async def _arun_steps(cursor, steps):
+    """Như _run_steps, cho cursor psycopg 3 (psycopg 3 tự prepare câu lặp lại)."""
+    try:
+        _, sql, params = next(steps)
+        while True:
+            await cursor.execute(sql, params)
+            _, sql, params = steps.send(await cursor.fetchall())
+    except StopIteration as done:
+        return done.value
+
+async def afetch_tree_nested(cursor, subject_id: Optional[int] = None) -> List[dict]:
+    sql, params = build_knowledge_tree_query(subject_id)
+    await cursor.execute(sql, params)
+    return await cursor.fetchall()
+
+async def afetch_tree_flat(cursor, subject_id: Optional[int] = None) -> List[dict]:
+    return await _arun_steps(cursor, _flat_steps(subject_id))
+
+TREE_BUILDERS = {
+    "nested": (fetch_tree_nested, afetch_tree_nested),
+    "flat": (fetch_tree_flat, afetch_tree_flat),
+}
+
+def fetch_knowledge_tree(cursor, subject_id: Optional[int] = None) -> List[dict]:
+    """Đọc cây kiến thức bằng builder chọn trong settings.KNOWLEDGE_TREE_BUILDER."""
+    return TREE_BUILDERS[settings.KNOWLEDGE_TREE_BUILDER][0](cursor, subject_id)
+
+async def afetch_knowledge_tree(cursor, subject_id: Optional[int] = None) -> List[dict]:
+    """Như fetch_knowledge_tree, cho cursor psycopg 3 (router async)."""
+    return await TREE_BUILDERS[settings.KNOWLEDGE_TREE_BUILDER][1](cursor, subject_id)
+
+class KnowledgeTreeCache:
+    """
+    Cache cây kiến thức đã serialize sẵn (bytes JSON) kèm ETag.
+    - Khóa None: bản đầy đủ (Admin); khóa subject_id: bản lọc cho giáo viên.
+    - Mỗi lần dữ liệu thay đổi -> invalidate() tăng version và xóa hết.
+    - put() chỉ lưu nếu version không đổi kể từ lúc bắt đầu query, tránh việc
+      request đang đọc dữ liệu cũ ghi đè lên cache sau khi đã invalidate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # scope -> (etag, body)
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, scope: Optional[int]) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(scope)
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return entry
+
+    def put(self, scope: Optional[int], version: int, body: bytes) -> Tuple[str, bytes]:
+        entry = (make_etag(body), body)
+        with self._lock:
+            if version == self.version:
+                self._entries[scope] = entry
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+def make_etag(body: bytes) -> str:
+    """ETag mạnh (strong) tính từ nội dung response."""
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """So khớp header If-None-Match (có thể chứa nhiều ETag, hoặc '*')."""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag == etag or tag == "W/" + etag:
+            return True
+    return False
+
+knowledge_tree_cache = KnowledgeTreeCache()
+
+# Các bảng tạo nên cây kiến thức: worker khác ghi vào -> xóa cache (app/db/notify.py)
+KNOWLEDGE_TABLES = ("grade_levels", "subjects", "books", "chapters", "lessons", "knowledge_units")
+for _table in KNOWLEDGE_TABLES:
+    subscribe(_table, lambda key: knowledge_tree_cache.invalidate())
@@ -0,0 +1,141 @@
+# app/services/lesson_catalog.py
+"""
+Danh mục bài học theo (khối, môn) cho GET /teacher/classes-lessons.
+
+Trước đây mỗi lớp của giáo viên JOIN lại cả nhánh grade -> subject -> book ->
+chapter -> lesson: 12 lớp "Toán, Khối 10" = 12 lần cùng 1 danh sách bài.
+Giờ danh mục của mỗi (grade_level value, subject_name) được query 1 lần (gom
+các khóa còn thiếu vào 1 câu SQL), cache dùng chung cho mọi request / user;
+API chỉ query danh sách lớp rồi ghép danh mục trong bộ nhớ
+(fetch_classes_with_lessons).
+
+Xóa cache: CRUD khối / môn / sách / chương / bài (app/api/knowledge.py) và
+thông báo từ worker khác (app/db/notify.py).
+"""
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.db.notify import subscribe
+from app.db.prepared import execute_prepared, register
+
+CatalogKey = Tuple[Optional[int], Optional[str]]  # (grade_level value, subject_name)
+
+# Bảng ảnh hưởng tới danh mục bài học (knowledge_units thì không)
+LESSON_CATALOG_TABLES = ("grade_levels", "subjects", "books", "chapters", "lessons")
+
+# Cùng quy tắc nối với query cũ: khối theo value, môn theo (khối, tên môn);
+# thứ tự bài theo order_number như cũ, thêm thứ tự chương / id để ổn định
+LESSON_CATALOG_SQL = """
+    SELECT
+        g.value AS grade_level,
+        sub.subject_name,
+        l.lesson_id,
+        l.lesson_name,
+        ch.chapter_name
+    FROM unnest(%s::int[], %s::text[]) AS k(grade_value, subject_name)
+    JOIN edu.grade_levels g ON g.value = k.grade_value
+    JOIN edu.subjects sub ON sub.grade_level_id = g.grade_level_id
+                         AND sub.subject_name = k.subject_name
+    JOIN edu.books b ON b.subject_id = sub.subject_id
+    JOIN edu.chapters ch ON ch.book_id = b.book_id
+    JOIN edu.lessons l ON l.chapter_id = ch.chapter_id
+    ORDER BY g.value, sub.subject_name, l.order_number, ch.order_number, l.lesson_id
+"""
+LESSON_CATALOG_QUERY = register("lesson_catalog", LESSON_CATALOG_SQL)
+
+TEACHER_CLASSES_SQL = """
+    SELECT
+        c.class_id,
+        c.class_name,
+        s.name as school_name,
+        c.subject_name,
+        c.grade_level
+    FROM edu.classes c
+    JOIN edu.schools s ON c.school_id = s.school_id
+    WHERE c.teacher_id = %s
+    ORDER BY c.class_id DESC;
+"""
+TEACHER_CLASSES_QUERY = register("teacher_classes", TEACHER_CLASSES_SQL)
+
+
+class LessonCatalogCache:
+    """
+    Cache (khối, môn) -> danh sách bài học (list dict, chỉ đọc - dùng chung giữa các response).
+    Cùng cơ chế version với KnowledgeTreeCache: kết quả query bắt đầu trước
+    invalidate() không được ghi vào cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[CatalogKey, List[dict]] = {}
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, cursor, keys: Iterable[CatalogKey]) -> Dict[CatalogKey, List[dict]]:
+        keys = set(keys)
+        with self._lock:
+            found = {key: self._entries[key] for key in keys if key in self._entries}
+            version = self.version
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        missing = [key for key in keys if key not in found]
+        if missing:
+            loaded = fetch_catalogs(cursor, missing)
+            with self._lock:
+                if version == self.version:
+                    self._entries.update(loaded)
+            found.update(loaded)
+        return found
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def fetch_catalogs(cursor, keys: List[CatalogKey]) -> Dict[CatalogKey, List[dict]]:
+    """Query danh mục của nhiều (khối, môn) trong 1 câu SQL; khóa không có bài -> []."""
+    catalogs = {key: [] for key in keys}
+    # Lớp thiếu khối hoặc môn không nối được với cây kiến thức (như LEFT JOIN cũ)
+    queryable = [key for key in keys if key[0] is not None and key[1] is not None]
+    if not queryable:
+        return catalogs
+
+    execute_prepared(cursor, LESSON_CATALOG_QUERY, ([k[0] for k in queryable], [k[1] for k in queryable]))
+    for row in cursor.fetchall():
+        catalogs[(row['grade_level'], row['subject_name'])].append({
+            "lesson_id": row['lesson_id'],
+            "lesson_name": row['lesson_name'],
+            "chapter_name": row['chapter_name'],
+        })
+    return catalogs
+
+
+lesson_catalog_cache = LessonCatalogCache()
+
+
+def fetch_classes_with_lessons(cursor, teacher_id: int) -> List[dict]:
+    """Các lớp của giáo viên, mỗi lớp kèm "lessons" lấy từ lesson_catalog_cache."""
+    execute_prepared(cursor, TEACHER_CLASSES_QUERY, (teacher_id,))
+    classes = cursor.fetchall()
+    catalogs = lesson_catalog_cache.get_many(
+        cursor, {(c['grade_level'], c['subject_name']) for c in classes}
+    )
+    return [
+        {**c, "lessons": catalogs[(c['grade_level'], c['subject_name'])]}
+        for c in classes
+    ]
+
+for _table in LESSON_CATALOG_TABLES:
+    subscribe(_table, lambda key: lesson_catalog_cache.invalidate())
@@ -0,0 +1,164 @@
+# app/services/rosters.py
+"""
+SQL cho bản tóm tắt lớp học và danh sách học sinh phân trang (dùng chung cho
+router đồng bộ và router async).
+
+- Tóm tắt: mỗi lớp kèm số học sinh + số học sinh theo trạng thái, không kèm
+  danh sách học sinh (response nhỏ, không phụ thuộc sĩ số).
+- Danh sách học sinh: phân trang keyset theo (cột sắp xếp, student_id), dùng
+  index (class_id, full_name, student_id) của migration 004 -> trang sau
+  cùng chi phí với trang đầu (không OFFSET).
+"""
+from datetime import date
+from typing import Literal, Optional, Tuple
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+ROSTER_DEFAULT_LIMIT = 50
+ROSTER_MAX_LIMIT = 500
+
+RosterSort = Literal["full_name", "student_id", "date_of_birth"]
+SortOrder = Literal["asc", "desc"]
+
+# Học sinh chưa có ngày sinh xếp cuối (tăng dần) như NULLS LAST
+_NO_BIRTH_DATE = date(9999, 12, 31)
+_SORT_EXPRESSIONS = {
+    "full_name": "st.full_name",
+    "date_of_birth": f"COALESCE(st.date_of_birth, DATE '{_NO_BIRTH_DATE.isoformat()}')",
+}
+
+# Màn hình lớp (/school-data): mỗi lớp kèm toàn bộ học sinh, JSON dựng sẵn trong Postgres
+SCHOOL_DATA_SQL = """
+    SELECT
+        c.class_id,
+        c.class_name,
+        s.name as school_name,
+        c.subject_name,
+        c.grade_level,
+        c.teacher_id,
+        c.start_year,
+        c.end_year,
+        c.status as class_status,
+        COALESCE(
+            json_agg(
+                json_build_object(
+                    'student_id', st.student_id,
+                    'full_name', st.full_name,
+                    'date_of_birth', st.date_of_birth,
+                    'email', st.email,
+                    'phone_number', st.phone_number,
+                    'status', st.status
+                )
+            ) FILTER (WHERE st.student_id IS NOT NULL),
+            '[]'
+        ) as students
+    FROM edu.classes c
+    JOIN edu.schools s ON c.school_id = s.school_id
+    LEFT JOIN edu.students st ON c.class_id = st.class_id
+    -- Lọc theo teacher_id (người dùng hiện tại)
+    WHERE c.teacher_id = %s
+    GROUP BY c.class_id, s.name
+    ORDER BY c.class_id DESC;
+"""
+
+CLASS_SUMMARY_SQL = """
+    SELECT
+        c.class_id,
+        c.class_name,
+        s.name as school_name,
+        c.subject_name,
+        c.grade_level,
+        c.teacher_id,
+        c.start_year,
+        c.end_year,
+        c.status as class_status,
+        COALESCE(cnt.student_count, 0) as student_count,
+        COALESCE(cnt.status_counts, '{}') as status_counts
+    FROM edu.classes c
+    JOIN edu.schools s ON c.school_id = s.school_id
+    -- Đếm theo trạng thái trong từng lớp (dùng index students(class_id))
+    LEFT JOIN LATERAL (
+        SELECT SUM(n)::int as student_count, json_object_agg(status, n) as status_counts
+        FROM (
+            SELECT COALESCE(st.status, 'Không rõ') as status, COUNT(*)::int as n
+            FROM edu.students st
+            WHERE st.class_id = c.class_id
+            GROUP BY 1
+        ) by_status
+    ) cnt ON TRUE
+    WHERE c.teacher_id = %s
+    ORDER BY c.class_id DESC;
+"""
+
+CLASS_OWNER_SQL = "SELECT teacher_id FROM edu.classes WHERE class_id = %s"
+
+
+def build_roster_query(
+    class_id: int,
+    status: Optional[str],
+    sort: str,
+    order: str,
+    cursor_token: Optional[str],
+    limit: int,
+) -> Tuple[str, list]:
+    """
+    Dựng SQL 1 trang học sinh. Lấy dư 1 dòng để biết còn trang sau không.
+    Cursor sai định dạng / không khớp tham số -> ValueError.
+    """
+    where = ["st.class_id = %s"]
+    params: list = [class_id]
+    if status is not None:
+        where.append("st.status = %s")
+        params.append(status)
+
+    expression = _SORT_EXPRESSIONS.get(sort)
+    comparator = ">" if order == "asc" else "<"
+    if cursor_token:
+        data = decode_cursor(cursor_token)
+        if data.get("sort") != sort or data.get("order") != order or data.get("status") != status:
+            raise ValueError("Cursor không khớp tham số sắp xếp / lọc hiện tại")
+        try:
+            last_id = int(data["id"])
+            last_value = data.get("value")
+            if sort == "date_of_birth":
+                last_value = date.fromisoformat(last_value)
+            elif sort == "full_name" and not isinstance(last_value, str):
+                raise TypeError
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError("Cursor không hợp lệ") from e
+
+        if expression is None:
+            where.append(f"st.student_id {comparator} %s")
+            params.append(last_id)
+        else:
+            where.append(f"({expression}, st.student_id) {comparator} (%s, %s)")
+            params.extend([last_value, last_id])
+
+    direction = "ASC" if order == "asc" else "DESC"
+    order_by = f"st.student_id {direction}" if expression is None else f"{expression} {direction}, st.student_id {direction}"
+    sql = f"""
+        SELECT st.student_id, st.full_name, st.date_of_birth, st.email, st.phone_number, st.status
+        FROM edu.students st
+        WHERE {' AND '.join(where)}
+        ORDER BY {order_by}
+        LIMIT %s
+    """
+    params.append(limit + 1)
+    return sql, params
+
+
+def roster_page(rows: list, status: Optional[str], sort: str, order: str, limit: int) -> dict:
+    """Cắt dòng dư và tạo cursor trang sau từ dòng cuối cùng."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        value = None
+        if sort == "full_name":
+            value = last['full_name']
+        elif sort == "date_of_birth":
+            value = last['date_of_birth'] or _NO_BIRTH_DATE
+        next_cursor = encode_cursor({
+            "sort": sort, "order": order, "status": status, "value": value, "id": last['student_id'],
+        })
+    return {"items": rows, "next_cursor": next_cursor}
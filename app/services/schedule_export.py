@@ -0,0 +1,222 @@
+# app/services/schedule_export.py
+"""
+Xuất lịch dạy ra iCalendar (.ics) và CSV theo luồng.
+
+Dữ liệu đọc theo đoạn SCHEDULE_EXPORT_CHUNK dòng bằng keyset (cùng query và
+index với GET /schedules?limit=...), ghi ra từng khối -> bộ nhớ không phụ thuộc
+độ dài khoảng ngày. Mỗi đoạn mượn kết nối riêng (dependency get_db_cursor đã
+trả kết nối trước khi StreamingResponse gửi body) trong 1 transaction ngắn và
+trả ngay khi đọc xong: client tải chậm không giữ kết nối của hồ hay transaction
+mở (chặn VACUUM) suốt lượt tải. Các đoạn không cùng snapshot: dòng sửa giữa
+chừng có thể ra bản cũ hoặc mới, nhưng keyset không làm lặp / sót dòng không đổi.
+"""
+import csv
+import io
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional
+
+from psycopg2.extras import RealDictCursor
+
+from app.core.config import settings
+from app.services.schedules import build_schedule_range_query, schedule_keyset
+
+# Giờ bắt đầu từng tiết (tiết 45 phút): buổi sáng tiết 1-5 từ 7:00,
+# buổi chiều tiết 6-10 từ 13:00, nghỉ 5 phút giữa các tiết
+PERIOD_MINUTES = 45
+PERIOD_START_TIMES = {
+    period: (datetime.combine(date.min, start) + timedelta(minutes=50 * i)).time()
+    for start, periods in ((time(7, 0), range(1, 6)), (time(13, 0), range(6, 11)))
+    for i, period in enumerate(periods)
+}
+
+CSV_COLUMNS = [
+    "schedule_id", "schedule_date", "week_day", "start_period", "end_period",
+    "class_id", "class_name", "subject_name", "lesson_id", "lesson_name",
+]
+
+
+# ============================================================
+# Đọc theo luồng
+# ============================================================
+def _chunk_queries(start_date: date, end_date: date, teacher_id: Optional[int]):
+    """
+    Các query đọc theo đoạn (dùng chung cho sync / async): yield (sql, params),
+    nhận lại các dòng (dư 1 dòng để biết còn đoạn sau), dừng khi hết dữ liệu.
+    """
+    chunk, after = settings.SCHEDULE_EXPORT_CHUNK, None
+    while True:
+        rows = yield build_schedule_range_query(start_date, end_date, teacher_id, after, chunk)
+        if len(rows) <= chunk:
+            return
+        after = schedule_keyset(rows[chunk - 1])
+
+
+def iter_schedule_rows(
+    start_date: date, end_date: date, teacher_id: Optional[int], reader: Optional[str] = None
+) -> Iterator[dict]:
+    """
+    Đọc lịch theo đoạn; mỗi đoạn 1 kết nối đọc mượn riêng (replica nếu có, theo
+    read-your-writes của user `reader`), trả về hồ TRƯỚC khi gửi các dòng đi.
+    """
+    from app.db.session import read_connection
+
+    queries = _chunk_queries(start_date, end_date, teacher_id)
+    sql, params = next(queries)
+    while True:
+        with read_connection(reader) as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(sql, tuple(params))
+                rows = cursor.fetchall()
+        yield from rows[:settings.SCHEDULE_EXPORT_CHUNK]
+        try:
+            sql, params = queries.send(rows)
+        except StopIteration:
+            return
+
+
+def _batches(rows: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    iterator = iter(rows)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ============================================================
+# CSV
+# ============================================================
+def csv_header() -> str:
+    return "\ufeff" + format_csv_rows([dict(zip(CSV_COLUMNS, CSV_COLUMNS))])  # BOM để Excel đọc đúng tiếng Việt
+
+
+def format_csv_rows(rows: Iterable[dict]) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\r\n")
+    for row in rows:
+        writer.writerow([row[column] for column in CSV_COLUMNS])
+    return out.getvalue()
+
+
+def stream_csv(rows: Iterable[dict]) -> Iterator[bytes]:
+    yield csv_header().encode("utf-8")
+    for batch in _batches(rows, settings.SCHEDULE_EXPORT_CHUNK):
+        yield format_csv_rows(batch).encode("utf-8")
+
+
+# ============================================================
+# iCalendar (RFC 5545)
+# ============================================================
+def _ics_escape(value) -> str:
+    text = "" if value is None else str(value)
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _ics_fold(line: str) -> str:
+    """Gấp dòng dài hơn 75 byte (không cắt giữa ký tự UTF-8), kết thúc bằng CRLF."""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    parts, current, size, limit = [], [], 0, 75
+    for char in line:
+        width = len(char.encode("utf-8"))
+        if size + width > limit:
+            parts.append("".join(current))
+            current, size, limit = [], 0, 74  # Dòng tiếp theo bắt đầu bằng 1 dấu cách
+        current.append(char)
+        size += width
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def _ics_time(day: date, period: Optional[int], end: bool) -> Optional[str]:
+    start = PERIOD_START_TIMES.get(period)
+    if start is None:
+        return None
+    local = datetime.combine(day, start) + timedelta(minutes=PERIOD_MINUTES if end else 0)
+    utc = local - timedelta(hours=settings.SCHEDULE_UTC_OFFSET_HOURS)
+    return utc.strftime("%Y%m%dT%H%M%SZ")
+
+
+def ics_header() -> str:
+    return (
+        "BEGIN:VCALENDAR\r\n"
+        "VERSION:2.0\r\n"
+        + _ics_fold(f"PRODID:-//{_ics_escape(settings.PROJECT_NAME)}//Lich day//VI")
+        + "CALSCALE:GREGORIAN\r\n"
+        "METHOD:PUBLISH\r\n"
+    )
+
+
+ICS_FOOTER = "END:VCALENDAR\r\n"
+
+
+def format_ics_events(rows: Iterable[dict], stamp: str) -> str:
+    lines = []
+    for row in rows:
+        day = row['schedule_date']
+        starts = _ics_time(day, row['start_period'], end=False)
+        ends = _ics_time(day, row['end_period'], end=True)
+        summary = " - ".join(v for v in (row['subject_name'], row['class_name']) if v)
+        description = f"Tiết {row['start_period']}-{row['end_period']}"
+        if row['lesson_name']:
+            description += f": {row['lesson_name']}"
+
+        lines.append("BEGIN:VEVENT\r\n")
+        lines.append(f"UID:schedule-{row['schedule_id']}@aronedu\r\n")
+        lines.append(f"DTSTAMP:{stamp}\r\n")
+        if starts and ends:
+            lines.append(f"DTSTART:{starts}\r\n")
+            lines.append(f"DTEND:{ends}\r\n")
+        else:
+            # Tiết ngoài bảng giờ -> sự kiện cả ngày
+            lines.append(f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}\r\n")
+        lines.append(_ics_fold(f"SUMMARY:{_ics_escape(summary)}"))
+        lines.append(_ics_fold(f"DESCRIPTION:{_ics_escape(description)}"))
+        lines.append("END:VEVENT\r\n")
+    return "".join(lines)
+
+
+def ics_stamp() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def stream_ics(rows: Iterable[dict]) -> Iterator[bytes]:
+    stamp = ics_stamp()
+    yield ics_header().encode("utf-8")
+    for batch in _batches(rows, settings.SCHEDULE_EXPORT_CHUNK):
+        yield format_ics_events(batch, stamp).encode("utf-8")
+    yield ICS_FOOTER.encode("utf-8")
+
+
+def export_filename(start_date: date, end_date: date, extension: str) -> str:
+    return f"lich-day_{start_date.isoformat()}_{end_date.isoformat()}.{extension}"
+
+
+async def astream_export(start_date: date, end_date: date, teacher_id: Optional[int], extension: str):
+    """Bản async (psycopg 3): cùng cách đọc theo đoạn, mỗi đoạn 1 kết nối mượn từ hồ async."""
+    from app.db.async_session import async_connection_pool
+
+    if extension == "ics":
+        stamp = ics_stamp()
+        header, footer, format_rows = ics_header(), ICS_FOOTER, lambda rows: format_ics_events(rows, stamp)
+    else:
+        header, footer, format_rows = csv_header(), "", format_csv_rows
+
+    queries = _chunk_queries(start_date, end_date, teacher_id)
+    sql, params = next(queries)
+    yield header.encode("utf-8")
+    while True:
+        async with async_connection_pool.connection() as conn:
+            cursor = await conn.execute(sql, tuple(params))
+            rows = await cursor.fetchall()
+        if rows:
+            yield format_rows(rows[:settings.SCHEDULE_EXPORT_CHUNK]).encode("utf-8")
+        try:
+            sql, params = queries.send(rows)
+        except StopIteration:
+            break
+    if footer:
+        yield footer.encode("utf-8")
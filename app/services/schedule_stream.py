@@ -0,0 +1,234 @@
+# app/services/schedule_stream.py
+"""
+Đẩy thay đổi lịch dạy tới trình duyệt qua Server-Sent Events (GET /schedules/stream),
+thay cho việc gọi lại GET /schedules định kỳ.
+
+- Ghi: create / update / delete gọi publish_schedule_event(cursor, ...) trong
+  CÙNG transaction -> NOTIFY chỉ gửi khi commit (bảng giả "schedule_events" của
+  app/db/notify.py), mọi worker nhận theo đúng thứ tự commit.
+- Mỗi worker có 1 ScheduleStreamHub trên event loop: giữ SCHEDULE_STREAM_BUFFER sự kiện
+  gần nhất và chia sự kiện cho các client đang nghe (lọc theo khoảng ngày,
+  giáo viên, lớp). Mỗi client chỉ tốn 1 hàng đợi có giới hạn + 1 coroutine.
+- Nối lại: trình duyệt tự gửi Last-Event-ID -> phát lại các sự kiện sau id đó
+  trong bộ đệm. Id không còn trong bộ đệm, client đọc chậm (hàng đợi đầy) hoặc
+  kết nối LISTEN bị mất (có thể lỡ sự kiện) -> gửi sự kiện "reset": client tải
+  lại GET /schedules cho khung đang xem.
+
+Sự kiện: created / updated (dữ liệu = 1 dòng lịch như GET /schedules, kèm
+teacher_id; updated kèm vị trí cũ để client đang xem khung cũ bỏ dòng đó),
+deleted, invalidate (tạo hàng loạt: khoảng ngày cần tải lại), reset.
+Client nên mở stream trước rồi mới tải GET /schedules để không lỡ thay đổi ở giữa.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import deque
+from datetime import date
+from typing import Optional, Set
+
+from app.core.config import settings
+from app.db.notify import apublish_change, publish_change, subscribe
+
+logger = logging.getLogger(__name__)
+
+EVENTS_TABLE = "schedule_events"
+
+_RESET = {"event": "reset", "data": {}}
+_CLOSE = object()
+
+
+def _event_key(event: str, data: dict) -> str:
+    payload = {"id": uuid.uuid4().hex, "event": event, "data": data}
+    return json.dumps(payload, default=str, ensure_ascii=False, separators=(",", ":"))
+
+
+def publish_schedule_event(cursor, event: str, data: dict):
+    """Gửi 1 sự kiện lịch cho mọi worker khi transaction commit (key = JSON của sự kiện)."""
+    publish_change(cursor, EVENTS_TABLE, _event_key(event, data))
+
+
+async def apublish_schedule_event(cursor, event: str, data: dict):
+    """Như publish_schedule_event, cho cursor psycopg 3 (router async)."""
+    await apublish_change(cursor, EVENTS_TABLE, _event_key(event, data))
+
+
+def updated_event_data(row: dict) -> dict:
+    """Dữ liệu sự kiện "updated" từ dòng UPDATE_SCHEDULE_SQL (tách vị trí cũ ra "previous")."""
+    data = {k: v for k, v in row.items() if not k.startswith("old_")}
+    data["previous"] = {
+        "schedule_date": row["old_schedule_date"],
+        "class_id": row["old_class_id"],
+        "teacher_id": row["teacher_id"],
+    }
+    return data
+
+
+def format_event(event: dict, event_id: Optional[str]) -> str:
+    data = json.dumps(event["data"], default=str, ensure_ascii=False, separators=(",", ":"))
+    # "id:" rỗng = trình duyệt quên Last-Event-ID cũ (sau reset không phát lại nữa)
+    return f"id: {event_id or ''}\nevent: {event['event']}\ndata: {data}\n\n"
+
+
+def _in_window(start: date, end: date, day) -> bool:
+    return day is not None and start <= date.fromisoformat(str(day)) <= end
+
+
+class ScheduleSubscription:
+    __slots__ = ("start_date", "end_date", "teacher_id", "class_id", "queue")
+
+    def __init__(self, start_date: date, end_date: date, teacher_id: Optional[int], class_id: Optional[int]):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.teacher_id = teacher_id
+        self.class_id = class_id
+        self.queue = asyncio.Queue(maxsize=settings.SCHEDULE_STREAM_QUEUE)
+
+    def _owns(self, teacher_id, class_id) -> bool:
+        return ((self.teacher_id is None or teacher_id == self.teacher_id)
+                and (self.class_id is None or class_id == self.class_id))
+
+    def matches(self, event: dict) -> bool:
+        data = event["data"]
+        if event["event"] == "invalidate":
+            return (self._owns(data.get("teacher_id"), data.get("class_id"))
+                    and str(data["start_date"]) <= self.end_date.isoformat()
+                    and str(data["end_date"]) >= self.start_date.isoformat())
+        if self._owns(data.get("teacher_id"), data.get("class_id")) and \
+                _in_window(self.start_date, self.end_date, data.get("schedule_date")):
+            return True
+        # Lịch bị dời khỏi khung đang xem: client cần biết để bỏ dòng cũ
+        previous = data.get("previous")
+        return bool(previous) and self._owns(previous.get("teacher_id"), previous.get("class_id")) and \
+            _in_window(self.start_date, self.end_date, previous.get("schedule_date"))
+
+    def replace(self, item):
+        """Bỏ mọi thứ đang chờ, chỉ giữ `item` (reset / đóng)."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(item)
+
+
+class ScheduleStreamHub:
+    """Chia sự kiện lịch cho các client SSE của worker này; chỉ chạy trên event loop."""
+
+    def __init__(self, buffer_size: int):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._buffer = deque(maxlen=buffer_size)  # (id, sự kiện) theo thứ tự commit
+        self._subscribers: Set[ScheduleSubscription] = set()
+        self.closed = False
+        self.published = 0
+        self.resets = 0
+        self.overflows = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        """Gọi lúc khởi động (lifespan): nhận sự kiện từ đây, kể cả khi chưa có client."""
+        self._loop = loop
+        self.closed = False
+
+    def on_notify(self, key: Optional[str]):
+        """Callback của luồng LISTEN (thread khác) -> chuyển sang event loop."""
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self._publish, key)
+        except RuntimeError:
+            pass  # Event loop đã đóng (đang tắt)
+
+    def _reset_item(self):
+        # Kèm id mới nhất: tải lại xong mà mất kết nối thì chỉ phát lại phần sau đó
+        return self._buffer[-1][0] if self._buffer else None, _RESET
+
+    def _push(self, subscription: ScheduleSubscription, item):
+        try:
+            subscription.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Client đọc không kịp: bỏ hàng đợi, báo tải lại thay vì giữ sự kiện vô hạn
+            self.overflows += 1
+            subscription.replace(self._reset_item())
+
+    def _publish(self, key: Optional[str]):
+        if key is None:
+            # Kết nối LISTEN vừa mở lại: có thể đã lỡ sự kiện
+            self._buffer.clear()
+            self.resets += 1
+            for subscription in self._subscribers:
+                subscription.replace(self._reset_item())
+            return
+        try:
+            payload = json.loads(key)
+            event_id, event = payload["id"], {"event": payload["event"], "data": payload["data"]}
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Sự kiện lịch không hợp lệ: %r", key)
+            return
+        self._buffer.append((event_id, event))
+        self.published += 1
+        for subscription in self._subscribers:
+            if subscription.matches(event):
+                self._push(subscription, (event_id, event))
+
+    def has_capacity(self) -> bool:
+        """Kiểm tra sớm trong handler (trả 503); chỗ thật chỉ giữ khi stream bắt đầu chạy."""
+        return not self.closed and len(self._subscribers) < settings.SCHEDULE_STREAM_MAX_SUBSCRIBERS
+
+    def subscribe(self, subscription: ScheduleSubscription, last_event_id: Optional[str] = None) -> bool:
+        if not self.has_capacity():
+            return False
+        if last_event_id:
+            ids = [event_id for event_id, _ in self._buffer]
+            if last_event_id in ids:
+                for event_id, event in list(self._buffer)[ids.index(last_event_id) + 1:]:
+                    if subscription.matches(event):
+                        self._push(subscription, (event_id, event))
+            else:
+                self._push(subscription, self._reset_item())
+        self._subscribers.add(subscription)
+        return True
+
+    def unsubscribe(self, subscription: ScheduleSubscription):
+        self._subscribers.discard(subscription)
+
+    def close(self):
+        """Kết thúc mọi stream (worker đang tắt); trình duyệt tự nối lại sang worker khác."""
+        self.closed = True
+        for subscription in list(self._subscribers):
+            subscription.replace(_CLOSE)
+
+    async def stream(self, subscription: ScheduleSubscription, last_event_id: Optional[str] = None):
+        """
+        Thân response SSE: sự kiện + dòng ping định kỳ (giữ kết nối qua proxy).
+        Đăng ký ngay trong generator (cùng khối try/finally với hủy đăng ký): client
+        ngắt trước khi body chạy thì không để lại subscription nào.
+        """
+        if not self.subscribe(subscription, last_event_id):
+            # Vừa hết chỗ / đang tắt: trình duyệt nối lại sau `retry`
+            yield f"retry: {settings.SCHEDULE_STREAM_RETRY_MS}\n\n"
+            return
+        try:
+            yield f"retry: {settings.SCHEDULE_STREAM_RETRY_MS}\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), settings.SCHEDULE_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if item is _CLOSE:
+                    return
+                event_id, event = item
+                yield format_event(event, event_id)
+        finally:
+            self.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "buffered": len(self._buffer),
+            "published": self.published,
+            "resets": self.resets,
+            "overflows": self.overflows,
+        }
+
+
+schedule_stream_hub = ScheduleStreamHub(settings.SCHEDULE_STREAM_BUFFER)
+subscribe(EVENTS_TABLE, schedule_stream_hub.on_notify)
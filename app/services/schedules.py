@@ -0,0 +1,304 @@
+# app/services/schedules.py
+"""
+SQL lịch dạy dùng chung cho router sync (psycopg2) và async (psycopg 3).
+
+Chống trùng lịch do database đảm bảo (exclusion constraint, xem
+database/migrations/002_schedule_overlap_constraints.sql): mỗi lần ghi chỉ là
+1 câu lệnh, trùng lịch -> ExclusionViolation, đổi lại thành thông báo 400.
+"""
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+from app.core.pagination import decode_cursor, encode_cursor
+
+TEACHER_OVERLAP_CONSTRAINT = "schedules_teacher_no_overlap"
+CLASS_OVERLAP_CONSTRAINT = "schedules_class_no_overlap"
+
+# Kiểm tra lúc khởi động và /readyz: thiếu constraint thì lịch trùng lọt qua
+OVERLAP_CONSTRAINTS_SQL = """
+    SELECT conname FROM pg_constraint
+    WHERE conrelid = 'edu.schedules'::regclass AND conname IN (%s, %s)
+"""
+
+# Insert + trả về dữ liệu đầy đủ (join lớp, bài học) trong 1 câu lệnh
+INSERT_SCHEDULE_SQL = """
+    WITH ins AS (
+        INSERT INTO edu.schedules (class_id, lesson_id, teacher_id, schedule_date, week_day, start_period, end_period)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        RETURNING *
+    )
+    SELECT 
+        ins.schedule_id, ins.schedule_date, ins.week_day, ins.start_period, ins.end_period,
+        ins.class_id, c.class_name, c.subject_name,
+        ins.lesson_id, l.lesson_name
+    FROM ins
+    JOIN edu.classes c ON ins.class_id = c.class_id
+    LEFT JOIN edu.lessons l ON ins.lesson_id = l.lesson_id
+"""
+
+# Kèm teacher_id và vị trí cũ (ngày, lớp) cho sự kiện "updated" của /schedules/stream
+UPDATE_SCHEDULE_SQL = """
+    WITH upd AS (
+        UPDATE edu.schedules s
+        SET class_id = %s, lesson_id = %s, schedule_date = %s, week_day = %s, start_period = %s, end_period = %s
+        FROM edu.schedules old
+        WHERE s.schedule_id = %s AND old.schedule_id = s.schedule_id
+        RETURNING s.*, old.schedule_date AS old_schedule_date, old.class_id AS old_class_id
+    )
+    SELECT 
+        upd.schedule_id, upd.schedule_date, upd.week_day, upd.start_period, upd.end_period,
+        upd.class_id, c.class_name, c.subject_name,
+        upd.lesson_id, l.lesson_name,
+        upd.teacher_id, upd.old_schedule_date, upd.old_class_id
+    FROM upd
+    JOIN edu.classes c ON upd.class_id = c.class_id
+    LEFT JOIN edu.lessons l ON upd.lesson_id = l.lesson_id
+"""
+
+
+def get_weekday_str(d: date) -> str:
+    days = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"]
+    return days[d.weekday()]
+
+
+def overlap_message(error, week_day_str: str) -> Optional[str]:
+    """
+    Đổi lỗi ExclusionViolation (psycopg2 hoặc psycopg 3) thành thông báo trùng lịch.
+    Trả về None nếu không phải constraint trùng lịch.
+    """
+    constraint_name = getattr(getattr(error, "diag", None), "constraint_name", None)
+    if constraint_name == TEACHER_OVERLAP_CONSTRAINT:
+        return f"Bạn đã có lịch dạy khác vào khung giờ này ({week_day_str})."
+    if constraint_name == CLASS_OVERLAP_CONSTRAINT:
+        return "Lớp này đã có lịch học môn khác vào khung giờ này."
+    return None
+
+
+def missing_overlap_constraints(found) -> Optional[str]:
+    """found: tên constraint đọc được bằng OVERLAP_CONSTRAINTS_SQL; thiếu -> lý do, đủ -> None."""
+    missing = [name for name in (TEACHER_OVERLAP_CONSTRAINT, CLASS_OVERLAP_CONSTRAINT) if name not in found]
+    if not missing:
+        return None
+    return (f"thiếu constraint chống trùng lịch {', '.join(missing)} "
+            "(chạy database/migrations/002_schedule_overlap_constraints.sql)")
+
+
+# ============================================================
+# Đọc lịch theo khoảng ngày: phân trang keyset (JSON) và xuất file
+# ============================================================
+SCHEDULE_RANGE_COLUMNS = """
+        s.schedule_id,
+        s.schedule_date,
+        s.week_day,
+        s.start_period,
+        s.end_period,
+        s.class_id,
+        c.class_name,
+        c.subject_name,
+        s.lesson_id,
+        l.lesson_name
+"""
+
+
+def schedule_teacher_filter(current_user: dict) -> Optional[int]:
+    """Giáo viên chỉ xem lịch của mình; vai trò khác (admin) xem toàn bộ."""
+    return current_user['user_id'] if current_user['role'] == 'giáo viên' else None
+
+
+def build_schedule_range_query(
+    start_date: date,
+    end_date: date,
+    teacher_id: Optional[int],
+    after: Optional[dict] = None,
+    limit: Optional[int] = None,
+) -> Tuple[str, list]:
+    """
+    SQL lịch dạy trong [start_date, end_date], sắp theo (ngày, tiết bắt đầu, id).
+    - teacher_id: None = admin (không lọc giáo viên).
+    - after: khóa dòng cuối của trang trước {"date", "period", "id"} (keyset).
+    - limit: lấy dư 1 dòng để biết còn trang sau; None = không giới hạn (xuất file).
+    """
+    where = ["s.schedule_date >= %s", "s.schedule_date <= %s"]
+    params: list = [start_date, end_date]
+    if teacher_id is not None:
+        where.append("s.teacher_id = %s")
+        params.append(teacher_id)
+    if after is not None:
+        where.append("(s.schedule_date, COALESCE(s.start_period, 0), s.schedule_id) > (%s, %s, %s)")
+        params.extend([after["date"], after["period"], after["id"]])
+
+    sql = f"""
+        SELECT {SCHEDULE_RANGE_COLUMNS}
+        FROM edu.schedules s
+        JOIN edu.classes c ON s.class_id = c.class_id
+        LEFT JOIN edu.lessons l ON s.lesson_id = l.lesson_id
+        WHERE {' AND '.join(where)}
+        ORDER BY s.schedule_date, COALESCE(s.start_period, 0), s.schedule_id
+    """
+    if limit is not None:
+        sql += " LIMIT %s"
+        params.append(limit + 1)
+    return sql, params
+
+
+def decode_schedule_cursor(token: str, start_date: date, end_date: date) -> dict:
+    """Giải mã cursor trang lịch; cursor của khoảng ngày khác -> ValueError."""
+    data = decode_cursor(token)
+    if data.get("start") != start_date.isoformat() or data.get("end") != end_date.isoformat():
+        raise ValueError("Cursor không khớp khoảng ngày hiện tại")
+    try:
+        return {"date": date.fromisoformat(data["date"]), "period": int(data["period"]), "id": int(data["id"])}
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Cursor không hợp lệ") from e
+
+
+def schedule_keyset(row: dict) -> dict:
+    """Khóa keyset (tham số `after` của build_schedule_range_query) của 1 dòng lịch."""
+    return {"date": row['schedule_date'], "period": row['start_period'] or 0, "id": row['schedule_id']}
+
+
+def schedule_page(rows: list, start_date: date, end_date: date, limit: int) -> Tuple[list, Optional[str]]:
+    """Cắt dòng dư; trả về (các dòng, cursor trang sau hoặc None)."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor({"start": start_date, "end": end_date, **schedule_keyset(rows[-1])})
+
+
+# ============================================================
+# Lịch lặp lại hàng tuần (POST /schedules/recurring)
+# ============================================================
+# Giới hạn số buổi tạo trong 1 request lịch lặp lại (~ 1 năm học x 10 tiết/tuần)
+MAX_RECURRING_OCCURRENCES = 2000
+
+# Trùng với lịch đã có: 1 query cho tất cả các buổi
+RECURRING_CONFLICT_SQL = """
+    SELECT
+        o.idx,
+        bool_or(s.teacher_id = %s) AS teacher_conflict,
+        bool_or(s.class_id = %s) AS class_conflict
+    FROM unnest(%s::date[], %s::int[], %s::int[])
+         WITH ORDINALITY AS o(schedule_date, start_period, end_period, idx)
+    JOIN edu.schedules s
+      ON s.schedule_date = o.schedule_date
+     AND (s.teacher_id = %s OR s.class_id = %s)
+     AND s.start_period <= o.end_period
+     AND s.end_period >= o.start_period
+    GROUP BY o.idx
+"""
+
+# Insert tất cả buổi hợp lệ bằng 1 câu lệnh, trả về dữ liệu đầy đủ
+RECURRING_INSERT_SQL = """
+    WITH ins AS (
+        INSERT INTO edu.schedules (class_id, lesson_id, teacher_id, schedule_date, week_day, start_period, end_period)
+        SELECT %s, o.lesson_id, %s, o.schedule_date, o.week_day, o.start_period, o.end_period
+        FROM unnest(%s::int[], %s::date[], %s::text[], %s::int[], %s::int[])
+             AS o(lesson_id, schedule_date, week_day, start_period, end_period)
+        ON CONFLICT DO NOTHING
+        RETURNING *
+    )
+    SELECT 
+        ins.schedule_id, ins.schedule_date, ins.week_day, ins.start_period, ins.end_period,
+        ins.class_id, c.class_name, c.subject_name,
+        ins.lesson_id, l.lesson_name
+    FROM ins
+    JOIN edu.classes c ON ins.class_id = c.class_id
+    LEFT JOIN edu.lessons l ON ins.lesson_id = l.lesson_id
+    ORDER BY ins.schedule_date, ins.start_period
+"""
+
+
+def _first_day(data, week_day: int) -> date:
+    """Ngày đầu tiên trong khoảng có thứ trùng với `week_day`."""
+    return data.start_date + timedelta(days=(week_day - data.start_date.weekday()) % 7)
+
+
+def count_weekly_occurrences(data) -> int:
+    """Số buổi expand_weekly_slots sẽ tạo, tính trước (không trải ra) để chặn sớm."""
+    total = 0
+    for slot in data.slots:
+        first = _first_day(data, slot.week_day)
+        if first <= data.end_date:
+            total += (data.end_date - first).days // 7 + 1
+    return total
+
+
+def expand_weekly_slots(data) -> List[dict]:
+    """Trải các khung giờ hàng tuần (RecurringScheduleCreate) thành từng buổi trong [start_date, end_date]."""
+    occurrences = []
+    for slot in data.slots:
+        day = _first_day(data, slot.week_day)
+        while day <= data.end_date:
+            occurrences.append({
+                "schedule_date": day,
+                "week_day": get_weekday_str(day),
+                "start_period": slot.start_period,
+                "end_period": slot.end_period,
+                "lesson_id": slot.lesson_id,
+            })
+            day += timedelta(days=7)
+    occurrences.sort(key=lambda o: (o["schedule_date"], o["start_period"]))
+    return occurrences
+
+
+def split_request_conflicts(occurrences: List[dict]) -> Tuple[List[dict], List[dict]]:
+    """Tách các buổi trùng nhau ngay trong yêu cầu (2 khung giờ chồng lên nhau cùng ngày)."""
+    accepted, conflicts = [], []
+    accepted_by_date = {}
+    for occ in occurrences:
+        same_day = accepted_by_date.setdefault(occ["schedule_date"], [])
+        if any(o["start_period"] <= occ["end_period"] and o["end_period"] >= occ["start_period"] for o in same_day):
+            conflicts.append({**occ, "reason": "Trùng với khung giờ khác trong cùng yêu cầu."})
+        else:
+            same_day.append(occ)
+            accepted.append(occ)
+    return accepted, conflicts
+
+
+def recurring_conflict_params(teacher_id: int, class_id: int, accepted: List[dict]) -> tuple:
+    return (
+        teacher_id, class_id,
+        [o["schedule_date"] for o in accepted],
+        [o["start_period"] for o in accepted],
+        [o["end_period"] for o in accepted],
+        teacher_id, class_id,
+    )
+
+
+def split_existing_conflicts(accepted: List[dict], rows: list) -> Tuple[List[dict], List[dict]]:
+    """Từ kết quả RECURRING_CONFLICT_SQL: (các buổi cần insert, các buổi trùng lịch đã có)."""
+    clashes = {row['idx']: row for row in rows}
+    to_insert, conflicts = [], []
+    for idx, occ in enumerate(accepted, start=1):
+        clash = clashes.get(idx)
+        if clash is None:
+            to_insert.append(occ)
+        elif clash['teacher_conflict']:
+            conflicts.append({**occ, "reason": f"Bạn đã có lịch dạy khác vào khung giờ này ({occ['week_day']})."})
+        else:
+            conflicts.append({**occ, "reason": "Lớp này đã có lịch học môn khác vào khung giờ này."})
+    return to_insert, conflicts
+
+
+def recurring_insert_params(teacher_id: int, class_id: int, to_insert: List[dict]) -> tuple:
+    return (
+        class_id, teacher_id,
+        [o["lesson_id"] for o in to_insert],
+        [o["schedule_date"] for o in to_insert],
+        [o["week_day"] for o in to_insert],
+        [o["start_period"] for o in to_insert],
+        [o["end_period"] for o in to_insert],
+    )
+
+
+def skipped_by_database(to_insert: List[dict], created: list) -> List[dict]:
+    """
+    Buổi bị DB bỏ qua (ON CONFLICT DO NOTHING): có lịch trùng vừa được
+    tạo bởi request đồng thời sau bước kiểm tra trùng lịch.
+    """
+    inserted = {(r['schedule_date'], r['start_period']) for r in created}
+    return [
+        {**occ, "reason": "Khung giờ này vừa được xếp lịch khác, vui lòng tải lại."}
+        for occ in to_insert
+        if (occ["schedule_date"], occ["start_period"]) not in inserted
+    ]
@@ -0,0 +1,257 @@
+# app/services/student_import.py
+"""
+Nhập danh sách học sinh hàng loạt (đầu năm học) từ file CSV / XLSX.
+
+- Đọc file theo luồng, xử lý từng lô IMPORT_BATCH_SIZE dòng -> bộ nhớ không
+  phụ thuộc kích thước file.
+- Mỗi dòng được validate bằng StudentCreate; lớp phải thuộc giáo viên đang nhập
+  (admin nhập được cho mọi lớp).
+- Dòng hợp lệ được nạp bằng COPY (nhanh hơn INSERT từng dòng nhiều lần).
+- Báo lỗi theo từng dòng, tối đa MAX_IMPORT_ERRORS lỗi.
+"""
+import csv
+import io
+from typing import Iterator, List, Optional
+
+from pydantic import ValidationError
+
+from app.schemas.school import StudentCreate
+
+try:
+    import openpyxl
+except ImportError:  # XLSX là tùy chọn, CSV luôn dùng được
+    openpyxl = None
+
+IMPORT_BATCH_SIZE = 5000
+MAX_IMPORT_ERRORS = 1000
+
+STUDENT_COLUMNS = ("class_id", "full_name", "date_of_birth", "email", "phone_number", "status")
+TEXT_COLUMNS = ("full_name", "email", "phone_number", "status")
+
+COPY_STUDENTS_SQL = f"""
+    COPY edu.students ({", ".join(STUDENT_COLUMNS)})
+    FROM STDIN WITH (FORMAT csv)
+"""
+
+# Tên cột tiếng Việt thường gặp trong file Excel của nhà trường
+HEADER_ALIASES = {
+    "mã lớp": "class_id",
+    "họ và tên": "full_name",
+    "họ tên": "full_name",
+    "ngày sinh": "date_of_birth",
+    "số điện thoại": "phone_number",
+    "trạng thái": "status",
+}
+
+
+class ImportFormatError(Exception):
+    """File không đọc được (sai định dạng, thiếu cột bắt buộc...)."""
+
+
+def _normalize_header(header) -> List[Optional[str]]:
+    columns = []
+    for name in header:
+        key = str(name or "").strip().lower()
+        key = HEADER_ALIASES.get(key, key)
+        columns.append(key if key in STUDENT_COLUMNS else None)
+    if "full_name" not in columns:
+        raise ImportFormatError("File thiếu cột full_name (Họ và tên).")
+    return columns
+
+
+def _rows_from_records(records: Iterator) -> Iterator[dict]:
+    """Dòng đầu là tiêu đề; các dòng sau -> dict theo tên cột (bỏ cột lạ, dòng trống)."""
+    try:
+        header = next(records)
+    except StopIteration:
+        raise ImportFormatError("File rỗng.")
+    columns = _normalize_header(header)
+    for values in records:
+        row = {}
+        for column, value in zip(columns, values):
+            if column is None:
+                continue
+            if isinstance(value, str):
+                value = value.strip()
+            elif column in TEXT_COLUMNS and value is not None:
+                # Ô số trong Excel (VD: số điện thoại) -> chuỗi, bỏ ".0"
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)
+                value = str(value)
+            row[column] = None if value in ("", None) else value
+        if any(v is not None for v in row.values()):
+            yield row
+        else:
+            yield None  # Giữ đúng số thứ tự dòng trong báo cáo lỗi
+
+
+def iter_csv_rows(binary_file) -> Iterator[Optional[dict]]:
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    try:
+        yield from _rows_from_records(csv.reader(text))
+    except UnicodeDecodeError:
+        raise ImportFormatError("File CSV phải được lưu với mã hóa UTF-8.")
+    finally:
+        text.detach()  # Không đóng file upload gốc
+
+
+def iter_xlsx_rows(binary_file) -> Iterator[Optional[dict]]:
+    if openpyxl is None:
+        raise ImportFormatError("Máy chủ chưa hỗ trợ file XLSX (thiếu openpyxl), vui lòng dùng CSV.")
+    try:
+        workbook = openpyxl.load_workbook(binary_file, read_only=True, data_only=True)
+    except Exception:
+        raise ImportFormatError("Không đọc được file XLSX.")
+    try:
+        yield from _rows_from_records(workbook.active.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def iter_upload_rows(filename: str, binary_file) -> Iterator[Optional[dict]]:
+    if (filename or "").lower().endswith(".xlsx"):
+        return iter_xlsx_rows(binary_file)
+    return iter_csv_rows(binary_file)
+
+
+def _error_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in error.errors()
+    )
+
+
+class StudentImporter:
+    """
+    Gom dòng thành lô, validate, kiểm tra quyền với lớp và COPY vào DB.
+    Dùng: importer.add(row_number, row) cho từng dòng, sau cùng gọi finish().
+    """
+
+    def __init__(self, cursor, user: dict, default_class_id: Optional[int] = None):
+        self.cursor = cursor
+        self.user = user
+        self.default_class_id = default_class_id
+        self.batch = []  # [(số dòng, StudentCreate)]
+        self.allowed_classes = {}  # class_id -> có quyền hay không (nhớ qua các lô)
+        self.total_rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        self.errors_truncated = False
+
+    def error(self, row_number: int, class_id, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_IMPORT_ERRORS:
+            self.errors.append({"row": row_number, "class_id": class_id, "message": message})
+        else:
+            self.errors_truncated = True
+
+    def _accept(self, row_number: int, row: dict) -> bool:
+        """Validate 1 dòng và thêm vào lô; True = lô đã đầy, cần flush."""
+        self.total_rows += 1
+        if row.get("class_id") is None:
+            row["class_id"] = self.default_class_id
+        try:
+            student = StudentCreate(**{k: v for k, v in row.items() if v is not None})
+        except ValidationError as e:
+            class_id = str(row.get("class_id") or "")
+            self.error(row_number, int(class_id) if class_id.isdigit() else None, _error_message(e))
+            return False
+        if not student.full_name.strip():
+            self.error(row_number, student.class_id, "full_name: Họ tên không được để trống")
+            return False
+
+        self.batch.append((row_number, student))
+        return len(self.batch) >= IMPORT_BATCH_SIZE
+
+    def _class_query(self):
+        """(sql, params) kiểm tra quyền với các lớp chưa gặp trong lô hiện tại; None nếu đã biết hết."""
+        unknown = list({student.class_id for _, student in self.batch} - self.allowed_classes.keys())
+        if not unknown:
+            return None
+        sql = "SELECT class_id FROM edu.classes WHERE class_id = ANY(%s)"
+        params = [unknown]
+        if self.user['role'] != 'admin':
+            sql += " AND teacher_id = %s"
+            params.append(self.user['user_id'])
+        return sql, tuple(params)
+
+    def _remember_classes(self, class_ids, rows):
+        found = {row['class_id'] for row in rows}
+        for cid in class_ids:
+            self.allowed_classes[cid] = cid in found
+
+    def _take_batch(self):
+        """Dữ liệu CSV cho COPY của lô hiện tại (bỏ dòng không có quyền với lớp) và số dòng."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        count = 0
+        for row_number, student in self.batch:
+            if not self.allowed_classes[student.class_id]:
+                self.error(row_number, student.class_id, "Không tìm thấy lớp hoặc bạn không có quyền với lớp này.")
+                continue
+            # None -> ô trống không có dấu nháy = NULL khi COPY (FORMAT csv)
+            writer.writerow([
+                student.class_id, student.full_name, student.date_of_birth,
+                student.email, student.phone_number, student.status,
+            ])
+            count += 1
+        self.batch = []
+        buffer.seek(0)
+        return buffer, count
+
+    def add(self, row_number: int, row: dict):
+        if self._accept(row_number, row):
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        query = self._class_query()
+        if query is not None:
+            self.cursor.execute(*query)
+            self._remember_classes(query[1][0], self.cursor.fetchall())
+
+        buffer, count = self._take_batch()
+        if count:
+            self.cursor.copy_expert(COPY_STUDENTS_SQL, buffer)
+            self.imported += count
+
+    def result(self) -> dict:
+        self.errors.sort(key=lambda e: e["row"])
+        return {
+            "total_rows": self.total_rows,
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+        }
+
+    def finish(self) -> dict:
+        self.flush()
+        return self.result()
+
+
+class AsyncStudentImporter(StudentImporter):
+    """Bản cho router async (psycopg 3): cùng logic, COPY qua cursor.copy()."""
+
+    async def add(self, row_number: int, row: dict):
+        if self._accept(row_number, row):
+            await self.flush()
+
+    async def flush(self):
+        if not self.batch:
+            return
+        query = self._class_query()
+        if query is not None:
+            await self.cursor.execute(*query)
+            self._remember_classes(query[1][0], await self.cursor.fetchall())
+
+        buffer, count = self._take_batch()
+        if count:
+            async with self.cursor.copy(COPY_STUDENTS_SQL) as copy:
+                await copy.write(buffer.getvalue())
+            self.imported += count
+
+    async def finish(self) -> dict:
+        await self.flush()
+        return self.result()
@@ -0,0 +1,48 @@
+# app/services/warmup.py
+"""
+Nạp sẵn các cache nóng lúc khởi động (app/core/startup.py), để người dùng đầu
+tiên sau deploy không phải trả giá cache lạnh:
+- /knowledge-tree: cây đầy đủ (admin) + cây lọc theo từng môn có giáo viên phụ trách;
+- /teacher/classes-lessons: danh mục bài của mọi (khối, môn) đang có lớp.
+Cùng đường nạp với API (cùng version cache, cùng cách render) -> kết quả như
+request đầu tiên tự nạp. Đọc ở primary như các API nạp cache.
+"""
+from typing import List
+
+from app.core.responses import render_json
+from app.schemas.knowledge import GradeDTO
+from app.services.knowledge_tree import fetch_knowledge_tree, knowledge_tree_cache
+from app.services.lesson_catalog import lesson_catalog_cache
+
+TEACHER_SUBJECTS_SQL = """
+    SELECT DISTINCT subject_id FROM edu.users
+    WHERE role = 'giáo viên' AND subject_id IS NOT NULL
+    ORDER BY subject_id
+"""
+CLASS_CATALOG_KEYS_SQL = "SELECT DISTINCT grade_level, subject_name FROM edu.classes"
+
+
+def warm_knowledge_tree(cursor) -> int:
+    scopes = [None]
+    cursor.execute(TEACHER_SUBJECTS_SQL)
+    scopes += [row['subject_id'] for row in cursor.fetchall()]
+    for scope in scopes:
+        version = knowledge_tree_cache.version
+        rows = fetch_knowledge_tree(cursor, scope)
+        knowledge_tree_cache.put(scope, version, render_json(rows, List[GradeDTO]))
+    return len(scopes)
+
+
+def warm_lesson_catalogs(cursor) -> int:
+    cursor.execute(CLASS_CATALOG_KEYS_SQL)
+    keys = {(row['grade_level'], row['subject_name']) for row in cursor.fetchall()}
+    lesson_catalog_cache.get_many(cursor, keys)
+    return len(keys)
+
+
+def warm_caches(cursor) -> dict:
+    """Trả về số mục đã nạp của từng cache (để log / báo cáo thời gian khởi động)."""
+    return {
+        "knowledge_tree_scopes": warm_knowledge_tree(cursor),
+        "lesson_catalogs": warm_lesson_catalogs(cursor),
+    }
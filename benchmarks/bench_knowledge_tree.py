@@ -0,0 +1,69 @@
+# benchmarks/bench_knowledge_tree.py
+"""
+Đo độ trễ GET /knowledge-tree: cache lạnh (xóa cache trước mỗi lần gọi),
+cache nóng, và 304 Not Modified (gửi lại ETag).
+
+Cần Postgres đã seed dữ liệu (cấu hình trong .env) và httpx (cho TestClient).
+Chạy từ thư mục gốc repo:
+    python -m benchmarks.bench_knowledge_tree --username admin --runs 50
+"""
+import argparse
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.main import app
+from app.services.knowledge_tree import knowledge_tree_cache
+
+
+def measure(client, url, headers, runs, before=None):
+    timings = []
+    status_code = None
+    for _ in range(runs):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = client.get(url, headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        status_code = response.status_code
+    return timings, status_code, response
+
+
+def report(name, timings, status_code):
+    timings = sorted(timings)
+    p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+    print(f"{name:<10} status={status_code} "
+          f"p50={statistics.median(timings):8.2f}ms p95={p95:8.2f}ms "
+          f"mean={statistics.mean(timings):8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--username", default="admin", help="User để ký token (admin thấy toàn bộ cây)")
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    url = f"{settings.API_V1_STR}/knowledge-tree"
+    headers = {"Authorization": f"Bearer {create_access_token(args.username)}"}
+
+    # Làm nóng kết nối + cache xác thực
+    client.get(url, headers=headers)
+
+    cold, status_code, _ = measure(client, url, headers, args.runs, before=knowledge_tree_cache.invalidate)
+    report("cold", cold, status_code)
+
+    warm, status_code, response = measure(client, url, headers, args.runs)
+    report("warm", warm, status_code)
+    print(f"{'':<10} body={len(response.content)} bytes etag={response.headers.get('etag')}")
+
+    conditional = dict(headers, **{"If-None-Match": response.headers["etag"]})
+    not_modified, status_code, _ = measure(client, url, conditional, args.runs)
+    report("304", not_modified, status_code)
+
+
+if __name__ == "__main__":
+    main()
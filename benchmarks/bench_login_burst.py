@@ -0,0 +1,140 @@
+# benchmarks/bench_login_burst.py
+"""
+Mô phỏng đợt đăng nhập đầu giờ: bắn --logins lần POST /login đồng thời, trong
+lúc đó gọi đều GET /schedules (API không liên quan) để xem có bị "đói" không.
+
+Khởi động 1 server uvicorn thật (tiến trình riêng) với giới hạn tần suất
+/login được nới rộng (chỉ đo tải băm mật khẩu). Báo cáo p50/p95/p99 của
+/login và của /schedules trước và trong đợt đăng nhập, kèm số mã 200/429/503.
+
+Cần Postgres đã seed dữ liệu (cấu hình trong .env) và user/mật khẩu có thật.
+Chạy từ thư mục gốc repo:
+    python -m benchmarks.bench_login_burst --username gv01 --password 123456 --logins 500
+    python -m benchmarks.bench_login_burst ... --hash-workers 0   # so sánh: băm ngay trong thread
+"""
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+from app.core.config import settings
+from app.core.security import create_access_token
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[max(0, int(round(len(values) * pct / 100.0)) - 1)] if values else float("nan")
+
+
+def report(name, timings, statuses=None):
+    line = (f"{name:<22} n={len(timings):<5} p50={statistics.median(timings):8.1f}ms "
+            f"p95={percentile(timings, 95):8.1f}ms p99={percentile(timings, 99):8.1f}ms")
+    if statuses:
+        line += "  " + " ".join(f"{code}={count}" for code, count in sorted(statuses.items()))
+    print(line)
+
+
+def request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    started = time.perf_counter()
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        response.read()
+        return response.status, (time.perf_counter() - started) * 1000
+    finally:
+        conn.close()
+
+
+def wait_ready(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            request(port, "GET", "/")
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server không khởi động được")
+
+
+def probe_loop(port, path, headers, stop, timings, interval):
+    while not stop.is_set():
+        status, elapsed = request(port, "GET", path, headers=headers)
+        if status == 200:
+            timings.append(elapsed)
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100, help="Số client đăng nhập cùng lúc")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--hash-workers", type=int, default=None, help="Ghi đè PASSWORD_HASH_WORKERS")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    args = parser.parse_args()
+
+    env = dict(os.environ,
+               LOGIN_RATE_PER_USERNAME="1000000", LOGIN_BURST_PER_USERNAME="1000000",
+               LOGIN_RATE_PER_IP="1000000", LOGIN_BURST_PER_IP="1000000")
+    if args.hash_workers is not None:
+        env["PASSWORD_HASH_WORKERS"] = str(args.hash_workers)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        wait_ready(args.port)
+        today = date.today()
+        probe_path = (f"{settings.API_V1_STR}/schedules?"
+                      + urlencode({"start_date": today, "end_date": today + timedelta(days=7)}))
+        probe_headers = {"Authorization": f"Bearer {create_access_token(args.username)}"}
+        login_path = f"{settings.API_V1_STR}/login"
+        login_body = urlencode({"username": args.username, "password": args.password})
+        login_headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+        # Làm nóng: hồ kết nối, hồ tiến trình băm, cache xác thực
+        request(args.port, "POST", login_path, login_body, login_headers)
+        request(args.port, "GET", probe_path, headers=probe_headers)
+
+        # 1. Độ trễ /schedules khi hệ thống rảnh
+        idle = [request(args.port, "GET", probe_path, headers=probe_headers)[1] for _ in range(50)]
+
+        # 2. Đợt đăng nhập + đo /schedules song song
+        busy, stop = [], threading.Event()
+        prober = threading.Thread(
+            target=probe_loop, args=(args.port, probe_path, probe_headers, stop, busy, args.probe_interval)
+        )
+        prober.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(pool.map(
+                lambda _: request(args.port, "POST", login_path, login_body, login_headers),
+                range(args.logins),
+            ))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        prober.join()
+
+        statuses = Counter(status for status, _ in results)
+        print(f"{args.logins} lần đăng nhập trong {elapsed:.1f}s ({args.logins / elapsed:.1f}/s)")
+        report("/login", [ms for _, ms in results], statuses)
+        report("/schedules (rảnh)", idle)
+        report("/schedules (đợt login)", busy)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
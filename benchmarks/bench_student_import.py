@@ -0,0 +1,87 @@
+# benchmarks/bench_student_import.py
+"""
+Đo POST /students/import với file CSV lớn (mặc định 100.000 dòng):
+thời gian, tốc độ (dòng/giây) và bộ nhớ đỉnh của tiến trình.
+
+File CSV được sinh ra file tạm trên đĩa (không giữ trong RAM). Dữ liệu
+được nạp thật vào edu.students của lớp --class-id; dùng --cleanup để xóa lại.
+
+Cần Postgres (cấu hình trong .env) và httpx (cho TestClient).
+Chạy từ thư mục gốc repo:
+    python -m benchmarks.bench_student_import --class-id 1 --username admin --rows 100000 --cleanup
+"""
+import argparse
+import csv
+import resource
+import tempfile
+import time
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from app.main import app
+from scripts.common import connect
+
+
+def write_csv(path, rows, class_id, marker):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["class_id", "full_name", "date_of_birth", "email", "phone_number", "status"])
+        birthday = date(2010, 1, 1)
+        for i in range(rows):
+            writer.writerow([
+                class_id, f"{marker} Học sinh {i}", birthday + timedelta(days=i % 1500),
+                f"hs{i}@example.edu.vn", f"09{i:08d}", "Hoạt động",
+            ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--class-id", type=int, required=True, help="Lớp nhận học sinh (phải thuộc --username)")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--cleanup", action="store_true", help="Xóa học sinh vừa nhập sau khi đo")
+    args = parser.parse_args()
+
+    marker = f"BENCH-{int(time.time())}"
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token(args.username)}"}
+    url = f"{settings.API_V1_STR}/students/import"
+
+    with tempfile.NamedTemporaryFile(suffix=".csv") as tmp:
+        write_csv(tmp.name, args.rows, args.class_id, marker)
+        size_mb = tmp.seek(0, 2) / 1024 / 1024
+        tmp.seek(0)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started = time.perf_counter()
+        response = client.post(url, headers=headers, files={"file": ("students.csv", tmp, "text/csv")})
+        elapsed = time.perf_counter() - started
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    result = response.json()
+    print(f"status={response.status_code} file={size_mb:.1f}MB rows={args.rows}")
+    if response.status_code != 201:
+        print(result)
+        return
+    print(f"imported={result['imported']} failed={result['failed']}")
+    print(f"time={elapsed:.2f}s  rate={args.rows / elapsed:,.0f} dòng/giây")
+    # ru_maxrss tính bằng KB trên Linux
+    print(f"peak RSS={rss_after / 1024:.1f}MB (tăng {(rss_after - rss_before) / 1024:.1f}MB trong lúc nhập)")
+
+    if args.cleanup:
+        conn = connect()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM edu.students WHERE class_id = %s AND full_name LIKE %s",
+                           (args.class_id, f"{marker} %"))
+            print(f"Đã xóa {cursor.rowcount} học sinh")
+            conn.commit()
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
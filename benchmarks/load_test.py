@@ -0,0 +1,278 @@
+# benchmarks/load_test.py
+"""
+Kiểm thử tải tổng thể: nhiều client đồng thời gọi các API thật (HTTP) với
+hỗn hợp giáo viên / admin, báo cáo thông lượng và p50/p95/p99 theo route.
+
+Chuẩn bị (Postgres cục bộ, không cần dịch vụ ngoài):
+    python -m scripts.generate_dataset --reset        # hoặc bản nhỏ hơn, xem --help
+    python -m app.launcher --port 8000 --workers 4    # cửa sổ khác
+
+Chạy từ thư mục gốc repo:
+    python -m benchmarks.load_test --duration 60 --concurrency 64
+    python -m benchmarks.load_test --admin-ratio 0.2 --write-ratio 0.05 --json result.json
+
+Token được ký trực tiếp bằng SECRET_KEY (create_access_token) nên không tốn
+bcrypt cho mỗi client; danh sách giáo viên + lớp lấy thẳng từ DB.
+Ghi (--write-ratio): tạo rồi xóa 1 lịch dạy vào Chủ Nhật (ngày dữ liệu sinh
+ra không dùng) -> không làm bẩn bộ dữ liệu.
+"""
+import argparse
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from psycopg2.extras import RealDictCursor
+
+from app.core.config import settings
+from app.core.security import create_access_token
+from scripts.common import connect
+
+API = settings.API_V1_STR
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[max(0, int(round(len(values) * pct / 100.0)) - 1)] if values else float("nan")
+
+
+def load_users(sample_size):
+    """Lấy ngẫu nhiên giáo viên (kèm lớp đang dạy) và 1 admin để ký token."""
+    conn = connect()
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        cursor.execute("""
+            SELECT u.username, u.subject_id, array_agg(c.class_id ORDER BY c.class_id) AS class_ids
+            FROM edu.users u
+            JOIN edu.classes c ON c.teacher_id = u.user_id
+            WHERE u.role = 'giáo viên' AND u.status = 'Hoạt động'
+            GROUP BY u.user_id
+            ORDER BY random()
+            LIMIT %s
+        """, (sample_size,))
+        teachers = cursor.fetchall()
+        cursor.execute("SELECT username FROM edu.users WHERE role = 'admin' AND status = 'Hoạt động' LIMIT 1")
+        admin = cursor.fetchone()
+        cursor.execute("SELECT MIN(schedule_date) AS first_day, MAX(schedule_date) AS last_day FROM edu.schedules")
+        period = cursor.fetchone()
+        cursor.execute("SELECT chapter_id FROM edu.chapters ORDER BY random() LIMIT 200")
+        chapter_ids = [row["chapter_id"] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    if not teachers or admin is None:
+        raise SystemExit("Chưa có dữ liệu giáo viên / admin - chạy scripts.generate_dataset trước.")
+    return teachers, admin["username"], period, chapter_ids
+
+
+class Context:
+    """Dữ liệu dùng chung của các client (chỉ đọc)."""
+
+    def __init__(self, args, teachers, admin, period, chapter_ids):
+        self.teachers = [dict(t, token=create_access_token(t["username"])) for t in teachers]
+        self.admin_token = create_access_token(admin)
+        self.first_day = period["first_day"] or date.today()
+        self.last_day = period["last_day"] or self.first_day + timedelta(days=7)
+        self.chapter_ids = chapter_ids or [1]
+        self.args = args
+
+    def random_week(self, rng):
+        span = max(0, (self.last_day - self.first_day).days - 6)
+        start = self.first_day + timedelta(days=rng.randint(0, span))
+        return start, start + timedelta(days=6)
+
+
+# ============================================================
+# Kịch bản: (route, trọng số, hàm sinh request)
+# Hàm nhận (rng, ctx, user) và trả (method, path, body)
+# ============================================================
+def schedules_week(rng, ctx, user):
+    start, end = ctx.random_week(rng)
+    return "GET", f"{API}/schedules?" + urlencode({"start_date": start, "end_date": end}), None
+
+
+def school_data(rng, ctx, user):
+    return "GET", f"{API}/school-data", None
+
+
+def classes_lessons(rng, ctx, user):
+    return "GET", f"{API}/teacher/classes-lessons", None
+
+
+def knowledge_tree(rng, ctx, user):
+    return "GET", f"{API}/knowledge-tree", None
+
+
+def knowledge_chapter(rng, ctx, user):
+    return "GET", f"{API}/knowledge-tree/chapter/{rng.choice(ctx.chapter_ids)}?depth=2", None
+
+
+TEACHER_SCENARIOS = [
+    ("GET /schedules", 5, schedules_week),
+    ("GET /school-data", 3, school_data),
+    ("GET /teacher/classes-lessons", 2, classes_lessons),
+    ("GET /knowledge-tree", 2, knowledge_tree),
+    ("GET /knowledge-tree/chapter/{id}", 1, knowledge_chapter),
+]
+ADMIN_SCENARIOS = [
+    ("GET /schedules", 4, schedules_week),
+    ("GET /knowledge-tree", 3, knowledge_tree),
+    ("GET /knowledge-tree/chapter/{id}", 2, knowledge_chapter),
+    ("GET /school-data", 1, school_data),
+]
+
+
+class Worker(threading.Thread):
+    """1 client: giữ 1 kết nối keep-alive, chọn kịch bản theo trọng số tới khi hết giờ."""
+
+    def __init__(self, index, ctx, results, deadline):
+        super().__init__(name=f"client-{index}", daemon=True)
+        self.rng = random.Random(ctx.args.seed + index)
+        self.ctx = ctx
+        self.results = results  # route -> list[(status, ms)], mỗi worker 1 dict riêng
+        self.deadline = deadline
+        target = urlsplit(ctx.args.base_url)
+        self.host, self.port = target.hostname, target.port or 80
+        self.conn = None
+
+    def send(self, method, path, token, body=None):
+        headers = {"Authorization": f"Bearer {token}"}
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        started = time.perf_counter()
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.ctx.args.timeout)
+            try:
+                self.conn.request(method, path, body=body, headers=headers)
+                response = self.conn.getresponse()
+                payload = response.read()
+                return response.status, (time.perf_counter() - started) * 1000, payload
+            except (http.client.HTTPException, OSError):
+                self.conn.close()
+                self.conn = None  # Server đóng keep-alive -> mở lại 1 lần
+                if attempt:
+                    return 0, (time.perf_counter() - started) * 1000, b""
+
+    def record(self, route, status, elapsed):
+        self.results[route].append((status, elapsed))
+
+    def write_cycle(self, user):
+        """Tạo rồi xóa 1 lịch dạy vào Chủ Nhật của 1 tuần ngẫu nhiên."""
+        start, _ = self.ctx.random_week(self.rng)
+        sunday = start + timedelta(days=6 - start.weekday())
+        period = self.rng.randint(1, 9)
+        body = {"class_id": self.rng.choice(user["class_ids"]), "lesson_id": None,
+                "schedule_date": sunday.isoformat(), "start_period": period, "end_period": period + 1}
+        status, elapsed, payload = self.send("POST", f"{API}/schedules", user["token"], body)
+        self.record("POST /schedules", status, elapsed)
+        if status == 201:
+            schedule_id = json.loads(payload)["schedule_id"]
+            status, elapsed, _ = self.send("DELETE", f"{API}/schedules/{schedule_id}", user["token"])
+            self.record("DELETE /schedules/{id}", status, elapsed)
+
+    def run(self):
+        args = self.ctx.args
+        teacher_weights = [w for _, w, _ in TEACHER_SCENARIOS]
+        admin_weights = [w for _, w, _ in ADMIN_SCENARIOS]
+        try:
+            while time.monotonic() < self.deadline:
+                if self.rng.random() < args.admin_ratio:
+                    user = None
+                    route, _, build = self.rng.choices(ADMIN_SCENARIOS, admin_weights)[0]
+                else:
+                    user = self.rng.choice(self.ctx.teachers)
+                    if self.rng.random() < args.write_ratio:
+                        self.write_cycle(user)
+                        continue
+                    route, _, build = self.rng.choices(TEACHER_SCENARIOS, teacher_weights)[0]
+                token = self.ctx.admin_token if user is None else user["token"]
+                method, path, body = build(self.rng, self.ctx, user)
+                status, elapsed, _ = self.send(method, path, token, body)
+                self.record(route, status, elapsed)
+        finally:
+            if self.conn is not None:
+                self.conn.close()
+
+
+def summarize(results, elapsed):
+    merged = defaultdict(list)
+    for per_worker in results:
+        for route, samples in per_worker.items():
+            merged[route].extend(samples)
+
+    summary = {}
+    for route, samples in sorted(merged.items()):
+        timings = [ms for _, ms in samples]
+        statuses = defaultdict(int)
+        for status, _ in samples:
+            statuses[str(status)] += 1
+        summary[route] = {
+            "count": len(samples),
+            "rps": len(samples) / elapsed,
+            "p50_ms": statistics.median(timings),
+            "p95_ms": percentile(timings, 95),
+            "p99_ms": percentile(timings, 99),
+            "max_ms": max(timings),
+            "statuses": dict(sorted(statuses.items())),
+        }
+    return summary
+
+
+def report(summary, elapsed):
+    total = sum(r["count"] for r in summary.values())
+    errors = sum(n for r in summary.values() for code, n in r["statuses"].items() if not code.startswith(("2", "3")))
+    print(f"{total} request trong {elapsed:.1f}s -> {total / elapsed:.1f} req/s, {errors} lỗi (mã != 2xx/3xx)")
+    print(f"{'route':<34} {'n':>7} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}  mã")
+    for route, r in summary.items():
+        codes = " ".join(f"{code}={n}" for code, n in r["statuses"].items())
+        print(f"{route:<34} {r['count']:>7} {r['rps']:>8.1f} {r['p50_ms']:>7.1f}ms "
+              f"{r['p95_ms']:>7.1f}ms {r['p99_ms']:>7.1f}ms  {codes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--duration", type=float, default=60.0, help="Số giây đo (sau khi làm nóng)")
+    parser.add_argument("--warmup", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=32, help="Số client đồng thời")
+    parser.add_argument("--users", type=int, default=500, help="Số giáo viên lấy mẫu từ DB")
+    parser.add_argument("--admin-ratio", type=float, default=0.1, help="Tỉ lệ request của admin")
+    parser.add_argument("--write-ratio", type=float, default=0.0, help="Tỉ lệ lượt giáo viên tạo + xóa lịch")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="Ghi kết quả ra file JSON (để so sánh giữa các lần chạy)")
+    args = parser.parse_args()
+
+    ctx = Context(args, *load_users(args.users))
+    print(f"{len(ctx.teachers)} giáo viên, {args.concurrency} client, admin {args.admin_ratio:.0%}, "
+          f"ghi {args.write_ratio:.0%} -> {args.base_url}")
+
+    for phase, duration in (("làm nóng", args.warmup), ("đo", args.duration)):
+        if duration <= 0:
+            continue
+        deadline = time.monotonic() + duration
+        results = [defaultdict(list) for _ in range(args.concurrency)]
+        workers = [Worker(i, ctx, results[i], deadline) for i in range(args.concurrency)]
+        print(f"==> {phase} {duration:g}s")
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+    summary = summarize(results, elapsed)
+    report(summary, elapsed)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "elapsed": elapsed, "routes": summary}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+# benchmarks/micro.py
+"""
+Micro-benchmark các bước mọi request đều trả giá (đường nóng):
+
+  - jwt.decode (get_current_user khi cache token trượt) / decode_token_subject (cache trúng)
+  - create_access_token
+  - bcrypt verify ở BCRYPT_ROUNDS hiện hành
+  - dựng dòng kết quả: tuple cursor vs RealDictCursor vs InstrumentedCursor (cần Postgres)
+  - validate Pydantic List[GradeDTO] / List[ClassDTO] / List[ScheduleDTO] cỡ thật
+  - render JSON: orjson (app/core/responses.py) vs jsonable_encoder + json.dumps (đường FastAPI)
+
+Mỗi case đo bằng timeit (tự chọn số vòng, lặp --repeat lần, lấy min / median mỗi lần gọi).
+Kết quả máy đọc được (JSON) và so sánh với baseline đã lưu:
+
+    python -m benchmarks.micro --save-baseline                 # lưu baseline (trên nhánh chính)
+    python -m benchmarks.micro --compare                       # so sánh, thoát mã 1 nếu chậm hơn --tolerance
+    python -m benchmarks.micro --filter pydantic --output out.json
+
+Baseline phụ thuộc máy chạy -> không commit (benchmarks/micro_baseline.json nằm trong .gitignore).
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import timeit
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.core.responses import dumps, orjson
+from app.core.security import ALGORITHM, create_access_token, pwd_context
+from app.schemas.knowledge import GradeDTO
+from app.schemas.schedule import ScheduleDTO
+from app.schemas.school import ClassDTO
+
+DEFAULT_BASELINE = Path(__file__).with_name("micro_baseline.json")
+
+# ============================================================
+# Dữ liệu mẫu cỡ thật (tương đương 1 giáo viên trong scripts/generate_dataset.py)
+# ============================================================
+def knowledge_tree_payload(chapters=8, lessons=6, units=25):
+    """Cây của 1 môn (phạm vi giáo viên): 1 khối > 1 môn > 1 sách > chương > bài > đơn vị kiến thức."""
+    unit_id = lesson_id = 0
+    chapter_list = []
+    for c in range(1, chapters + 1):
+        lesson_list = []
+        for l in range(1, lessons + 1):
+            lesson_id += 1
+            unit_list = []
+            for k in range(units):
+                unit_id += 1
+                unit_list.append({"knowledge_unit_id": unit_id, "content": f"Đơn vị kiến thức {k + 1} của bài {lesson_id}",
+                                  "knowledge_type": "Khái niệm"})
+            lesson_list.append({"lesson_id": lesson_id, "lesson_name": f"Bài {l}", "description": f"Nội dung bài {l}",
+                                "order_number": l, "knowledge_units": unit_list})
+        chapter_list.append({"chapter_id": c, "chapter_name": f"Chương {c}", "order_number": c, "lessons": lesson_list})
+    book = {"book_id": 1, "book_name": "Kết nối tri thức", "chapters": chapter_list}
+    subject = {"subject_id": 1, "subject_name": "Toán", "books": [book]}
+    return [{"grade_level_id": 5, "grade_level_name": "Khối 10", "value": 10, "subjects": [subject]}]
+
+
+def classes_payload(classes=10, students=40):
+    rows = []
+    for c in range(1, classes + 1):
+        rows.append({
+            "class_id": c, "class_name": f"10A{c}", "school_name": "Trường THPT số 1 Hà Nội",
+            "subject_name": "Toán", "grade_level": 10, "teacher_id": 2, "start_year": 2026, "end_year": 2027,
+            "class_status": "Hoạt động",
+            "students": [
+                {"student_id": c * 100 + s, "full_name": "Nguyễn Văn An", "date_of_birth": "2010-05-17",
+                 "email": f"hs{c * 100 + s}@example.edu.vn", "phone_number": "0900000001", "status": "Hoạt động"}
+                for s in range(students)
+            ],
+        })
+    return rows
+
+
+def schedules_payload(rows=300):
+    start = date(2026, 9, 7)
+    return [{
+        "schedule_id": i, "class_id": i % 10 + 1, "class_name": f"10A{i % 10 + 1}", "subject_name": "Toán",
+        "lesson_id": i, "lesson_name": f"Bài {i % 6 + 1}", "schedule_date": start + timedelta(days=i // 10),
+        "week_day": "Thứ Hai", "start_period": 1, "end_period": 2,
+    } for i in range(1, rows + 1)]
+
+
+def fastapi_render(content) -> bytes:
+    """Đường mặc định của FastAPI (JSONResponse): jsonable_encoder rồi json.dumps."""
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False,
+                      indent=None, separators=(",", ":")).encode("utf-8")
+
+
+# ============================================================
+# Danh sách case: tên -> hàm không tham số
+# ============================================================
+def build_cases(args):
+    from jose import jwt
+
+    from app.api.deps import decode_token_subject
+
+    token = create_access_token("gv_micro")
+    password_hash = pwd_context.hash("123456")
+    decode_token_subject(token)  # Nạp sẵn cache token
+
+    tree, classes, schedules = knowledge_tree_payload(), classes_payload(), schedules_payload()
+    tree_adapter = TypeAdapter(List[GradeDTO])
+    class_adapter = TypeAdapter(List[ClassDTO])
+    schedule_adapter = TypeAdapter(List[ScheduleDTO])
+    validated_schedules = schedule_adapter.validate_python(schedules)
+
+    cases = {
+        "auth.jwt_decode": lambda: jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM]),
+        "auth.decode_token_subject_cached": lambda: decode_token_subject(token),
+        "auth.create_access_token": lambda: create_access_token("gv_micro"),
+        "auth.bcrypt_verify": lambda: pwd_context.verify("123456", password_hash),
+        "pydantic.grade_tree": lambda: tree_adapter.validate_python(tree),
+        "pydantic.classes": lambda: class_adapter.validate_python(classes),
+        "pydantic.schedules": lambda: schedule_adapter.validate_python(schedules),
+        "json.grade_tree.orjson": lambda: dumps(tree),
+        "json.grade_tree.fastapi": lambda: fastapi_render(tree),
+        "json.classes.orjson": lambda: dumps(classes),
+        "json.classes.fastapi": lambda: fastapi_render(classes),
+        "json.schedules.orjson": lambda: dumps(schedules),
+        "json.schedules.fastapi": lambda: fastapi_render(schedules),
+        "json.schedules.pydantic_dump": lambda: schedule_adapter.dump_json(validated_schedules),
+    }
+    cases.update(cursor_cases(args))
+    return cases
+
+
+CURSOR_SQL = """
+    SELECT g AS schedule_id, g %% 10 + 1 AS class_id, '10A' || (g %% 10 + 1) AS class_name,
+           'Toán'::text AS subject_name, g AS lesson_id, 'Bài ' || (g %% 6 + 1) AS lesson_name,
+           DATE '2026-09-07' + g / 10 AS schedule_date, 'Thứ Hai'::text AS week_day,
+           1 AS start_period, 2 AS end_period
+    FROM generate_series(1, %s) g
+"""
+
+
+def cursor_cases(args):
+    """Dựng dòng từ cùng 1 kết quả SQL bằng các loại cursor; bỏ qua nếu không kết nối được DB."""
+    if args.no_db:
+        return {}
+    from psycopg2.extras import RealDictCursor
+
+    from app.db.instrumented import InstrumentedCursor
+    from scripts.common import connect
+
+    try:
+        conn = connect(autocommit=True)
+    except Exception as e:
+        print(f"Bỏ qua case cursor (không kết nối được Postgres: {e})", file=sys.stderr)
+        return {}
+
+    def run(factory):
+        cursor = conn.cursor(cursor_factory=factory)
+
+        def fetch():
+            cursor.execute(CURSOR_SQL, (args.cursor_rows,))
+            return cursor.fetchall()
+        return fetch
+
+    return {
+        "cursor.tuple": run(None),
+        "cursor.real_dict": run(RealDictCursor),
+        "cursor.instrumented": run(InstrumentedCursor),
+    }
+
+
+# ============================================================
+# Đo, lưu và so sánh
+# ============================================================
+def measure(fn, repeat, min_time):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    # autorange dừng khi >= 0.2s; co lại theo --min-time để chạy nhanh hơn khi cần
+    number = max(1, int(number * min_time / 0.2))
+    per_op = [total / number * 1e6 for total in timer.repeat(repeat=repeat, number=number)]
+    return {"min_us": min(per_op), "median_us": statistics.median(per_op), "number": number, "repeat": repeat}
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "bcrypt_rounds": settings.BCRYPT_ROUNDS,
+        "orjson": getattr(orjson, "__version__", None),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """In bảng so sánh (theo min_us); trả về danh sách case chậm hơn baseline quá tolerance."""
+    regressions = []
+    print(f"\n{'case':<36} {'baseline':>12} {'hiện tại':>12} {'thay đổi':>9}")
+    for name, result in results.items():
+        old = baseline.get("results", {}).get(name)
+        if old is None:
+            print(f"{name:<36} {'-':>12} {result['min_us']:>10.2f}us {'mới':>9}")
+            continue
+        change = result["min_us"] / old["min_us"] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  <-- CHẬM HƠN"
+        print(f"{name:<36} {old['min_us']:>10.2f}us {result['min_us']:>10.2f}us {change:>+8.1%}{flag}")
+    if baseline.get("environment") != environment():
+        print("Lưu ý: môi trường khác lúc lưu baseline, so sánh chỉ mang tính tham khảo.")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="Chỉ chạy case có tên chứa chuỗi này")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2, help="Thời gian tối thiểu mỗi lần lặp (giây)")
+    parser.add_argument("--cursor-rows", type=int, default=500, help="Số dòng cho case cursor")
+    parser.add_argument("--no-db", action="store_true", help="Bỏ các case cần Postgres")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra file (mặc định in ra stdout khi dùng --json)")
+    parser.add_argument("--json", action="store_true", help="In kết quả JSON ra stdout thay cho bảng")
+    parser.add_argument("--save-baseline", nargs="?", const=str(DEFAULT_BASELINE), metavar="FILE")
+    parser.add_argument("--compare", nargs="?", const=str(DEFAULT_BASELINE), metavar="FILE")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Chậm hơn baseline quá tỉ lệ này = hồi quy")
+    args = parser.parse_args()
+
+    cases = build_cases(args)
+    if args.filter:
+        cases = {name: fn for name, fn in cases.items() if args.filter in name}
+
+    results = {}
+    for name, fn in cases.items():
+        results[name] = measure(fn, args.repeat, args.min_time)
+        if not args.json:
+            r = results[name]
+            print(f"{name:<36} min={r['min_us']:>10.2f}us median={r['median_us']:>10.2f}us (x{r['number']})")
+
+    document = {"environment": environment(), "results": results}
+    if args.json:
+        print(json.dumps(document, indent=2))
+    if args.output:
+        Path(args.output).write_text(json.dumps(document, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(document, indent=2), encoding="utf-8")
+        print(f"Đã lưu baseline: {args.save_baseline}", file=sys.stderr)
+
+    if args.compare:
+        path = Path(args.compare)
+        if not path.is_file():
+            print(f"Chưa có baseline {path} - chạy với --save-baseline trước.", file=sys.stderr)
+            return 2
+        regressions = compare(results, json.loads(path.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} case chậm hơn baseline > {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
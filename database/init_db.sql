@@ -2,6 +2,7 @@
 -- 0. KHỞI TẠO SCHEMA
 -- ==========================================
 CREATE SCHEMA IF NOT EXISTS edu;
+CREATE EXTENSION IF NOT EXISTS btree_gist; -- EXCLUDE chống trùng lịch (mục 8)
 
 SET search_path TO edu, public;
 
@@ -228,5 +229,38 @@ CREATE TABLE edu.schedules (
   end_period INT,
   
   note TEXT,
-  created_at TIMESTAMP DEFAULT NOW()
-);
\ No newline at end of file
+  created_at TIMESTAMP DEFAULT NOW(),
+
+  -- Khoảng tiết [start_period, end_period]; NULL nếu thiếu/ngược tiết (không kiểm tra trùng)
+  period int4range GENERATED ALWAYS AS (
+    CASE WHEN start_period IS NULL OR end_period IS NULL OR start_period > end_period
+         THEN NULL
+         ELSE int4range(start_period, end_period, '[]')
+    END
+  ) STORED,
+
+  -- Chống trùng lịch (database/migrations/002); tên constraint được app đổi thành thông báo 400
+  CONSTRAINT schedules_teacher_no_overlap EXCLUDE USING gist (teacher_id WITH =, date WITH =, period WITH &&),
+  CONSTRAINT schedules_class_no_overlap EXCLUDE USING gist (class_id WITH =, date WITH =, period WITH &&)
+);
+
+-- ==========================================
+-- 9. INDEX (đồng bộ với database/migrations/001, 004, 005)
+-- Cài mới từ file này không cần chạy lại các migration index đó;
+-- IF NOT EXISTS giữ cho việc chạy lại migration là vô hại.
+-- ==========================================
+
+CREATE INDEX IF NOT EXISTS idx_schedules_teacher_date ON edu.schedules (teacher_id, date);
+CREATE INDEX IF NOT EXISTS idx_schedules_class_date ON edu.schedules (class_id, date);
+CREATE INDEX IF NOT EXISTS idx_schedules_date_period ON edu.schedules (date, (COALESCE(start_period, 0)), id);
+
+CREATE INDEX IF NOT EXISTS idx_students_class_id ON edu.students (class_id);
+CREATE INDEX IF NOT EXISTS idx_students_class_name ON edu.students (class_id, full_name, id);
+CREATE INDEX IF NOT EXISTS idx_classes_teacher_id ON edu.classes (teacher_id);
+CREATE INDEX IF NOT EXISTS idx_schools_name ON edu.schools (name);
+
+CREATE INDEX IF NOT EXISTS idx_subjects_grade_level_id ON edu.subjects (grade_level_id);
+CREATE INDEX IF NOT EXISTS idx_books_subject_id ON edu.books (subject_id);
+CREATE INDEX IF NOT EXISTS idx_chapters_book_id ON edu.chapters (book_id, order_number);
+CREATE INDEX IF NOT EXISTS idx_lessons_chapter_id ON edu.lessons (chapter_id, order_number);
+CREATE INDEX IF NOT EXISTS idx_knowledge_units_lesson_id ON edu.knowledge_units (lesson_id);
@@ -0,0 +1,46 @@
+-- =================================================================
+-- MIGRATION 001: INDEX CHO CÁC ĐIỀU KIỆN LỌC / JOIN NÓNG
+-- Schema: edu
+--
+-- Dùng CREATE INDEX CONCURRENTLY -> chạy được trên DB đang hoạt động
+-- (không khóa ghi). CONCURRENTLY không chạy được trong transaction, nên
+-- áp dụng bằng: python -m scripts.apply_migrations
+-- (hoặc psql KHÔNG dùng --single-transaction).
+--
+-- Nếu một lệnh bị lỗi giữa chừng, Postgres để lại index INVALID:
+-- DROP INDEX CONCURRENTLY <tên>; rồi chạy lại migration.
+-- =================================================================
+
+-- Lịch dạy: GET /schedules lọc theo giáo viên + khoảng ngày,
+-- kiểm tra trùng lịch theo (giáo viên | lớp) + ngày
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_schedules_teacher_date
+    ON edu.schedules (teacher_id, schedule_date);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_schedules_class_date
+    ON edu.schedules (class_id, schedule_date);
+
+-- Trường / Lớp / Học sinh
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_students_class_id
+    ON edu.students (class_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_classes_teacher_id
+    ON edu.classes (teacher_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_schools_name
+    ON edu.schools (name);
+
+-- Cây kiến thức: mỗi cấp tra theo khóa cha (kèm cột sắp xếp nếu có)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_subjects_grade_level_id
+    ON edu.subjects (grade_level_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_books_subject_id
+    ON edu.books (subject_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_chapters_book_id
+    ON edu.chapters (book_id, order_number);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_lessons_chapter_id
+    ON edu.lessons (chapter_id, order_number);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_knowledge_units_lesson_id
+    ON edu.knowledge_units (lesson_id);
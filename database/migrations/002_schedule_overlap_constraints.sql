@@ -0,0 +1,44 @@
+-- =================================================================
+-- MIGRATION 002: CHỐNG TRÙNG LỊCH Ở TẦNG DATABASE
+-- Schema: edu
+--
+-- Thay cho việc "kiểm tra rồi mới insert" ở ứng dụng (2 request đồng thời có
+-- thể cùng vượt qua bước kiểm tra). Exclusion constraint đảm bảo:
+--   - 1 giáo viên không có 2 lịch chồng tiết trong cùng 1 ngày
+--   - 1 lớp không có 2 lịch chồng tiết trong cùng 1 ngày
+-- Tên constraint được app/services/schedules.py đổi lại thành thông báo 400.
+--
+-- Lưu ý:
+--   - Thêm cột generated sẽ ghi lại bảng (khóa ACCESS EXCLUSIVE): chạy lúc ít tải.
+--   - Nếu dữ liệu cũ đã có lịch trùng, ADD CONSTRAINT sẽ lỗi. Tìm lịch trùng bằng:
+--       SELECT a.schedule_id, b.schedule_id FROM edu.schedules a
+--       JOIN edu.schedules b ON a.schedule_id < b.schedule_id
+--        AND a.schedule_date = b.schedule_date
+--        AND (a.teacher_id = b.teacher_id OR a.class_id = b.class_id)
+--        AND a.start_period <= b.end_period AND a.end_period >= b.start_period;
+-- =================================================================
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- Khoảng tiết [start_period, end_period]; NULL nếu thiếu tiết hoặc tiết ngược
+-- (khi đó không tham gia kiểm tra trùng)
+ALTER TABLE edu.schedules ADD COLUMN IF NOT EXISTS period int4range
+    GENERATED ALWAYS AS (
+        CASE WHEN start_period IS NULL OR end_period IS NULL OR start_period > end_period
+             THEN NULL
+             ELSE int4range(start_period, end_period, '[]')
+        END
+    ) STORED;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'schedules_teacher_no_overlap') THEN
+        ALTER TABLE edu.schedules ADD CONSTRAINT schedules_teacher_no_overlap
+            EXCLUDE USING gist (teacher_id WITH =, schedule_date WITH =, period WITH &&);
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'schedules_class_no_overlap') THEN
+        ALTER TABLE edu.schedules ADD CONSTRAINT schedules_class_no_overlap
+            EXCLUDE USING gist (class_id WITH =, schedule_date WITH =, period WITH &&);
+    END IF;
+END $$;
@@ -0,0 +1,61 @@
+-- =================================================================
+-- MIGRATION 003: TRIGGER BÁO THAY ĐỔI QUA NOTIFY (ĐỒNG BỘ CACHE)
+-- Schema: edu
+--
+-- API đã tự gửi thông báo khi ghi (app/db/notify.py: publish_change). Trigger
+-- này bắt thêm các thay đổi NGOÀI API (psql, script nạp dữ liệu...) để cache
+-- trong các worker không bị cũ.
+--
+-- Payload giống hệt bên ứng dụng: {"table":"users","key":"gv01"} (key null =
+-- nhiều dòng) -> Postgres gộp thông báo trùng trong cùng 1 transaction.
+-- Kênh 'edu_changes' phải khớp CHANGE_NOTIFY_CHANNEL trong config.
+--
+-- Chỉ gắn vào bảng có cache trong ứng dụng (users, cây kiến thức, lớp học).
+-- Bảng lớn ghi nhiều (students, schedules) không gắn để tránh tốn chi phí.
+-- =================================================================
+
+-- edu.users: theo từng dòng, key = username (cache xác thực theo username)
+CREATE OR REPLACE FUNCTION edu.notify_user_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM pg_notify('edu_changes', format('{"table":"users","key":%s}', to_json(OLD.username::text)));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM pg_notify('edu_changes', format('{"table":"users","key":%s}', to_json(NEW.username::text)));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Các bảng còn lại: 1 thông báo / câu lệnh, key null (cache xóa theo bảng)
+CREATE OR REPLACE FUNCTION edu.notify_table_change() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('edu_changes', format('{"table":%s,"key":null}', to_json(TG_TABLE_NAME::text)));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_users_notify ON edu.users;
+CREATE TRIGGER trg_users_notify
+    AFTER INSERT OR UPDATE OR DELETE ON edu.users
+    FOR EACH ROW EXECUTE FUNCTION edu.notify_user_change();
+
+DROP TRIGGER IF EXISTS trg_users_notify_truncate ON edu.users;
+CREATE TRIGGER trg_users_notify_truncate
+    AFTER TRUNCATE ON edu.users
+    FOR EACH STATEMENT EXECUTE FUNCTION edu.notify_table_change();
+
+DO $$
+DECLARE
+    t text;
+BEGIN
+    FOREACH t IN ARRAY ARRAY['grade_levels', 'subjects', 'books', 'chapters', 'lessons', 'knowledge_units', 'classes']
+    LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_notify ON edu.%I', t, t);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_notify AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON edu.%I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION edu.notify_table_change()', t, t
+        );
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,12 @@
+-- =================================================================
+-- MIGRATION 004: INDEX CHO DANH SÁCH HỌC SINH PHÂN TRANG
+-- Schema: edu
+--
+-- GET /classes/{class_id}/students sắp xếp mặc định theo họ tên và phân
+-- trang keyset theo (full_name, student_id): index này cho Postgres đọc
+-- thẳng từng trang theo thứ tự, không sort cả lớp, không OFFSET.
+-- Chạy bằng: python -m scripts.apply_migrations (CONCURRENTLY, xem 001).
+-- =================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_students_class_name
+    ON edu.students (class_id, full_name, student_id);
@@ -0,0 +1,14 @@
+-- =================================================================
+-- MIGRATION 005: INDEX CHO LỊCH DẠY THEO THỨ TỰ NGÀY (ADMIN / XUẤT FILE)
+-- Schema: edu
+--
+-- GET /schedules của admin và GET /schedules/export không lọc giáo viên:
+-- chỉ lọc khoảng ngày và sắp theo (schedule_date, COALESCE(start_period, 0),
+-- schedule_id), trang sau theo keyset trên đúng bộ đó. Index biểu thức
+-- dưới đây khớp nguyên ORDER BY -> Postgres đọc thẳng từng đoạn theo thứ
+-- tự, không Seq Scan + sort cả bảng lịch.
+-- Chạy bằng: python -m scripts.apply_migrations (CONCURRENTLY, xem 001).
+-- =================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_schedules_date_period
+    ON edu.schedules (schedule_date, (COALESCE(start_period, 0)), schedule_id);
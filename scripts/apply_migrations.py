@@ -0,0 +1,129 @@
+# scripts/apply_migrations.py
+"""
+Áp dụng các migration SQL trong database/migrations theo thứ tự phiên bản.
+
+- Phiên bản = tên file (VD: 001_hot_path_indexes). Đã áp dụng thì ghi vào
+  bảng edu.schema_migrations và bỏ qua ở các lần chạy sau.
+- Mỗi câu lệnh chạy ở chế độ autocommit, nên CREATE INDEX CONCURRENTLY
+  dùng được trên DB đang hoạt động.
+
+Chạy từ thư mục gốc repo:
+    python -m scripts.apply_migrations            # áp dụng các migration còn thiếu
+    python -m scripts.apply_migrations --dry-run  # chỉ liệt kê
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from scripts.common import connect
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "database" / "migrations"
+
+
+def split_statements(sql: str):
+    """
+    Tách file SQL thành từng câu lệnh theo dấu ';'. Bỏ qua ';' nằm trong
+    chuỗi '...', định danh "...", comment -- và thân hàm $tag$...$tag$.
+    """
+    statements = []
+    buffer = []
+    i = 0
+    n = len(sql)
+    while i < n:
+        ch = sql[i]
+        if ch == "-" and sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = n if end == -1 else end
+            i = end
+            continue
+        if ch in ("'", '"'):
+            end = i + 1
+            while end < n:
+                if sql[end] == ch:
+                    if end + 1 < n and sql[end + 1] == ch:  # '' hoặc "" (escape)
+                        end += 2
+                        continue
+                    break
+                end += 1
+            buffer.append(sql[i:end + 1])
+            i = end + 1
+            continue
+        if ch == "$":
+            close = sql.find("$", i + 1)
+            tag = sql[i:close + 1] if close != -1 else ""
+            if tag and (tag == "$$" or tag[1:-1].replace("_", "").isalnum()):
+                end = sql.find(tag, close + 1)
+                end = n if end == -1 else end + len(tag)
+                buffer.append(sql[i:end])
+                i = end
+                continue
+        if ch == ";":
+            statement = "".join(buffer).strip()
+            if statement:
+                statements.append(statement)
+            buffer = []
+            i += 1
+            continue
+        buffer.append(ch)
+        i += 1
+
+    statement = "".join(buffer).strip()
+    if statement:
+        statements.append(statement)
+    return statements
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ liệt kê migration chưa áp dụng")
+    args = parser.parse_args()
+
+    conn = connect(autocommit=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS edu.schema_migrations (
+              version VARCHAR(255) PRIMARY KEY,
+              applied_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        cursor.execute("SELECT version FROM edu.schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        pending = [path for path in sorted(MIGRATIONS_DIR.glob("*.sql")) if path.stem not in applied]
+        if not pending:
+            print("Không có migration mới.")
+            return 0
+
+        for path in pending:
+            if args.dry_run:
+                print(f"Chưa áp dụng: {path.stem}")
+                continue
+
+            print(f"==> {path.stem}")
+            for statement in split_statements(path.read_text(encoding="utf-8")):
+                started = time.perf_counter()
+                cursor.execute(statement)
+                first_line = statement.splitlines()[0]
+                print(f"    {time.perf_counter() - started:7.2f}s  {first_line}")
+            cursor.execute("INSERT INTO edu.schema_migrations (version) VALUES (%s)", (path.stem,))
+
+        # CONCURRENTLY lỗi giữa chừng sẽ để lại index INVALID -> cảnh báo
+        cursor.execute("""
+            SELECT c.relname FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = 'edu' AND NOT i.indisvalid
+        """)
+        invalid = [row[0] for row in cursor.fetchall()]
+        if invalid:
+            print(f"CẢNH BÁO: index INVALID cần DROP INDEX CONCURRENTLY rồi chạy lại: {', '.join(invalid)}")
+            return 1
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
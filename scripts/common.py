@@ -0,0 +1,21 @@
+# scripts/common.py
+"""Tiện ích dùng chung cho các script vận hành (kết nối trực tiếp, không qua hồ)."""
+import psycopg2
+
+from app.core.config import settings
+
+
+def connect(autocommit: bool = False, **overrides):
+    """Mở 1 kết nối psycopg2 tới Postgres cấu hình trong .env (search_path=edu)."""
+    params = dict(
+        user=settings.POSTGRES_USER,
+        password=settings.POSTGRES_PASSWORD,
+        host=settings.POSTGRES_SERVER,
+        port=settings.POSTGRES_PORT,
+        database=settings.POSTGRES_DB,
+        options="-c search_path=edu,public",
+    )
+    params.update(overrides)
+    conn = psycopg2.connect(**params)
+    conn.autocommit = autocommit
+    return conn
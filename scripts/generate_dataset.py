@@ -0,0 +1,252 @@
+# scripts/generate_dataset.py
+"""
+Sinh bộ dữ liệu lớn, giống thực tế để tìm lỗi hiệu năng (seed_*.sql quá nhỏ).
+
+Mặc định (~quy mô 1 tỉnh):
+  - 1.000 trường, 20.000 lớp, 800.000 học sinh, 2.000 giáo viên + 1 admin
+  - Cây kiến thức khối 6-12: 7 khối x 6 môn x 1 sách x 8 chương x 6 bài, ~50.000 đơn vị kiến thức
+  - Lịch dạy cả năm học (35 tuần), mỗi lớp 3 buổi / tuần, không trùng lịch
+    giáo viên / lớp (thỏa constraint của migration 002)
+
+Dữ liệu được sinh theo luồng và nạp bằng COPY (bộ nhớ không phụ thuộc quy mô),
+id gán tường minh nên chạy lại với cùng --seed cho ra cùng dữ liệu.
+Tài khoản: {prefix}_admin, {prefix}_gv1..N, mật khẩu --password.
+
+XÓA TOÀN BỘ dữ liệu của các bảng liên quan -> bắt buộc --reset:
+    python -m scripts.generate_dataset --reset
+    python -m scripts.generate_dataset --reset --schools 50 --classes 1000 --students 40000   # bản nhỏ
+"""
+import argparse
+import io
+import math
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+from app.core.security import pwd_context
+from scripts.common import connect
+
+GRADES = list(range(6, 13))
+SUBJECTS = ["Toán", "Vật lí", "Hóa học", "Sinh học", "Lịch sử", "Địa lí"]
+WEEKDAYS = ["Thứ Hai", "Thứ Ba", "Thứ Tư", "Thứ Năm", "Thứ Sáu", "Thứ Bảy", "Chủ Nhật"]
+PERIODS_PER_DAY = 10
+SCHOOL_DAYS = 6  # Thứ Hai -> Thứ Bảy
+
+FAMILY_NAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ", "Hồ", "Ngô", "Dương", "Lý"]
+MIDDLE_NAMES = ["Văn", "Thị", "Hữu", "Đức", "Minh", "Ngọc", "Thanh", "Quang", "Thu", "Gia", "Bảo", "Khánh"]
+GIVEN_NAMES = ["An", "Bình", "Chi", "Dũng", "Giang", "Hà", "Hải", "Hạnh", "Hiếu", "Hoa", "Hùng", "Huy", "Khoa",
+               "Lan", "Linh", "Long", "Mai", "Minh", "Nam", "Ngân", "Nhi", "Phong", "Phúc", "Quân", "Sơn",
+               "Tâm", "Thảo", "Trang", "Trung", "Tú", "Tuấn", "Vy", "Yến"]
+PROVINCES = ["Hà Nội", "TP. Hồ Chí Minh", "Đà Nẵng", "Hải Phòng", "Cần Thơ", "Nghệ An", "Thanh Hóa", "Huế"]
+STUDENT_STATUSES = ["Hoạt động"] * 95 + ["Nghỉ học"] * 3 + ["Bảo lưu"] * 2
+KNOWLEDGE_TYPES = ["Khái niệm", "Định lý", "Công thức", "Ví dụ", "Bài tập"]
+
+# bảng -> cột khóa chính (để đặt lại sequence sau khi nạp id tường minh)
+TABLES = {
+    "users": "user_id", "schools": "school_id", "classes": "class_id", "students": "student_id",
+    "grade_levels": "grade_level_id", "subjects": "subject_id", "books": "book_id",
+    "chapters": "chapter_id", "lessons": "lesson_id", "knowledge_units": "knowledge_unit_id",
+    "schedules": "schedule_id",
+}
+
+
+class RowStream(io.TextIOBase):
+    """File giả cho copy_expert: đọc dần từ generator các dòng CSV (không giữ cả bảng trong RAM)."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._buffer = ""
+        self.count = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                break
+            self.count += 1
+            self._buffer += "\t".join(_copy_value(v) for v in row) + "\n"
+        if size < 0:
+            chunk, self._buffer = self._buffer, ""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def _copy_value(value) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def copy_rows(cursor, table, columns, rows):
+    started = time.perf_counter()
+    stream = RowStream(iter(rows))
+    cursor.copy_expert(f"COPY edu.{table} ({', '.join(columns)}) FROM STDIN", stream, size=1 << 16)
+    print(f"    {table:<16} {stream.count:>10,} dòng  {time.perf_counter() - started:7.1f}s")
+    return stream.count
+
+
+def full_name(rng):
+    return f"{rng.choice(FAMILY_NAMES)} {rng.choice(MIDDLE_NAMES)} {rng.choice(GIVEN_NAMES)}"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reset", action="store_true", help="Bắt buộc: xóa dữ liệu cũ các bảng liên quan")
+    parser.add_argument("--schools", type=int, default=1000)
+    parser.add_argument("--classes", type=int, default=20000)
+    parser.add_argument("--students", type=int, default=800000)
+    parser.add_argument("--classes-per-teacher", type=int, default=10)
+    parser.add_argument("--chapters-per-book", type=int, default=8)
+    parser.add_argument("--lessons-per-chapter", type=int, default=6)
+    parser.add_argument("--knowledge-units", type=int, default=50000)
+    parser.add_argument("--weeks", type=int, default=35, help="Số tuần lịch dạy (1 năm học ~ 35 tuần)")
+    parser.add_argument("--sessions-per-week", type=int, default=3, help="Số buổi / lớp / tuần (mỗi buổi 2 tiết)")
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(date.today().year, 9, 1))
+    parser.add_argument("--prefix", default="lt", help="Tiền tố username")
+    parser.add_argument("--password", default="123456")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not args.reset:
+        parser.error("Script xóa dữ liệu các bảng " + ", ".join(TABLES) + " -> thêm --reset để xác nhận.")
+
+    # Mỗi giáo viên có tối đa SCHOOL_DAYS * PERIODS_PER_DAY / 2 buổi 2 tiết / tuần
+    max_sessions = SCHOOL_DAYS * PERIODS_PER_DAY // 2
+    if args.classes_per_teacher * args.sessions_per_week > max_sessions:
+        parser.error(f"classes-per-teacher x sessions-per-week phải <= {max_sessions} để không trùng lịch.")
+
+    rng = random.Random(args.seed)
+    started = time.perf_counter()
+    teachers = math.ceil(args.classes / args.classes_per_teacher)
+    password_hash = pwd_context.hash(args.password)  # Băm 1 lần, dùng chung cho mọi tài khoản
+
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        print("==> Xóa dữ liệu cũ")
+        cursor.execute("TRUNCATE " + ", ".join(f"edu.{t}" for t in TABLES) + " RESTART IDENTITY")
+
+        print("==> Cây kiến thức")
+        grade_rows = [(i + 1, f"Khối {value}", value) for i, value in enumerate(GRADES)]
+        copy_rows(cursor, "grade_levels", ["grade_level_id", "grade_level_name", "value"], grade_rows)
+
+        subject_ids = {}  # (khối, môn) -> subject_id
+        for grade_level_id, _, value in grade_rows:
+            for name in SUBJECTS:
+                subject_ids[(value, name)] = len(subject_ids) + 1
+        copy_rows(cursor, "subjects", ["subject_id", "grade_level_id", "subject_name"],
+                  ((sid, GRADES.index(g) + 1, name) for (g, name), sid in subject_ids.items()))
+        copy_rows(cursor, "books", ["book_id", "subject_id", "book_name"],
+                  ((sid, sid, "Kết nối tri thức") for sid in subject_ids.values()))
+
+        chapters = []  # (chapter_id, book_id, order)
+        for book_id in subject_ids.values():
+            for order in range(1, args.chapters_per_book + 1):
+                chapters.append((len(chapters) + 1, book_id, order))
+        copy_rows(cursor, "chapters", ["chapter_id", "book_id", "chapter_name", "order_number"],
+                  ((cid, bid, f"Chương {order}", order) for cid, bid, order in chapters))
+
+        lessons_by_subject = {sid: [] for sid in subject_ids.values()}
+        lesson_rows = []
+        for chapter_id, book_id, _ in chapters:
+            for order in range(1, args.lessons_per_chapter + 1):
+                lesson_id = len(lesson_rows) + 1
+                lesson_rows.append((lesson_id, chapter_id, f"Bài {order}", f"Nội dung bài {order}", order))
+                lessons_by_subject[book_id].append(lesson_id)  # book_id == subject_id (1 sách / môn)
+        copy_rows(cursor, "lessons", ["lesson_id", "chapter_id", "lesson_name", "description", "order_number"], lesson_rows)
+
+        units_per_lesson = max(1, math.ceil(args.knowledge_units / len(lesson_rows)))
+        copy_rows(cursor, "knowledge_units", ["knowledge_unit_id", "lesson_id", "content", "knowledge_type"],
+                  ((i * units_per_lesson + k + 1, lesson_id,
+                    f"Đơn vị kiến thức {k + 1} của bài {lesson_id}", KNOWLEDGE_TYPES[k % len(KNOWLEDGE_TYPES)])
+                   for i, (lesson_id, *_rest) in enumerate(lesson_rows) for k in range(units_per_lesson)))
+
+        print("==> Người dùng, trường, lớp, học sinh")
+        # Giáo viên t dạy 1 môn của 1 khối (subject_id) -> khớp lọc cây kiến thức theo môn
+        teacher_subjects = [rng.choice(list(subject_ids.items())) for _ in range(teachers)]
+        user_rows = [(1, f"{args.prefix}_admin", password_hash, "Quản trị tải thử", None, "admin", None)]
+        for t, (_, sid) in enumerate(teacher_subjects, start=1):
+            user_rows.append((t + 1, f"{args.prefix}_gv{t}", password_hash, full_name(rng),
+                              f"{args.prefix}_gv{t}@example.edu.vn", "giáo viên", sid))
+        copy_rows(cursor, "users", ["user_id", "username", "password_hash", "full_name", "email", "role", "subject_id"], user_rows)
+
+        copy_rows(cursor, "schools", ["school_id", "name", "address", "phone"],
+                  ((i, f"Trường THPT số {i} {rng.choice(PROVINCES)}", f"{i} Đường Lê Lợi, {rng.choice(PROVINCES)}",
+                    f"024{i:07d}") for i in range(1, args.schools + 1)))
+
+        classes = []  # (class_id, teacher_user_id, subject_id, khối)
+        class_rows = []
+        for class_id in range(1, args.classes + 1):
+            teacher = (class_id - 1) // args.classes_per_teacher
+            (grade, subject_name), sid = teacher_subjects[teacher]
+            classes.append((class_id, teacher + 2, sid, grade))
+            class_rows.append((class_id, rng.randint(1, args.schools), f"{grade}A{class_id % 15 + 1}",
+                               subject_name, grade, args.start_date.year, args.start_date.year + 1, teacher + 2))
+        copy_rows(cursor, "classes", ["class_id", "school_id", "class_name", "subject_name", "grade_level",
+                                      "start_year", "end_year", "teacher_id"], class_rows)
+        del class_rows
+
+        def students():
+            for student_id in range(1, args.students + 1):
+                class_id = (student_id - 1) % args.classes + 1
+                birth_year = args.start_date.year - classes[class_id - 1][3] - 5  # Lớp 6 ~ 11 tuổi
+                yield (student_id, class_id, full_name(rng),
+                       date(birth_year, 1, 1) + timedelta(days=rng.randint(0, 364)),
+                       f"hs{student_id}@example.edu.vn", f"09{student_id:08d}", rng.choice(STUDENT_STATUSES))
+        copy_rows(cursor, "students", ["student_id", "class_id", "full_name", "date_of_birth", "email",
+                                       "phone_number", "status"], students())
+
+        print("==> Lịch dạy")
+        monday = args.start_date - timedelta(days=args.start_date.weekday())
+
+        def schedules():
+            schedule_id = 0
+            for week in range(args.weeks):
+                week_start = monday + timedelta(weeks=week)
+                for class_id, teacher_id, sid, _grade in classes:
+                    position = (class_id - 1) % args.classes_per_teacher
+                    for session in range(args.sessions_per_week):
+                        # Ô thời khóa biểu riêng của (lớp, buổi) trong tuần của giáo viên -> không trùng
+                        slot = position * args.sessions_per_week + session
+                        day, block = slot % SCHOOL_DAYS, slot // SCHOOL_DAYS
+                        schedule_date = week_start + timedelta(days=day)
+                        if schedule_date < args.start_date:
+                            continue
+                        schedule_id += 1
+                        lessons = lessons_by_subject[sid]
+                        lesson_id = lessons[(week * args.sessions_per_week + session) % len(lessons)]
+                        yield (schedule_id, class_id, lesson_id, teacher_id, schedule_date,
+                               WEEKDAYS[day], block * 2 + 1, block * 2 + 2)
+        copy_rows(cursor, "schedules", ["schedule_id", "class_id", "lesson_id", "teacher_id", "schedule_date",
+                                        "week_day", "start_period", "end_period"], schedules())
+
+        print("==> Cập nhật sequence + ANALYZE")
+        for table, id_column in TABLES.items():
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('edu.{table}', '{id_column}'), "
+                f"COALESCE((SELECT MAX({id_column}) FROM edu.{table}), 0) + 1, false)"
+            )
+        conn.commit()
+
+        conn.autocommit = True
+        for table in TABLES:
+            cursor.execute(f"ANALYZE edu.{table}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    print(f"Xong sau {time.perf_counter() - started:.1f}s. Đăng nhập: {args.prefix}_admin / {args.prefix}_gv1 "
+          f"(mật khẩu {args.password})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,25 @@
+# tests/conftest.py
+"""
+Các test ở đây chạy trên Postgres thật (cấu hình trong .env, đã seed dữ liệu,
+VD: python -m scripts.generate_dataset). Không kết nối được -> bỏ qua (skip).
+
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import psycopg2
+import pytest
+
+from scripts.common import connect
+
+
+@pytest.fixture(scope="session")
+def db_conn():
+    try:
+        conn = connect(connect_timeout=3)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Không kết nối được PostgreSQL: {str(e).strip()}")
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        conn.close()
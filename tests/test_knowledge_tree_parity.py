@@ -0,0 +1,56 @@
+# tests/test_knowledge_tree_parity.py
+"""
+Builder "flat" phải cho ra JSON giống hệt từng byte builder "nested" (query
+json_agg cũ) trên dữ liệu hiện có: bản đầy đủ và bản lọc của từng môn.
+Đường trả nhanh (encode thẳng, không validate - xem app/core/responses.py)
+phải cho ra body giống hệt bản đã validate qua GradeDTO.
+"""
+from typing import List
+
+import pytest
+from psycopg2.extras import RealDictCursor
+from pydantic import TypeAdapter
+
+from app.core.responses import dumps
+from app.schemas.knowledge import GradeDTO
+from app.services.knowledge_tree import fetch_tree_flat, fetch_tree_nested
+
+tree_adapter = TypeAdapter(List[GradeDTO])
+
+
+def render(rows) -> bytes:
+    return tree_adapter.dump_json(tree_adapter.validate_python(rows))
+
+
+def first_difference(a: bytes, b: bytes) -> str:
+    position = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+    return (f"lệch từ byte {position}\n"
+            f"  nested: {a[max(0, position - 80):position + 80]!r}\n"
+            f"  flat:   {b[max(0, position - 80):position + 80]!r}")
+
+
+@pytest.fixture(scope="module")
+def cursor(db_conn):
+    with db_conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        yield cursor
+
+
+@pytest.fixture(scope="module")
+def scopes(cursor):
+    cursor.execute("SELECT subject_id FROM edu.subjects ORDER BY subject_id")
+    return [None] + [row["subject_id"] for row in cursor.fetchall()]
+
+
+def test_flat_builder_matches_nested(cursor, scopes):
+    for scope in scopes:
+        nested = render(fetch_tree_nested(cursor, scope))
+        flat = render(fetch_tree_flat(cursor, scope))
+        label = "toàn bộ cây" if scope is None else f"subject_id={scope}"
+        assert nested == flat, f"{label}: {first_difference(nested, flat)}"
+
+
+@pytest.mark.parametrize("builder", [fetch_tree_nested, fetch_tree_flat], ids=["nested", "flat"])
+def test_fast_path_matches_validated(cursor, scopes, builder):
+    for scope in scopes:
+        rows = builder(cursor, scope)
+        assert dumps(rows) == render(rows), f"subject_id={scope}: đường nhanh khác bản đã validate"
@@ -0,0 +1,182 @@
+# tests/test_query_plans.py
+"""
+Kế hoạch thực thi (query plan) của các câu SQL trong app/api và app/services.
+
+- test_no_seq_scan_on_large_tables: mỗi câu lệnh có WHERE chạy EXPLAIN
+  (FORMAT JSON, GENERIC_PLAN) (tham số %s đổi thành $1, $2, ...; KHÔNG thực thi),
+  lỗi nếu plan có "Seq Scan" trên bảng có số dòng ước tính >= PLAN_CHECK_MIN_ROWS
+  (mặc định 10000). Câu lệnh không có WHERE (đọc toàn bảng theo thiết kế, VD:
+  builder "flat" của /knowledge-tree) không kiểm tra.
+- test_hot_path_uses_index: trên bảng >= PLAN_CHECK_MIN_ROWS dòng, plan của
+  các query nóng không có Seq Scan và phải tra index theo cột lọc (cột đó nằm
+  trong "Index Cond"; tên index không quan trọng). Bảng nhỏ hơn -> bỏ qua:
+  planner chọn quét theo khóa chính (đã đúng thứ tự) là hợp lý ở đó.
+
+Cần Postgres 16+ (GENERIC_PLAN); bản cũ hơn -> bỏ qua.
+"""
+import ast
+import json
+import os
+import re
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.core.pagination import encode_cursor
+from app.services.knowledge_tree import TREE_LEVELS, level_sql
+from app.services.rosters import build_roster_query
+from app.services.schedules import build_schedule_range_query
+
+ROOT = Path(__file__).resolve().parent.parent
+SOURCE_DIRS = [ROOT / "app" / "api", ROOT / "app" / "services"]
+SQL_START = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+MIN_ROWS = float(os.getenv("PLAN_CHECK_MIN_ROWS", "10000"))
+
+INDEX_NODES = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+
+
+def _render(node) -> str:
+    """
+    Lấy nội dung chuỗi SQL; chỗ trống {tên} của str.format() thay bằng rỗng.
+    f-string có biểu thức là SQL sinh động -> bỏ qua (xử lý riêng bên dưới).
+    """
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return re.sub(r"\{[a-z_]+\}", "", node.value)
+    if isinstance(node, ast.JoinedStr) and all(isinstance(v, ast.Constant) for v in node.values):
+        return "".join(v.value for v in node.values)
+    return ""
+
+
+def _roster_sql(sort: str, value) -> str:
+    token = encode_cursor({"sort": sort, "order": "asc", "status": None, "value": value, "id": 1})
+    return build_roster_query(1, None, sort, "asc", token, 50)[0]
+
+
+def _teacher_schedule_sql() -> str:
+    after = {"date": "2024-09-09", "period": 1, "id": 1}
+    return build_schedule_range_query("2024-09-01", "2025-05-31", 1, after, 1000)[0]
+
+
+def _children_sql(level) -> str:
+    return level_sql(level, f"WHERE {level.parent_column} = ANY(%s)")
+
+
+def collect_statements():
+    """Các chuỗi SQL trong mã nguồn + SQL sinh động, bỏ trùng lặp: [(sql, vị trí)]."""
+    seen = {}
+    for directory in SOURCE_DIRS:
+        # File ở thư mục gốc trước (VD: app/api/*.py trước app/api/aio/*.py)
+        for path in sorted(directory.rglob("*.py"), key=lambda p: (len(p.parts), p)):
+            tree = ast.parse(path.read_text(encoding="utf-8"))
+            # Các mảnh chuỗi bên trong f-string không phải câu lệnh độc lập
+            fragments = {id(v) for node in ast.walk(tree) if isinstance(node, ast.JoinedStr) for v in node.values}
+            for node in ast.walk(tree):
+                if not isinstance(node, (ast.Constant, ast.JoinedStr)) or id(node) in fragments:
+                    continue
+                sql = _render(node)
+                if SQL_START.match(sql):
+                    seen.setdefault(" ".join(sql.split()), (sql, f"{path.relative_to(ROOT)}:{node.lineno}"))
+
+    # Cây kiến thức (builder flat / fetch_subtree): đọc con theo khóa cha, đếm con
+    for level in TREE_LEVELS:
+        if not level.parent_column:
+            continue
+        sql = _children_sql(level)
+        seen.setdefault(" ".join(sql.split()), (sql, f"TREE_LEVELS[{level.node_type}]"))
+        sql = (f"SELECT {level.parent_column}, COUNT(*) FROM {level.table} "
+               f"WHERE {level.parent_column} = ANY(%s) GROUP BY {level.parent_column}")
+        seen.setdefault(" ".join(sql.split()), (sql, f"TREE_LEVELS[{level.node_type}, count]"))
+
+    # Danh sách học sinh phân trang (trang sau, có cursor)
+    for sort, value in (("full_name", "Nguyễn Văn An"), ("student_id", None), ("date_of_birth", "2010-01-01")):
+        sql = _roster_sql(sort, value)
+        seen.setdefault(" ".join(sql.split()), (sql, f"build_roster_query[{sort}]"))
+
+    # Lịch dạy: trang sau của giáo viên (keyset) và 1 đoạn xuất file của admin
+    sql = _teacher_schedule_sql()
+    seen.setdefault(" ".join(sql.split()), (sql, "build_schedule_range_query[teacher, keyset]"))
+    after = {"date": "2024-09-09", "period": 1, "id": 1}
+    sql = build_schedule_range_query("2024-09-01", "2025-05-31", None, after, settings.SCHEDULE_EXPORT_CHUNK)[0]
+    seen.setdefault(" ".join(sql.split()), (sql, "build_schedule_range_query[admin, export]"))
+
+    return [(sql, location) for sql, location in seen.values() if re.search(r"\bWHERE\b", sql, re.IGNORECASE)]
+
+
+# Query nóng -> cột lọc mà plan phải tra bằng index (database/migrations 001, 004)
+HOT_PATHS = [
+    ("GET /schedules?teacher", _teacher_schedule_sql(), "edu.schedules", "teacher_id"),
+    ("GET /classes/{id}/students", _roster_sql("full_name", "Nguyễn Văn An"), "edu.students", "class_id"),
+] + [
+    (f"knowledge-tree/{level.node_type}", _children_sql(level), level.table, level.parent_column)
+    for level in TREE_LEVELS if level.parent_column
+]
+
+
+def to_positional(sql: str) -> str:
+    counter = iter(range(1, 1000))
+    return re.sub(r"%s", lambda _: f"${next(counter)}", sql)
+
+
+def walk_plan(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk_plan(child)
+
+
+@pytest.fixture(scope="module")
+def cursor(db_conn):
+    if db_conn.server_version < 160000:
+        pytest.skip("EXPLAIN (GENERIC_PLAN) cần PostgreSQL 16+")
+    with db_conn.cursor() as cursor:
+        yield cursor
+    db_conn.rollback()
+
+
+@pytest.fixture(scope="module")
+def table_rows(cursor):
+    cursor.execute("""
+        SELECT c.relname, c.reltuples FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = 'edu' AND c.relkind = 'r'
+    """)
+    return dict(cursor.fetchall())
+
+
+def explain(cursor, sql: str) -> dict:
+    # Trong savepoint: lỗi không làm hỏng transaction của câu lệnh kế tiếp
+    cursor.execute("SAVEPOINT plan_check")
+    try:
+        cursor.execute(f"EXPLAIN (FORMAT JSON, GENERIC_PLAN) {to_positional(sql)}")
+        return cursor.fetchone()[0][0]["Plan"]
+    finally:
+        cursor.execute("ROLLBACK TO SAVEPOINT plan_check")
+
+
+STATEMENTS = collect_statements()
+
+
+@pytest.mark.parametrize("sql", [sql for sql, _ in STATEMENTS], ids=[location for _, location in STATEMENTS])
+def test_no_seq_scan_on_large_tables(cursor, table_rows, sql):
+    plan = explain(cursor, sql)
+    offenders = [
+        f"{node['Relation Name']} (~{int(table_rows[node['Relation Name']])} dòng)"
+        for node in walk_plan(plan)
+        if node["Node Type"] == "Seq Scan" and table_rows.get(node.get("Relation Name"), 0) >= MIN_ROWS
+    ]
+    assert not offenders, f"Seq Scan trên {', '.join(offenders)}\n{json.dumps(plan)[:300]}"
+
+
+@pytest.mark.parametrize("sql,table,column", [path[1:] for path in HOT_PATHS], ids=[path[0] for path in HOT_PATHS])
+def test_hot_path_uses_index(cursor, table_rows, sql, table, column):
+    relation = table.split(".")[1]
+    if table_rows.get(relation, 0) < MIN_ROWS:
+        pytest.skip(f"{table} ~{int(table_rows.get(relation, 0))} dòng < PLAN_CHECK_MIN_ROWS")
+    plan = explain(cursor, sql)
+    nodes = [node for node in walk_plan(plan) if node.get("Relation Name", relation) == relation]
+    assert not any(node["Node Type"] == "Seq Scan" for node in nodes), f"Seq Scan trên {table}\n{json.dumps(plan)[:300]}"
+    used = [
+        node["Index Name"] for node in nodes
+        if node["Node Type"] in INDEX_NODES and re.search(rf"\b{column}\b", node.get("Index Cond", ""))
+    ]
+    assert used, f"{table}: plan không tra index theo {column}\n{json.dumps(plan)[:300]}"
@@ -0,0 +1,58 @@
+# tests/test_school_responses.py
+"""
+/school-data, /school-data/summary và /teacher/classes-lessons trả bằng đường
+nhanh (encode thẳng, không validate - xem app/core/responses.py): body phải
+giống hệt bản đã validate qua response_model, với mọi giáo viên đang có lớp.
+"""
+from typing import List
+
+import pytest
+from psycopg2.extras import RealDictCursor
+from pydantic import TypeAdapter
+
+from app.core.config import settings
+from app.core.responses import dumps, render_json
+from app.schemas.school import ClassDTO, ClassSummaryDTO, ClassWithLessonsDTO
+from app.services.lesson_catalog import fetch_classes_with_lessons
+from app.services.rosters import CLASS_SUMMARY_SQL, SCHOOL_DATA_SQL
+
+
+def fetch_all(sql):
+    def fetch(cursor, teacher_id):
+        cursor.execute(sql, (teacher_id,))
+        return cursor.fetchall()
+    return fetch
+
+
+ENDPOINTS = [
+    ("school-data", fetch_all(SCHOOL_DATA_SQL), List[ClassDTO]),
+    ("school-data/summary", fetch_all(CLASS_SUMMARY_SQL), List[ClassSummaryDTO]),
+    ("teacher/classes-lessons", fetch_classes_with_lessons, List[ClassWithLessonsDTO]),
+]
+
+
+@pytest.fixture(scope="module")
+def cursor(db_conn):
+    with db_conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        yield cursor
+
+
+@pytest.fixture(scope="module")
+def teacher_ids(cursor):
+    cursor.execute("SELECT DISTINCT teacher_id FROM edu.classes WHERE teacher_id IS NOT NULL ORDER BY 1")
+    ids = [row["teacher_id"] for row in cursor.fetchall()]
+    if not ids:
+        pytest.skip("Chưa có lớp nào có giáo viên")
+    return ids
+
+
+@pytest.mark.parametrize("fetch,response_model", [e[1:] for e in ENDPOINTS], ids=[e[0] for e in ENDPOINTS])
+def test_fast_path_matches_validated(cursor, teacher_ids, fetch, response_model, monkeypatch):
+    adapter = TypeAdapter(response_model)
+    monkeypatch.setattr(settings, "RESPONSE_VALIDATION", True)
+    for teacher_id in teacher_ids:
+        rows = fetch(cursor, teacher_id)
+        validated = adapter.dump_json(adapter.validate_python(rows))
+        assert dumps(rows) == validated, f"teacher_id={teacher_id}: đường nhanh khác bản đã validate"
+        # RESPONSE_VALIDATION=true: render_json validate qua đúng response_model
+        assert render_json(rows, response_model) == validated